@@ -0,0 +1,138 @@
+"""
+Concurrent-request scaling: async read endpoints versus the threadpool (bulkhead) path.
+
+    python benchmarks/async_reads.py --latency-ms 20 --concurrency 1,8,32,128
+
+Both paths serve GET /correspondence/1 and GET /async/correspondence/1 in-process (httpx
+ASGI transport) from the same SQLite file, pysqlite for the sync engine and aiosqlite for
+the async one. Every statement first waits --latency-ms inside the driver to stand in for
+a network round trip: the sync path holds a bulkhead worker thread for that time, the
+async path only holds its pooled connection. Both pools get --pool-size connections.
+Needs greenlet and aiosqlite.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TESTING", "true")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import database  # noqa: E402
+import models  # noqa: E402
+from main import app  # noqa: E402
+
+
+def add_latency(engine, latency_ms: float) -> None:
+    """Make every statement spend latency_ms in the driver before it runs."""
+
+    @event.listens_for(engine, "connect")
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function("bench_delay", 1, lambda ms: time.sleep(ms / 1000))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _delay(conn, cursor, statement, parameters, context, executemany):
+        cursor.execute("SELECT bench_delay(?)", (latency_ms,))
+
+
+def seed(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine, tables=[
+        models.CodeTable.__table__, models.Correspondence.__table__,
+    ])
+    db = sessionmaker(bind=engine)()
+    for line_no in range(1, 21):
+        db.add(models.Correspondence(
+            LineNo=line_no, TableName="WOSMaster", PrimaryKeyValue="1", RoleName="LOGO",
+            CorrespondenceBy="u1", CorrespondenceToRole="NLAO",
+            DateTimeCorrespondence=datetime(2026, 1, 1), CorrespondenceType="Fwded", StationCode="K",
+        ))
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def configure(path: str, latency_ms: float, pool_size: int) -> None:
+    sync_engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False},
+        pool_size=pool_size, max_overflow=0,
+    )
+    add_latency(sync_engine, latency_ms)
+    SyncSession = sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
+
+    def sync_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=pool_size, max_overflow=0)
+    add_latency(async_engine.sync_engine, latency_ms)
+    database.ASYNC_DB_URL = str(async_engine.url)
+    database._async_engine = async_engine
+    database._AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    app.dependency_overrides[database.get_db] = sync_db
+
+
+async def run_level(client: httpx.AsyncClient, path: str, concurrency: int, requests: int) -> dict:
+    latencies = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'concurrency':>11} {'path':>10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for concurrency in args.concurrency:
+            requests = max(args.requests, concurrency * 4)
+            for label, path in (("threadpool", "/correspondence/1"), ("async", "/async/correspondence/1")):
+                result = await run_level(client, path, concurrency, requests)
+                print(
+                    f"{concurrency:>11} {label:>10} {result['rps']:>9.1f} "
+                    f"{result['p50']:>8.1f} {result['p99']:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=200, help="minimum requests per level")
+    parser.add_argument("--pool-size", type=int, default=64)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        seed(db_path)
+        configure(db_path, args.latency_ms, args.pool_size)
+        asyncio.run(main(args))
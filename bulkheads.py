@@ -0,0 +1,124 @@
+"""
+Thread pool bulkheads for sync routes.
+
+FastAPI runs every sync route on one shared threadpool, so a burst of exports or bulk
+vetting can starve quick lookups and logins. Routes decorated with @bulkhead("<class>")
+run on that class's own executor instead. When a class's queue is full, new requests are
+refused with 503 at once rather than queued behind the backlog.
+
+Classes and defaults (workers / queued requests), each overridable with
+BULKHEAD_<CLASS>_WORKERS and BULKHEAD_<CLASS>_QUEUE:
+  reads   16 / 64   single-row lookups, code tables, job status
+  heavy    4 / 16   list endpoints, change feeds, exports
+  writes   8 / 32   vetting writes and job submission
+  auth     4 / 32   login and password reset
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from exceptions import ServiceUnavailableError
+
+_DEFAULTS = {
+    "reads": (16, 64),
+    "heavy": (4, 16),
+    "writes": (8, 32),
+    "auth": (4, 32),
+}
+
+metrics.describe("bulkhead_queue_seconds", "Time requests waited for a bulkhead worker thread.")
+metrics.describe("bulkhead_rejected_total", "Requests refused because the bulkhead queue was full.")
+
+
+class Bulkhead:
+    """A bounded executor with its own worker threads and waiting-room limit."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"bulkhead-{name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+
+    def _run(self, submitted_at: float, ctx: contextvars.Context, fn, args, kwargs):
+        metrics.observe("bulkhead_queue_seconds", time.perf_counter() - submitted_at, bulkhead=self.name)
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return ctx.run(fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn on this bulkhead's executor. Raises ServiceUnavailableError when the queue is full."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                metrics.inc("bulkhead_rejected_total", bulkhead=self.name)
+                raise ServiceUnavailableError(f"Server busy ({self.name})", retry_after=1)
+            self._queued += 1
+        future = self._executor.submit(
+            self._run, time.perf_counter(), contextvars.copy_context(), fn, args, kwargs
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Client went away before a worker picked the call up: drop it from the queue.
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _from_env(name: str) -> Bulkhead:
+    workers, queue = _DEFAULTS[name]
+    prefix = f"BULKHEAD_{name.upper()}"
+    return Bulkhead(
+        name,
+        int(os.getenv(f"{prefix}_WORKERS", workers)),
+        int(os.getenv(f"{prefix}_QUEUE", queue)),
+    )
+
+
+bulkheads = {name: _from_env(name) for name in _DEFAULTS}
+
+
+def bulkhead(name: str):
+    """
+    Decorator running a sync route on the named bulkhead. The wrapped route keeps its
+    signature, so FastAPI still resolves its parameters and dependencies.
+    """
+    pool = bulkheads[name]
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await pool.run(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> dict:
+    """Return the state of every bulkhead."""
+    return {name: pool.snapshot() for name, pool in bulkheads.items()}
@@ -0,0 +1,630 @@
+"""
+Read cache with pluggable backends, and the versioned WOS response cache built on it.
+
+Backends are chosen with CACHE_URL:
+  memory://                          per-process LRU (default)
+  shm:///path/to/file?slots=4096     memory-mapped file shared by the workers of one host
+  redis://host:6379/0                any server speaking the Redis protocol
+
+Each WOSSerial carries a version number that vetting writes bump on commit. Versions live in
+the backend, so with a shared backend a bump made by one worker is seen by all of them on
+their next read; this is how invalidations are broadcast. Cached responses are stored with
+the version they were loaded under, and ETags are derived from it, so a client holding the
+current ETag can be answered with 304 without a query. CodeTable lookups are cached by
+column name with a TTL.
+
+Shared backends store values as JSON (datetimes, dates and Decimals are tagged), never
+pickle: anyone who can write to the cache file or server must not be able to run code.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+import anyio.to_thread
+
+import vetting_events
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_TTL = int(os.getenv("CACHE_TTL", 300))
+WOS_CACHE_MAX_ENTRIES = int(os.getenv("WOS_CACHE_MAX_ENTRIES", 2048))
+CODETABLE_CACHE_TTL = int(os.getenv("CODETABLE_CACHE_TTL", 600))
+
+
+_DECODERS = {
+    "__datetime__": datetime.fromisoformat,
+    "__date__": date.fromisoformat,
+    "__decimal__": Decimal,
+}
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    raise TypeError(f"Cannot cache values of type {type(value).__name__}")
+
+
+def _decode_object(obj: dict):
+    if len(obj) == 1:
+        (tag, text), = obj.items()
+        decoder = _DECODERS.get(tag)
+        if decoder is not None:
+            return decoder(text)
+    return obj
+
+
+def dumps(value) -> bytes:
+    """Serialize a cache value. Tuples come back as lists."""
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode()
+
+
+def loads(data: bytes):
+    """Deserialize a value written by dumps(). Raises ValueError for anything else."""
+    return json.loads(data, object_hook=_decode_object)
+
+
+class CacheBackendError(Exception):
+    """Raised by a backend when its store cannot be reached."""
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class CacheBackend:
+    """
+    Key/value store interface used by the caches. Keys are strings; values are any
+    picklable object. `ttl` is in seconds; None means no expiry.
+    """
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    def add(self, key: str, value, ttl: float | None = None) -> bool:
+        """Set key only if it is absent. Returns True if the value was stored."""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: float | None = None) -> int:
+        """
+        Atomically add to an integer counter (created at 0) and return the new value.
+        ttl applies only when the counter is created; an existing one keeps its expiry.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU backend."""
+
+    def __init__(self, max_entries: int = WOS_CACHE_MAX_ENTRIES):
+        self._lru = LRUCache(max_entries)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._lru.delete(key)
+            return None
+        return entry
+
+    @staticmethod
+    def _expiry(ttl):
+        return time.monotonic() + ttl if ttl is not None else None
+
+    def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._lru.set(key, (value, self._expiry(ttl)))
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._lru.set(key, (value, self._expiry(ttl)))
+            return True
+
+    def delete(self, key):
+        self._lru.delete(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value, expires_at = amount, self._expiry(ttl)
+            else:
+                value, expires_at = entry[0] + amount, entry[1]
+            self._lru.set(key, (value, expires_at))
+            return value
+
+    def clear(self):
+        self._lru.clear()
+
+
+class SharedMemoryBackend(CacheBackend):
+    """
+    Fixed-size hash table in a memory-mapped file, shared by all processes on one host.
+    Each slot holds a header (key hash, expiry as wall-clock time, payload length) and the
+    JSON-encoded (key, value) pair. Collisions probe a few neighbouring slots; when all are
+    taken the entry closest to expiry is overwritten. Access is serialised with flock.
+    Values that do not fit in a slot are not cached.
+    """
+
+    _HEADER = struct.Struct("<QdI")
+    _PROBES = 8
+
+    def __init__(self, path: str, slots: int = 4096, slot_size: int = 16384):
+        if fcntl is None:
+            raise RuntimeError("The shared-memory cache backend requires fcntl (POSIX only)")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        size = slots * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        # flock excludes other processes; the thread lock excludes threads sharing the fd.
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return h or 1
+
+    def _read_slot(self, index: int):
+        offset = index * self.slot_size
+        key_hash, expires_at, length = self._HEADER.unpack_from(self._map, offset)
+        return key_hash, expires_at, length, offset
+
+    def _find(self, key: str):
+        """Return (slot index, value) for a live key, or (None, None)."""
+        key_hash = self._hash(key)
+        now = time.time()
+        for probe in range(self._PROBES):
+            index = (key_hash + probe) % self.slots
+            slot_hash, expires_at, length, offset = self._read_slot(index)
+            if slot_hash != key_hash or (expires_at and expires_at <= now):
+                continue
+            start = offset + self._HEADER.size
+            try:
+                stored_key, value = loads(self._map[start:start + length])
+            except (ValueError, TypeError):
+                continue  # written by an older format, or torn: treat as empty
+            if stored_key == key:
+                return index, value
+        return None, None
+
+    @staticmethod
+    def _expiry(ttl) -> float:
+        return time.time() + ttl if ttl is not None else 0.0
+
+    def _write(self, key: str, value, expires_at: float) -> None:
+        """Store (key, value) with an absolute expiry (0.0 for none)."""
+        payload = dumps((key, value))
+        if len(payload) > self.slot_size - self._HEADER.size:
+            return
+        key_hash = self._hash(key)
+        now = time.time()
+        target, target_expiry = None, None
+        existing, _ = self._find(key)
+        if existing is not None:
+            target = existing
+        else:
+            for probe in range(self._PROBES):
+                index = (key_hash + probe) % self.slots
+                slot_hash, slot_expiry, _, _ = self._read_slot(index)
+                if slot_hash == 0 or (slot_expiry and slot_expiry <= now):
+                    target = index
+                    break
+                # Prefer evicting entries that expire soonest; entries without expiry last.
+                rank = slot_expiry or float("inf")
+                if target_expiry is None or rank < target_expiry:
+                    target, target_expiry = index, rank
+        offset = target * self.slot_size
+        self._HEADER.pack_into(self._map, offset, key_hash, expires_at, len(payload))
+        start = offset + self._HEADER.size
+        self._map[start:start + len(payload)] = payload
+
+    def get(self, key):
+        with self._locked(exclusive=False):
+            return self._find(key)[1]
+
+    def set(self, key, value, ttl=None):
+        with self._locked(exclusive=True):
+            self._write(key, value, self._expiry(ttl))
+
+    def add(self, key, value, ttl=None):
+        with self._locked(exclusive=True):
+            if self._find(key)[0] is not None:
+                return False
+            self._write(key, value, self._expiry(ttl))
+            return True
+
+    def delete(self, key):
+        with self._locked(exclusive=True):
+            index, _ = self._find(key)
+            if index is not None:
+                self._HEADER.pack_into(self._map, index * self.slot_size, 0, 0.0, 0)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._locked(exclusive=True):
+            index, current = self._find(key)
+            if index is None:
+                value, expires_at = amount, self._expiry(ttl)
+            else:
+                # Like INCRBY: an existing counter keeps its expiry, whatever ttl is passed.
+                value, expires_at = current + amount, self._read_slot(index)[1]
+            self._write(key, value, expires_at)
+            return value
+
+    def clear(self):
+        with self._locked(exclusive=True):
+            for index in range(self.slots):
+                self._HEADER.pack_into(self._map, index * self.slot_size, 0, 0.0, 0)
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend for any server speaking the Redis protocol (RESP2), using one socket per thread.
+    Keys are namespaced with `prefix`. Connection failures raise CacheBackendError.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 prefix: str = "wos_audit:", timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.db:
+                self._send(conn, "SELECT", self.db)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheBackendError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise CacheBackendError(f"Unexpected reply from cache server: {line!r}")
+
+    def _send(self, conn, *args):
+        sock, reader = conn
+        sock.sendall(self._encode(*args))
+        return self._read_reply(reader)
+
+    def execute(self, *args):
+        """Send one command and return its decoded reply."""
+        try:
+            return self._send(self._connection(), *args)
+        except (OSError, ConnectionError) as e:
+            self._drop_connection()
+            raise CacheBackendError(f"Cache server unavailable: {e}") from e
+
+    @staticmethod
+    def _dump(value) -> bytes:
+        # JSON integers are plain text, so INCRBY can update them atomically.
+        return dumps(value)
+
+    @staticmethod
+    def _load(data: bytes):
+        try:
+            return loads(data)
+        except ValueError:
+            return None  # written by an older format: treat as a miss
+
+    def get(self, key):
+        data = self.execute("GET", self.prefix + key)
+        return self._load(data) if data is not None else None
+
+    def set(self, key, value, ttl=None):
+        args = ["SET", self.prefix + key, self._dump(value)]
+        if ttl is not None:
+            args += ["PX", int(ttl * 1000)]
+        self.execute(*args)
+
+    def add(self, key, value, ttl=None):
+        args = ["SET", self.prefix + key, self._dump(value), "NX"]
+        if ttl is not None:
+            args += ["PX", int(ttl * 1000)]
+        return self.execute(*args) is not None
+
+    def delete(self, key):
+        self.execute("DEL", self.prefix + key)
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self.execute("INCRBY", self.prefix + key, amount)
+        if ttl is not None and value == amount:
+            self.execute("PEXPIRE", self.prefix + key, int(ttl * 1000))
+        return value
+
+    def publish(self, channel: str, message: bytes) -> None:
+        """Publish a message to a channel."""
+        self.execute("PUBLISH", self.prefix + channel, message)
+
+    def listen(self, channel: str):
+        """Yield messages published to a channel. Blocks; uses a dedicated connection."""
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.settimeout(None)
+            reader = sock.makefile("rb")
+            sock.sendall(self._encode("SUBSCRIBE", self.prefix + channel))
+        except OSError as e:
+            raise CacheBackendError(f"Cache server unavailable: {e}") from e
+        try:
+            while True:
+                reply = self._read_reply(reader)
+                if isinstance(reply, list) and reply and reply[0] == b"message":
+                    yield reply[2]
+        except (OSError, ConnectionError) as e:
+            raise CacheBackendError(f"Subscription to {channel} lost: {e}") from e
+        finally:
+            reader.close()
+            sock.close()
+
+    def clear(self):
+        keys = self.execute("KEYS", self.prefix + "*") or []
+        if keys:
+            self.execute("DEL", *keys)
+
+
+def create_backend(url: str = CACHE_URL) -> CacheBackend:
+    """Build a backend from a CACHE_URL value."""
+    parsed = urllib.parse.urlparse(url)
+    params = dict(urllib.parse.parse_qsl(parsed.query))
+    if parsed.scheme == "memory":
+        return MemoryBackend(int(params.get("max_entries", WOS_CACHE_MAX_ENTRIES)))
+    if parsed.scheme == "shm":
+        return SharedMemoryBackend(
+            parsed.path,
+            slots=int(params.get("slots", 4096)),
+            slot_size=int(params.get("slot_size", 16384)),
+        )
+    if parsed.scheme == "redis":
+        return RedisBackend(
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+        )
+    raise ValueError(f"Unsupported CACHE_URL scheme: {parsed.scheme!r}")
+
+
+class WOSCache:
+    """Response cache keyed by WOSSerial with per-WOS versions for ETags."""
+
+    def __init__(self, backend: CacheBackend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _version_key(self, wos_serial: int) -> str:
+        return f"wos:v:{wos_serial}"
+
+    def _ensure_version(self, wos_serial: int) -> int:
+        key = self._version_key(wos_serial)
+        version = self.backend.get(key)
+        if version is None:
+            # Start from the clock rather than zero, so a counter lost to eviction or a
+            # restart never repeats a version (and ETag) that was handed out before.
+            self.backend.add(key, time.time_ns() // 1000)
+            version = self.backend.get(key)
+        return version
+
+    def version(self, wos_serial: int) -> int | None:
+        """Return the current version of a WOS, or None if the backend is unavailable."""
+        try:
+            return self._ensure_version(wos_serial)
+        except CacheBackendError as e:
+            logger.warning("WOS cache unavailable: %s", e)
+            return None
+
+    def bump(self, wos_serial: int) -> None:
+        """Invalidate everything cached for a WOS, in every worker. Call after a write commits."""
+        try:
+            self._ensure_version(wos_serial)
+            self.backend.incr(self._version_key(wos_serial))
+        except CacheBackendError as e:
+            logger.warning("Failed to invalidate WOS %s in cache: %s", wos_serial, e)
+
+    def etag(self, kind: str, wos_serial: int, version: int, *key) -> str:
+        """Return a strong ETag for a resource of a WOS at the given version."""
+        parts = "-".join(str(k) for k in (kind, wos_serial, *key))
+        return f'"{parts}-{version}"'
+
+    def get_or_load(self, kind: str, wos_serial: int, version: int | None, loader, *key):
+        """
+        Return the cached value for (kind, wos_serial, *key) if it was loaded at `version`,
+        otherwise call loader() and cache its result unless the WOS changed meanwhile.
+        A None version bypasses the cache.
+        """
+        if version is None:
+            return loader()
+        entry_key = "wos:e:" + ":".join(str(k) for k in (kind, wos_serial, *key))
+        try:
+            entry = self.backend.get(entry_key)
+        except CacheBackendError:
+            return loader()
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        if self.version(wos_serial) == version:
+            try:
+                self.backend.set(entry_key, (version, value), ttl=self.ttl)
+            except CacheBackendError:
+                pass
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached entries and versions."""
+        self.backend.clear()
+
+
+def cached(key: str, loader, ttl: float | None = CACHE_TTL):
+    """Return backend[key], loading and storing it with loader() on a miss."""
+    try:
+        value = backend.get(key)
+    except CacheBackendError:
+        return loader()
+    if value is None:
+        value = loader()
+        try:
+            backend.set(key, value, ttl=ttl)
+        except CacheBackendError:
+            pass
+    return value
+
+
+async def _call_backend(method, *args, **kwargs):
+    # Shared backends wait on flock or a socket: run them in a worker thread so they never
+    # stall the event loop. The in-process LRU is cheap enough to call directly.
+    if isinstance(backend, MemoryBackend):
+        return method(*args, **kwargs)
+    return await anyio.to_thread.run_sync(functools.partial(method, *args, **kwargs))
+
+
+async def cached_async(key: str, loader, ttl: float | None = CACHE_TTL):
+    """Like cached(), for an async loader: `await loader()` on a miss."""
+    try:
+        value = await _call_backend(backend.get, key)
+    except CacheBackendError:
+        return await loader()
+    if value is None:
+        value = await loader()
+        try:
+            await _call_backend(backend.set, key, value, ttl=ttl)
+        except CacheBackendError:
+            pass
+    return value
+
+
+def etag_matches(if_none_match: str | None, etag: str, exists: bool = True) -> bool:
+    """
+    Return True if an If-None-Match header value matches the ETag (weak comparison).
+    `*` matches only when `exists` is true: pass False until the resource has been loaded.
+    """
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return ("*" in candidates and exists) or etag in (c.removeprefix("W/") for c in candidates)
+
+
+backend = create_backend()
+wos_cache = WOSCache(backend)
+
+
+@vetting_events.subscribe
+def _invalidate_vetted_wos(wos_serial: int, changes: list[dict]) -> None:
+    wos_cache.bump(wos_serial)
@@ -0,0 +1,177 @@
+"""
+Circuit breaker for the main Sybase engine.
+
+After DB_BREAKER_FAILURE_THRESHOLD consecutive connection or timeout failures the breaker
+opens and new connections and statements are refused at once with 503, instead of each
+request waiting out the ODBC timeouts. After DB_BREAKER_RESET_SECONDS it lets a limited
+number of probe statements through (half-open); one success closes it again, one failure
+re-opens it.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+import db_retry
+import deadlines
+import metrics
+from exceptions import CircuitOpenError
+
+DB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURE_THRESHOLD", 5))
+DB_BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", 30))
+DB_BREAKER_HALF_OPEN_PROBES = int(os.getenv("DB_BREAKER_HALF_OPEN_PROBES", 1))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+metrics.describe("db_breaker_transitions_total", "Circuit breaker state changes.")
+metrics.describe("db_breaker_rejected_total", "Database calls refused while the circuit breaker was open.")
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = DB_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = DB_BREAKER_RESET_SECONDS,
+        half_open_probes: int = DB_BREAKER_HALF_OPEN_PROBES,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._last_error = None
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        metrics.inc("db_breaker_transitions_total", breaker=self.name, state=state)
+
+    def _refresh(self) -> None:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._transition(HALF_OPEN)
+            self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _retry_after(self) -> int:
+        return max(1, int(self.reset_seconds - (self._clock() - self._opened_at) + 0.999))
+
+    def _reject(self) -> None:
+        metrics.inc("db_breaker_rejected_total", breaker=self.name)
+        raise CircuitOpenError(retry_after=self._retry_after() if self._state == OPEN else 1)
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if the breaker is open. Does not take a probe slot."""
+        with self._lock:
+            self._refresh()
+            if self._state == OPEN:
+                self._reject()
+
+    def acquire(self) -> None:
+        """
+        Admit one call: always when closed, up to the probe limit when half-open.
+        Raises CircuitOpenError otherwise. Every admitted call must end in
+        record_success() or record_failure().
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self._reject()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._failures += 1
+            if error is not None:
+                self._last_error = str(error).splitlines()[0][:200] if str(error) else type(error).__name__
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = self._clock()
+                self._transition(OPEN)
+
+    def snapshot(self) -> dict:
+        """Return the breaker state for diagnostics."""
+        with self._lock:
+            self._refresh()
+            info = {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "last_error": self._last_error,
+            }
+            if self._state == OPEN:
+                info["retry_after_seconds"] = self._retry_after()
+            return info
+
+
+def _is_outage(context) -> bool:
+    """True for connect failures, lost connections and timeouts; False for query errors."""
+    if isinstance(context.original_exception, CircuitOpenError):
+        return False
+    if deadlines.exceeded():
+        # The request's own deadline cut the statement short; the server is not at fault.
+        return False
+    if context.is_disconnect or context.connection is None:
+        return True
+    error = context.sqlalchemy_exception
+    if not isinstance(error, DBAPIError) or db_retry.is_retryable(error):
+        return False
+    message = str(error.orig)
+    # ODBC SQLSTATEs: 08xxx connection exceptions, HYT00/HYT01 timeouts.
+    return any(state in message for state in ("[08", "[HYT00]", "[HYT01]"))
+
+
+def attach(engine, breaker: CircuitBreaker) -> None:
+    """Guard an engine's connects and statements with the breaker. Non-Engine objects are skipped."""
+    if not isinstance(engine, Engine):
+        return
+
+    @event.listens_for(engine, "do_connect")
+    def _gate_connect(dialect, conn_rec, cargs, cparams):
+        breaker.check()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _gate_statement(conn, cursor, statement, parameters, context, executemany):
+        breaker.acquire()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _statement_ok(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    @event.listens_for(engine, "handle_error")
+    def _statement_failed(context):
+        if isinstance(context.original_exception, CircuitOpenError):
+            return
+        if _is_outage(context):
+            breaker.record_failure(context.original_exception)
+        else:
+            # The server answered (constraint, syntax, deadlock...), so it is reachable.
+            breaker.record_success()
@@ -0,0 +1,86 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+When several requests ask for the same data at the same time, only the first (the leader)
+runs the query; the others wait for it and share its result or its exception. Nothing is
+kept once the leader finishes, so results are never staler than the query itself.
+
+Followers wait no longer than their own request deadline. A leader that ran out of its
+deadline says nothing about the followers' budgets, so they retry and one becomes leader.
+"""
+
+import threading
+from datetime import date, datetime
+
+import deadlines
+from exceptions import DeadlineExceededError
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+
+    def do(self, key, fn):
+        """Run fn() once per key among concurrent callers and return its result to all of them."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+            if leader:
+                break
+
+            deadline = deadlines.current()
+            if not call.event.wait(deadline.remaining() if deadline else None):
+                deadline.cancel("deadline")
+                deadline.check()
+            if isinstance(call.error, DeadlineExceededError):
+                if deadline is not None:
+                    deadline.check()
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being loaded."""
+        with self._lock:
+            return len(self._calls)
+
+
+def _normalize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def request_key(route: str, **params) -> tuple:
+    """Build a coalescing key from a route name and its parameters, ignoring unset ones."""
+    return (route,) + tuple(
+        (name, _normalize(value)) for name, value in sorted(params.items()) if value is not None
+    )
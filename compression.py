@@ -0,0 +1,206 @@
+"""
+Negotiated response compression (gzip, and zstd/brotli when their packages are installed).
+
+Large list responses such as an unfiltered /wosline are compressed according to the
+client's Accept-Encoding; small responses and the auth endpoints are sent as-is.
+Streaming responses are compressed chunk by chunk so they keep streaming.
+"""
+
+import os
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+COMPRESSION_EXCLUDE_PATHS = tuple(
+    p.strip()
+    for p in os.getenv("COMPRESSION_EXCLUDE_PATHS", "/login,/forgot-password,/reset-password").split(",")
+    if p.strip()
+)
+
+# Chunks at least this large are compressed on a worker thread to keep the event loop free.
+THREAD_MIN_SIZE = 256 * 1024
+
+# Content types that are already compressed or must not be buffered.
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "application/gzip", "application/zip", "image/", "audio/", "video/")
+
+
+class _GzipCodec:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._obj.compress(data) + self._obj.flush(flush_mode)
+
+
+class _ZstdCodec:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._obj.compress(data) + self._obj.flush(flush_mode)
+
+
+class _BrotliCodec:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._obj.process(data)
+        return out + (self._obj.finish() if final else self._obj.flush())
+
+
+def available_encodings() -> list[str]:
+    """Return supported content codings in server preference order."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def _make_codec(encoding: str):
+    if encoding == "zstd":
+        return _ZstdCodec(ZSTD_LEVEL)
+    if encoding == "br":
+        return _BrotliCodec(BROTLI_QUALITY)
+    return _GzipCodec(GZIP_LEVEL)
+
+
+def choose_encoding(accept_encoding: str, supported: list[str] | None = None) -> str | None:
+    """
+    Pick a content coding from an Accept-Encoding header value.
+    Honours q-values and '*'; ties are broken by server preference. Returns None for identity.
+    """
+    if supported is None:
+        supported = available_encodings()
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware applying the negotiated content coding to HTTP responses."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        exclude_paths: tuple[str, ...] = COMPRESSION_EXCLUDE_PATHS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message = None
+        self.passthrough = False
+        self.started = False
+        self.codec = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "").lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or any(content_type.startswith(t) for t in EXCLUDED_CONTENT_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Hold the start message until the first body chunk decides the headers.
+                self.initial_message = message
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(self.initial_message)
+                await self.send(message)
+                self.passthrough = True
+                return
+            self.codec = _make_codec(self.encoding)
+            body = await self._compress(body, final=not more_body)
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.initial_message)
+        else:
+            body = await self._compress(body, final=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def _compress(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= THREAD_MIN_SIZE:
+            return await anyio.to_thread.run_sync(self.codec.compress, data, final)
+        return self.codec.compress(data, final)
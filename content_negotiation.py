@@ -0,0 +1,175 @@
+"""
+Accept-header negotiation for bulk data endpoints.
+
+JSON stays the default. Clients may ask for MessagePack (row-oriented: a column header plus
+one array per row) or Arrow IPC stream (columnar). Quantities and prices are encoded as
+native floats and datetimes as native timestamps. Both encoders are optional dependencies;
+a format whose package is missing is simply not offered.
+"""
+
+import io
+import typing
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional dependency
+    pyarrow = None
+
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+_MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.apache.arrow.file": ARROW_MEDIA_TYPE,
+}
+
+
+def available_media_types() -> list[str]:
+    """Return the media types this server can produce, JSON first."""
+    media_types = [JSON_MEDIA_TYPE]
+    if msgpack is not None:
+        media_types.append(MSGPACK_MEDIA_TYPE)
+    if pyarrow is not None:
+        media_types.append(ARROW_MEDIA_TYPE)
+    return media_types
+
+
+def choose_media_type(accept: str, supported: list[str] | None = None) -> str | None:
+    """
+    Pick a media type from an Accept header value. Honours q-values and wildcards;
+    ties go to the earlier entry in `supported`. Returns None when nothing is acceptable.
+    """
+    if supported is None:
+        supported = available_media_types()
+    if not accept.strip():
+        return supported[0]
+    weights = {}
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        media_type = _MEDIA_TYPE_ALIASES.get(media_type.lower(), media_type.lower())
+        if not media_type:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[media_type] = max(q, weights.get(media_type, 0.0))
+
+    best, best_q = None, 0.0
+    for media_type in supported:
+        major = media_type.split("/")[0]
+        q = weights.get(media_type, weights.get(f"{major}/*", weights.get("*/*", 0.0)))
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def _unwrap_optional(annotation):
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    return args[0] if args else annotation
+
+
+def _column_values(rows: list, name: str) -> list:
+    values = []
+    for row in rows:
+        value = row.get(name) if isinstance(row, dict) else getattr(row, name, None)
+        if isinstance(value, Decimal):
+            value = float(value)
+        values.append(value)
+    return values
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            # Sybase datetimes are naive; ship the wall-clock value unchanged.
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+def encode_msgpack(rows: list, schema: type[BaseModel]) -> bytes:
+    """Encode rows as {"columns": [...], "rows": [[...], ...]}."""
+    names = list(schema.model_fields)
+    columns = [_column_values(rows, name) for name in names]
+    packed_rows = [list(values) for values in zip(*columns)] if rows else []
+    return msgpack.packb({"columns": names, "rows": packed_rows}, default=_msgpack_default)
+
+
+def _arrow_type(annotation):
+    annotation = _unwrap_optional(annotation)
+    if annotation is int:
+        return pyarrow.int64()
+    if annotation is float:
+        return pyarrow.float64()
+    if annotation is datetime:
+        return pyarrow.timestamp("us")
+    if annotation is bool:
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+
+def arrow_schema(schema: type[BaseModel]):
+    """Build an Arrow schema from a pydantic response schema."""
+    return pyarrow.schema(
+        [
+            pyarrow.field(name, _arrow_type(field.annotation), nullable=not field.is_required())
+            for name, field in schema.model_fields.items()
+        ]
+    )
+
+
+def encode_arrow(rows: list, schema: type[BaseModel]) -> bytes:
+    """Encode rows as a single-batch Arrow IPC stream."""
+    pa_schema = arrow_schema(schema)
+    arrays = [pyarrow.array(_column_values(rows, f.name), type=f.type) for f in pa_schema]
+    table = pyarrow.Table.from_arrays(arrays, schema=pa_schema)
+    sink = io.BytesIO()
+    with pyarrow.ipc.new_stream(sink, pa_schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def prefers_json(request: Request) -> bool:
+    """Return True if the client's Accept header resolves to JSON."""
+    return choose_media_type(request.headers.get("accept", "")) == JSON_MEDIA_TYPE
+
+
+def negotiate_rows(request: Request, rows: list, schema: type[BaseModel]):
+    """
+    Return a binary Response when the client asked for one, otherwise `rows` unchanged
+    so FastAPI serializes them as JSON through the route's response_model.
+    Raises HTTPException(406) when no offered format is acceptable.
+    """
+    media_type = choose_media_type(request.headers.get("accept", ""))
+    if media_type is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Supported media types: {', '.join(available_media_types())}",
+        )
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = encode_msgpack(rows, schema)
+    elif media_type == ARROW_MEDIA_TYPE:
+        body = encode_arrow(rows, schema)
+    else:
+        return rows
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
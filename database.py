@@ -1,18 +1,64 @@
 import os
 import urllib.parse
+from fastapi import HTTPException
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
+import circuit_breaker
+import deadlines
+
 SYBASE_SERVER = os.getenv("SYBASE_SERVER")
 SYBASE_PORT = os.getenv("SYBASE_PORT")
 SYBASE_DB = os.getenv("SYBASE_DB")
 MAIN_DB_USER = os.getenv("MAIN_DB_USER")
 MAIN_DB_PASS = os.getenv("MAIN_DB_PASS")
+# ODBC login timeout in seconds for the main engine.
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+
+# Optional read replica. Leave REPLICA_SYBASE_SERVER unset to send every read to the primary.
+REPLICA_SYBASE_SERVER = os.getenv("REPLICA_SYBASE_SERVER")
+REPLICA_SYBASE_PORT = os.getenv("REPLICA_SYBASE_PORT", SYBASE_PORT)
+REPLICA_SYBASE_DB = os.getenv("REPLICA_SYBASE_DB", SYBASE_DB)
+REPLICA_DB_USER = os.getenv("REPLICA_DB_USER", MAIN_DB_USER)
+REPLICA_DB_PASS = os.getenv("REPLICA_DB_PASS", MAIN_DB_PASS)
+
+# Optional asyncio engine for the /async read endpoints, e.g. "sqlite+aiosqlite:///./wos.db".
+# Needs an async DBAPI driver and SQLAlchemy's asyncio extra (greenlet). Empty = disabled.
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL", "")
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", 20))
+
+# Optional embedded mirror of the WOS read tables, served while Sybase is down or slow,
+# e.g. "sqlite:///./wos_audit_mirror.db". Empty = disabled.
+MIRROR_DB_URL = os.getenv("MIRROR_DB_URL", "")
+
+# Station partitioning. Each entry maps station codes to a Sybase server holding their
+# partition, e.g. "K,U=sybase-north:5000/auditdb;B,V=sybase-south:5000/auditdb".
+# Stations not listed stay on the main server.
+STATION_CODES = ("K", "U", "B", "V", "D", "P", "A", "G")
+STATION_SHARDS = os.getenv("STATION_SHARDS", "")
+
+def parse_station_shards(value):
+    """
+    Parse a STATION_SHARDS value into {station: (server, port, database)}.
+    Port and database default to the main server's. Raises ValueError on unknown stations.
+    """
+    shards = {}
+    for entry in filter(None, (e.strip() for e in value.split(";"))):
+        stations, _, target = entry.partition("=")
+        address, _, db_name = target.strip().partition("/")
+        server, _, port = address.partition(":")
+        if not server:
+            raise ValueError(f"STATION_SHARDS entry has no server: {entry!r}")
+        for station in filter(None, (s.strip().upper() for s in stations.split(","))):
+            if station not in STATION_CODES:
+                raise ValueError(f"Unknown station code in STATION_SHARDS: {station!r}")
+            shards[station] = (server, port or SYBASE_PORT, db_name or SYBASE_DB)
+    return shards
 
-def get_connection_url(username, password):
+def get_connection_url(username, password, server=None, port=None, database=None):
     """
     Constructs the connection URL for Sybase ASE using pyodbc.
     Safely handles credentials to prevent connection string injection and
@@ -30,9 +76,9 @@ def get_connection_url(username, password):
 
     odbc_connect = (
         f"DRIVER={driver};"
-        f"Server={SYBASE_SERVER};"
-        f"Port={SYBASE_PORT};"
-        f"Database={SYBASE_DB};"
+        f"Server={server or SYBASE_SERVER};"
+        f"Port={port or SYBASE_PORT};"
+        f"Database={database or SYBASE_DB};"
         f"Uid={username};"
         f"Pwd={password};"
     )
@@ -49,16 +95,45 @@ def get_connection_url(username, password):
 # Use a lazy initialization for the main engine and session factory
 _main_engine = None
 _SessionLocal = None
+main_breaker = circuit_breaker.CircuitBreaker("sybase")
+
+_replica_engine = None
+_ReplicaSessionLocal = None
+replica_breaker = circuit_breaker.CircuitBreaker("sybase-replica")
+
+# Engines and session factories of the station partitions, keyed by (server, port, database).
+_station_shards = parse_station_shards(STATION_SHARDS)
+_station_engines = {}
+_StationSessionLocals = {}
+station_breakers = {}
+
+_async_engine = None
+_AsyncSessionLocal = None
+async_breaker = circuit_breaker.CircuitBreaker("async")
+
+_mirror_engine = None
+_MirrorSessionLocal = None
 
 _reset_engine = None
 _ResetSessionLocal = None
 
 SQLITE_URL = "sqlite:///./password_reset.db"
 
+# App-maintained state that does not belong in Sybase (change log, job store, ...).
+LOCAL_DB_URL = os.getenv("LOCAL_DB_URL", "sqlite:///./wos_audit_local.db")
+_local_engine = None
+_LocalSessionLocal = None
+
 def get_main_engine():
     global _main_engine
     if _main_engine is None:
-        _main_engine = create_engine(get_connection_url(MAIN_DB_USER, MAIN_DB_PASS))
+        _main_engine = create_engine(
+            get_connection_url(MAIN_DB_USER, MAIN_DB_PASS),
+            pool_pre_ping=True,
+            connect_args={"timeout": DB_CONNECT_TIMEOUT},
+        )
+        circuit_breaker.attach(_main_engine, main_breaker)
+        deadlines.attach(_main_engine)
     return _main_engine
 
 def get_session_local():
@@ -68,6 +143,132 @@ def get_session_local():
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return _SessionLocal
 
+def replica_configured():
+    """Return True if a read replica is configured."""
+    return bool(REPLICA_SYBASE_SERVER) or _ReplicaSessionLocal is not None
+
+def get_replica_engine():
+    global _replica_engine
+    if _replica_engine is None:
+        _replica_engine = create_engine(
+            get_connection_url(
+                REPLICA_DB_USER, REPLICA_DB_PASS,
+                server=REPLICA_SYBASE_SERVER, port=REPLICA_SYBASE_PORT, database=REPLICA_SYBASE_DB,
+            ),
+            pool_pre_ping=True,
+            connect_args={"timeout": DB_CONNECT_TIMEOUT},
+        )
+        circuit_breaker.attach(_replica_engine, replica_breaker)
+        deadlines.attach(_replica_engine)
+    return _replica_engine
+
+def get_replica_session_local():
+    global _ReplicaSessionLocal
+    if _ReplicaSessionLocal is None:
+        engine = get_replica_engine()
+        _ReplicaSessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=engine, info={"source": "replica"}
+        )
+    return _ReplicaSessionLocal
+
+def station_partitioned():
+    """Return True if any station is mapped to a server other than the main one."""
+    return bool(_station_shards)
+
+def _get_shard_session_local(target):
+    if target not in _StationSessionLocals:
+        server, port, db_name = target
+        engine = create_engine(
+            get_connection_url(MAIN_DB_USER, MAIN_DB_PASS, server=server, port=port, database=db_name),
+            pool_pre_ping=True,
+            connect_args={"timeout": DB_CONNECT_TIMEOUT},
+        )
+        breaker = circuit_breaker.CircuitBreaker(f"sybase-{server}")
+        circuit_breaker.attach(engine, breaker)
+        deadlines.attach(engine)
+        _station_engines[target] = engine
+        station_breakers[target] = breaker
+        _StationSessionLocals[target] = sessionmaker(
+            autocommit=False, autoflush=False, bind=engine,
+            info={"source": f"station:{server}:{port}/{db_name}"},
+        )
+    return _StationSessionLocals[target]
+
+def get_station_session_local(station):
+    """Return the session factory of the server holding a station's partition."""
+    target = _station_shards.get(station)
+    if target is None:
+        return get_session_local()
+    return _get_shard_session_local(target)
+
+def station_partitions():
+    """
+    Return [(stations, session factory or None)] covering every station once. Stations on
+    the main server are grouped under None, so callers can use their own main session.
+    """
+    groups = {}
+    for station in STATION_CODES:
+        groups.setdefault(_station_shards.get(station), []).append(station)
+    return [
+        (tuple(stations), None if target is None else _get_shard_session_local(target))
+        for target, stations in groups.items()
+    ]
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        options = {"pool_pre_ping": True}
+        if not ASYNC_DB_URL.startswith("sqlite"):
+            options["pool_size"] = ASYNC_DB_POOL_SIZE
+        _async_engine = create_async_engine(ASYNC_DB_URL, **options)
+        # Engine events are registered on the sync facade and fire for async use too.
+        circuit_breaker.attach(_async_engine.sync_engine, async_breaker)
+        deadlines.attach(_async_engine.sync_engine)
+    return _async_engine
+
+def get_async_session_local():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _AsyncSessionLocal = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _AsyncSessionLocal
+
+def mirror_configured():
+    """Return True if the local WOS mirror is configured."""
+    return bool(MIRROR_DB_URL) or _MirrorSessionLocal is not None
+
+def get_mirror_engine():
+    global _mirror_engine
+    if _mirror_engine is None:
+        _mirror_engine = create_engine(MIRROR_DB_URL, connect_args={"check_same_thread": False})
+    return _mirror_engine
+
+def get_mirror_session_local():
+    global _MirrorSessionLocal
+    if _MirrorSessionLocal is None:
+        engine = get_mirror_engine()
+        _MirrorSessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=engine, info={"source": "mirror"}
+        )
+    return _MirrorSessionLocal
+
+def session_source(db) -> str:
+    """Return the database a session reads: primary, replica, mirror or station:<server>."""
+    return getattr(db, "info", {}).get("source", "primary")
+
+def naive_local(value):
+    """
+    Return a datetime as the naive local wall-clock time Sybase stores. Aware values (query
+    parameters with an offset) are converted to this server's time zone first, so every read
+    path gives an offset the same meaning.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
 def get_reset_engine():
     global _reset_engine
     if _reset_engine is None:
@@ -81,8 +282,23 @@ def get_reset_session_local():
         _ResetSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return _ResetSessionLocal
 
+def get_local_engine():
+    global _local_engine
+    if _local_engine is None:
+        _local_engine = create_engine(LOCAL_DB_URL, connect_args={"check_same_thread": False})
+    return _local_engine
+
+def get_local_session_local():
+    global _LocalSessionLocal
+    if _LocalSessionLocal is None:
+        engine = get_local_engine()
+        _LocalSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return _LocalSessionLocal
+
 Base = declarative_base()
 ResetBase = declarative_base()
+LocalBase = declarative_base()
+MirrorBase = declarative_base()
 
 def get_user_engine(username, password):
     """
@@ -102,6 +318,17 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    Dependency to get an asyncio DB session. Raises HTTPException(404) when ASYNC_DB_URL
+    is not configured.
+    """
+    if not ASYNC_DB_URL:
+        raise HTTPException(status_code=404, detail="Async read endpoints are not enabled")
+    AsyncSessionLocal = get_async_session_local()
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def get_reset_db():
     """
     Dependency to get the password reset DB session (SQLite).
@@ -112,3 +339,14 @@ def get_reset_db():
         yield db
     finally:
         db.close()
+
+def get_local_db():
+    """
+    Dependency to get the local state DB session (SQLite).
+    """
+    LocalSessionLocal = get_local_session_local()
+    db = LocalSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
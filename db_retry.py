@@ -0,0 +1,95 @@
+"""
+Automatic retry of Sybase deadlock victims and lock timeouts.
+
+The WOS tables are `lock allpages`, so concurrent vetting writes can deadlock. ASE rolls the
+victim's transaction back (error 1205) and the work can simply be run again; the same holds
+for a lock wait that timed out (12205). Other errors are raised unchanged.
+"""
+
+import functools
+import os
+import random
+import re
+import time
+
+from sqlalchemy.exc import DBAPIError
+
+import metrics
+from exceptions import DatabaseError
+
+DEADLOCK_RETRY_ATTEMPTS = int(os.getenv("DEADLOCK_RETRY_ATTEMPTS", 3))
+DEADLOCK_RETRY_BASE_DELAY = float(os.getenv("DEADLOCK_RETRY_BASE_DELAY", 0.05))
+DEADLOCK_RETRY_MAX_DELAY = float(os.getenv("DEADLOCK_RETRY_MAX_DELAY", 1.0))
+
+# ASE messages: 1205 deadlock victim, 12205 lock wait timeout, 12207 lock not acquired (NOWAIT).
+RETRYABLE_ERRORS = frozenset({1205, 12205, 12207})
+RETRYABLE_SQLSTATES = frozenset({"40001"})
+
+_ERROR_NUMBER = re.compile(r"(?:\(|Msg |error |SQL Server message )(\d{4,5})\b")
+
+metrics.describe("db_retries_total", "Database operations retried after a deadlock or lock timeout.")
+metrics.describe("db_retries_exhausted_total", "Database operations that still failed after the last retry.")
+
+
+def _driver_errors(exc: BaseException):
+    """Yield the exception and the errors it wraps (DatabaseError.cause, DBAPIError.orig, __cause__)."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        if isinstance(exc, DatabaseError) and exc.cause is not None:
+            exc = exc.cause
+        elif isinstance(exc, DBAPIError) and exc.orig is not None:
+            exc = exc.orig
+        else:
+            exc = exc.__cause__
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True if exc is (or wraps) a Sybase deadlock or lock timeout error."""
+    for error in _driver_errors(exc):
+        for arg in getattr(error, "args", ()):
+            if isinstance(arg, int) and arg in RETRYABLE_ERRORS:
+                return True
+            if not isinstance(arg, str):
+                continue
+            if arg in RETRYABLE_SQLSTATES:
+                return True
+            if any(int(n) in RETRYABLE_ERRORS for n in _ERROR_NUMBER.findall(arg)):
+                return True
+            if "deadlock" in arg.lower():
+                return True
+    return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+    ceiling = min(DEADLOCK_RETRY_MAX_DELAY, DEADLOCK_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+def retry_on_deadlock(operation: str, attempts: int | None = None):
+    """
+    Decorator re-running a unit of work when it fails as a deadlock victim or on a lock
+    timeout. The wrapped function must roll back its own transaction on failure (the
+    repositories do), so each attempt starts clean.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            max_attempts = attempts or DEADLOCK_RETRY_ATTEMPTS
+            attempt = 1
+            while True:
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    if attempt >= max_attempts:
+                        metrics.inc("db_retries_exhausted_total", operation=operation)
+                        raise
+                    metrics.inc("db_retries_total", operation=operation)
+                    time.sleep(backoff_delay(attempt))
+                    attempt += 1
+        return wrapper
+    return decorator
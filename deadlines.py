@@ -0,0 +1,203 @@
+"""
+Per-request deadlines enforced on Sybase statements.
+
+Routes declare a deadline class with the `deadline` dependency; clients may ask for a
+shorter budget with the X-Request-Timeout header (seconds, never above the route class
+default). While the request runs, every statement on an attached engine:
+
+- is refused with DeadlineExceededError (504) once the deadline has passed,
+- gets the remaining time as its ODBC query timeout (pyodbc `Connection.timeout`),
+- is cancelled (`cursor.cancel()`) when the deadline passes or the client disconnects.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from exceptions import DeadlineExceededError
+
+DEADLINE_HEADER = "X-Request-Timeout"
+# How often a running request checks for client disconnects.
+DEADLINE_POLL_SECONDS = float(os.getenv("DEADLINE_POLL_SECONDS", 0.5))
+
+_DEFAULTS = {
+    "reads": 15,
+    "heavy": 120,
+    "writes": 60,
+    "auth": 15,
+}
+DEADLINES = {
+    name: float(os.getenv(f"DEADLINE_{name.upper()}_SECONDS", seconds))
+    for name, seconds in _DEFAULTS.items()
+}
+
+_current: contextvars.ContextVar["Deadline | None"] = contextvars.ContextVar("deadline", default=None)
+
+
+class Deadline:
+    """A request's time budget and the cursors currently running under it."""
+
+    def __init__(self, seconds: float, clock=time.monotonic):
+        self._clock = clock
+        self.seconds = seconds
+        self.expires_at = clock() + seconds
+        self.reason = None
+        self._lock = threading.Lock()
+        self._cursors = set()
+
+    def remaining(self) -> float:
+        return self.expires_at - self._clock()
+
+    @property
+    def exceeded(self) -> bool:
+        return self.reason is not None or self.remaining() <= 0
+
+    def check(self) -> None:
+        """Raise DeadlineExceededError if the deadline has passed or the request was cancelled."""
+        if self.reason == "disconnect":
+            raise DeadlineExceededError("Request cancelled: client disconnected")
+        if self.exceeded:
+            raise DeadlineExceededError(f"Request exceeded its {self.seconds:g}s deadline")
+
+    def cancel(self, reason: str) -> None:
+        """Mark the request cancelled and cancel any statement it is running."""
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            cursors = list(self._cursors)
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def register(self, cursor) -> None:
+        with self._lock:
+            self._cursors.add(cursor)
+
+    def unregister(self, cursor) -> None:
+        with self._lock:
+            self._cursors.discard(cursor)
+
+
+def current() -> "Deadline | None":
+    """Return the deadline of the request being served, if any."""
+    return _current.get()
+
+
+def exceeded() -> bool:
+    """True if the current request's deadline has passed or it was cancelled."""
+    deadline = _current.get()
+    return deadline is not None and deadline.exceeded
+
+
+async def within(awaitable):
+    """
+    Await `awaitable` for at most the current request's remaining time. For async routes,
+    whose drivers may not support cursor.cancel(). Raises DeadlineExceededError.
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return await awaitable
+    if deadline.exceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        deadline.check()
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        deadline.cancel("deadline")
+        deadline.check()
+        raise
+
+
+def budget(route_class: str, header_value: str | None) -> float:
+    """
+    Resolve a request's budget from its route class. The optional header can only shorten
+    it, so clients cannot opt out of the route's deadline.
+    """
+    seconds = DEADLINES[route_class]
+    if header_value:
+        try:
+            requested = float(header_value)
+        except ValueError:
+            requested = None
+        if requested is not None and requested > 0 and math.isfinite(requested):
+            seconds = min(requested, seconds)
+    return seconds
+
+
+async def _watch(request: Request, deadline: Deadline) -> None:
+    while deadline.reason is None:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            deadline.cancel("deadline")
+            return
+        if await request.is_disconnected():
+            deadline.cancel("disconnect")
+            return
+        await asyncio.sleep(min(DEADLINE_POLL_SECONDS, remaining))
+
+
+def deadline(route_class: str):
+    """Route dependency giving the request a deadline from the named class."""
+    if route_class not in DEADLINES:
+        raise ValueError(f"Unknown deadline class: {route_class!r}")
+
+    async def dependency(request: Request):
+        current_deadline = Deadline(budget(route_class, request.headers.get(DEADLINE_HEADER)))
+        _current.set(current_deadline)
+        watcher = asyncio.create_task(_watch(request, current_deadline))
+        try:
+            yield current_deadline
+        finally:
+            watcher.cancel()
+
+    return dependency
+
+
+def attach(engine) -> None:
+    """Enforce request deadlines on an engine's statements. Non-Engine objects are skipped."""
+    if not isinstance(engine, Engine):
+        return
+
+    @event.listens_for(engine, "before_execute")
+    def _apply_timeout(conn, clauseelement, multiparams, params, execution_options):
+        current_deadline = _current.get()
+        if current_deadline is not None:
+            current_deadline.check()
+        dbapi_connection = conn.connection.dbapi_connection
+        if hasattr(dbapi_connection, "timeout"):
+            # pyodbc applies Connection.timeout as the query timeout of new cursors.
+            dbapi_connection.timeout = (
+                max(1, math.ceil(current_deadline.remaining())) if current_deadline else 0
+            )
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _track_cursor(conn, cursor, statement, parameters, context, executemany):
+        current_deadline = _current.get()
+        if current_deadline is not None:
+            current_deadline.register(cursor)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _untrack_cursor(conn, cursor, statement, parameters, context, executemany):
+        current_deadline = _current.get()
+        if current_deadline is not None:
+            current_deadline.unregister(cursor)
+
+    @event.listens_for(engine, "handle_error")
+    def _deadline_error(context):
+        current_deadline = _current.get()
+        if current_deadline is None:
+            return
+        if context.cursor is not None:
+            current_deadline.unregister(context.cursor)
+        if current_deadline.exceeded:
+            current_deadline.check()
@@ -16,3 +16,53 @@ class NotFoundError(Exception):
     """Raised when a requested resource is not found."""
     def __init__(self, message: str = "Resource not found"):
         super().__init__(message)
+
+
+class ChangeTokenExpiredError(Exception):
+    """Raised when a change-feed token predates the retained change log; the client must resync."""
+    def __init__(self, message: str = "Change token has expired; fetch a full snapshot"):
+        super().__init__(message)
+
+
+class BadRequestError(Exception):
+    """Raised when a request parameter is malformed."""
+    def __init__(self, message: str = "Bad request"):
+        super().__init__(message)
+
+
+class IdempotencyKeyMismatchError(Exception):
+    """Raised when an Idempotency-Key is reused with a different request."""
+    def __init__(self, message: str = "Idempotency-Key was already used with a different request"):
+        super().__init__(message)
+
+
+class IdempotencyKeyInProgressError(Exception):
+    """Raised when the original request for an Idempotency-Key is still running."""
+    def __init__(self, message: str = "A request with this Idempotency-Key is still in progress"):
+        super().__init__(message)
+
+
+class ServiceUnavailableError(Exception):
+    """Raised when a dependency is temporarily unavailable; the client should retry later."""
+    def __init__(self, message: str = "Service temporarily unavailable", retry_after: int | None = None):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """Raised without contacting Sybase while the database circuit breaker is open."""
+    def __init__(self, message: str = "Database unavailable", retry_after: int | None = None):
+        super().__init__(message, retry_after)
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a client has used up its request budget; headers describe the limit."""
+    def __init__(self, headers: dict, message: str = "Rate limit exceeded"):
+        self.headers = headers
+        super().__init__(message)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a request runs past its deadline or its client disconnects."""
+    def __init__(self, message: str = "Request deadline exceeded"):
+        super().__init__(message)
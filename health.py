@@ -0,0 +1,123 @@
+"""
+Liveness and readiness probes.
+
+Liveness only shows the process is serving requests. Readiness reports the result of a
+SELECT 1 that a background thread runs every HEALTH_PROBE_INTERVAL seconds on a pooled
+connection, so load balancer polling does not open sessions or hold connections. A result
+older than HEALTH_MAX_AGE is refreshed inline, with concurrent callers sharing one probe.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import bulkheads
+import database
+from coalescing import SingleFlight
+from repositories import run_test_query
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", 5))
+HEALTH_MAX_AGE = float(os.getenv("HEALTH_MAX_AGE", 15))
+
+
+def pool_status(engine) -> dict:
+    """Return the connection pool's counters (those the pool class supports)."""
+    pool = engine.pool
+    info = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            info[name] = counter()
+    return info
+
+
+class HealthProbe:
+    """Periodically checks database connectivity and caches the outcome."""
+
+    def __init__(
+        self,
+        engine_factory=database.get_main_engine,
+        interval: float = HEALTH_PROBE_INTERVAL,
+        max_age: float = HEALTH_MAX_AGE,
+        clock=time.monotonic,
+    ):
+        self.engine_factory = engine_factory
+        self.interval = interval
+        self.max_age = max_age
+        self._clock = clock
+        self._result = None
+        self._flight = SingleFlight()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _probe(self) -> dict:
+        started = self._clock()
+        try:
+            with self.engine_factory().connect() as conn:
+                run_test_query(conn)
+            error = None
+        except Exception as e:
+            error = getattr(e, "message", None) or str(e) or type(e).__name__
+        result = {
+            "ok": error is None,
+            "checked_at": datetime.now(),
+            "latency_ms": round((self._clock() - started) * 1000, 1),
+            "error": error,
+        }
+        self._result = (self._clock(), result)
+        return result
+
+    def refresh(self) -> dict:
+        """Run a probe now (shared with any probe already running) and return its result."""
+        return self._flight.do("db", self._probe)
+
+    def current(self) -> tuple[float, dict]:
+        """Return (age in seconds, result), refreshing first if missing or older than max_age."""
+        cached = self._result
+        if cached is None or self._clock() - cached[0] > self.max_age:
+            self.refresh()
+            cached = self._result
+        return self._clock() - cached[0], cached[1]
+
+    def last(self):
+        """Return the most recent result without probing, or None if no probe has run."""
+        cached = self._result
+        return cached[1] if cached is not None else None
+
+    def readiness(self) -> tuple[bool, dict]:
+        """Return (ready, details) from the cached probe, pool, breaker and bulkhead state."""
+        age, result = self.current()
+        breaker = database.main_breaker.snapshot()
+        ready = result["ok"] and breaker["state"] != "open"
+        details = {
+            "status": "ready" if ready else "not_ready",
+            "database": {
+                "ok": result["ok"],
+                "checked_at": result["checked_at"].isoformat(),
+                "age_seconds": round(age, 1),
+                "latency_ms": result["latency_ms"],
+                "error": result["error"],
+            },
+            "pool": pool_status(self.engine_factory()),
+            "breaker": breaker,
+            "bulkheads": bulkheads.snapshot(),
+        }
+        return ready, details
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="health-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+
+probe = HealthProbe()
@@ -0,0 +1,116 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, LargeBinary
+from database import LocalBase, get_local_engine
+
+class WOSLineChange(LocalBase):
+    """
+    SQLAlchemy model for the app-maintained log of vetting writes (SQLite).
+    WOSLine has no modification timestamp in Sybase, so the change feed reads this log.
+    """
+    __tablename__ = "wosline_change"
+    # AUTOINCREMENT so purged sequence numbers are never reused by later entries.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    WOSSerial = Column(Integer, index=True, nullable=False)
+    WOSLineSerial = Column(Integer, nullable=False)
+    ChangedAt = Column(DateTime, nullable=False)
+
+class VettingJob(LocalBase):
+    """
+    SQLAlchemy model for an asynchronous bulk vetting job (SQLite).
+    status: queued, running, completed or failed. A running job is leased to lease_owner,
+    which renews heartbeat_at per chunk; a lease left to expire may be claimed by another worker.
+    """
+    __tablename__ = "vetting_job"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(10), index=True, nullable=False)
+    total_lines = Column(Integer, nullable=False)
+    processed_lines = Column(Integer, nullable=False, default=0)
+    failed_lines = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    error = Column(Text)
+    lease_owner = Column(String(64))
+    heartbeat_at = Column(DateTime)
+
+class VettingJobLine(LocalBase):
+    """
+    SQLAlchemy model for one line update of a vetting job (SQLite).
+    status: pending, updated, not_found, invalid or failed.
+    """
+    __tablename__ = "vetting_job_line"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(32), index=True, nullable=False)
+    WOSSerial = Column(Integer, nullable=False)
+    WOSLineSerial = Column(Integer, nullable=False)
+    VettedQty = Column(Float, nullable=False)
+    status = Column(String(10), nullable=False, default="pending")
+    detail = Column(String(255))
+
+class IdempotencyKey(LocalBase):
+    """
+    SQLAlchemy model for a stored vetting write response keyed by Idempotency-Key (SQLite).
+    response is NULL while the original request is still running.
+    """
+    __tablename__ = "idempotency_key"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response = Column(LargeBinary)  # zlib-compressed JSON body
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+class WOSSummary(LocalBase):
+    """
+    SQLAlchemy model for the line totals of one WOS, maintained for /summary (SQLite).
+    Quantities and costs are sums over the WOS's lines; NULLs count as 0.
+    """
+    __tablename__ = "wos_summary"
+
+    WOSSerial = Column(Integer, primary_key=True)
+    CustomerCode = Column(String(4), index=True, nullable=False)
+    WOSType = Column(String(3), nullable=False)
+    closed = Column(Boolean, nullable=False, default=False)
+    line_count = Column(Integer, nullable=False, default=0)
+    vetted_line_count = Column(Integer, nullable=False, default=0)
+    authorised_qty = Column(Float, nullable=False, default=0.0)
+    vetted_qty = Column(Float, nullable=False, default=0.0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, nullable=False)
+
+class SummaryRollup(LocalBase):
+    """
+    SQLAlchemy model for the totals of all WOSSummary rows of one CustomerCode or WOSType
+    (SQLite). dimension: customer or wostype. Kept by adding deltas, never by rescanning.
+    """
+    __tablename__ = "summary_rollup"
+
+    dimension = Column(String(10), primary_key=True)
+    key = Column(String(10), primary_key=True)
+    wos_count = Column(Integer, nullable=False, default=0)
+    closed_wos_count = Column(Integer, nullable=False, default=0)
+    line_count = Column(Integer, nullable=False, default=0)
+    vetted_line_count = Column(Integer, nullable=False, default=0)
+    authorised_qty = Column(Float, nullable=False, default=0.0)
+    vetted_qty = Column(Float, nullable=False, default=0.0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+
+class SummaryState(LocalBase):
+    """
+    SQLAlchemy model for the sync position of the summaries (SQLite, one row, id=1).
+    line_seq and next_line_seq are the change log positions of the last two syncs.
+    """
+    __tablename__ = "summary_state"
+
+    id = Column(Integer, primary_key=True)
+    master_token = Column(String(255))
+    line_seq = Column(Integer, nullable=False, default=0)
+    next_line_seq = Column(Integer, nullable=False, default=0)
+    synced_at = Column(DateTime)
+
+# Create the tables in SQLite
+LocalBase.metadata.create_all(bind=get_local_engine())
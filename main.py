@@ -5,15 +5,28 @@ API layer: FastAPI routes that delegate to services and map exceptions to HTTP r
 import os
 from typing import Optional, List
 from datetime import datetime
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 import database
 import models
 import schemas
 import auth
+from cache import wos_cache, etag_matches
+from compression import CompressionMiddleware
+from content_negotiation import negotiate_rows, prefers_json
+import notifications
+import metrics
+import health
+from bulkheads import bulkhead
+from rate_limit import rate_limit, client_key, RateLimitHeadersMiddleware
+from deadlines import deadline, within
+from read_routing import (
+    get_read_db, get_primary_db, read_session, primary_session, from_mirror, record_write,
+)
 from repositories import get_user_count, seed_users, sync_db_users, run_test_query
 from services import (
     get_all_users as svc_get_all_users,
@@ -23,13 +36,53 @@ from services import (
     get_wos_line as svc_get_wos_line,
     update_wos_line as svc_update_wos_line,
     bulk_update_wos_lines as svc_bulk_update_wos_lines,
+    batch_update_wos_lines as svc_batch_update_wos_lines,
     get_correspondence as svc_get_correspondence,
     get_codetable_data as svc_get_codetable_data,
     login_user as svc_login_user,
     forgot_password as svc_forgot_password,
     reset_password as svc_reset_password,
+    get_wos_master_changes as svc_get_wos_master_changes,
+    get_wos_line_changes as svc_get_wos_line_changes,
+    purge_change_log,
+    submit_vetting_job as svc_submit_vetting_job,
+    get_vetting_job_status as svc_get_vetting_job_status,
+    request_fingerprint,
+    run_idempotent as svc_run_idempotent,
+    purge_idempotency_keys,
+    get_wos_masters_async as svc_get_wos_masters_async,
+    get_wos_master_by_serial_async as svc_get_wos_master_async,
+    get_wos_lines_async as svc_get_wos_lines_async,
+    get_wos_line_async as svc_get_wos_line_async,
+    get_codetable_data_async as svc_get_codetable_data_async,
+    get_correspondence_async as svc_get_correspondence_async,
+    export_wos_lines as svc_export_wos_lines,
+    get_summary_by_customer as svc_get_summary_by_customer,
+    get_customer_summary as svc_get_customer_summary,
+    get_summary_by_wos_type as svc_get_summary_by_wos_type,
+    get_wos_summaries as svc_get_wos_summaries,
+    get_wos_summary as svc_get_wos_summary,
+    query_wos_line_analytics as svc_query_wos_line_analytics,
+    get_analytics_status as svc_get_analytics_status,
+    search_wos_line_items as svc_search_wos_line_items,
+)
+from services.export_service import EXPORT_PARTITIONS
+from services.job_service import worker as job_worker
+from services.mirror_service import worker as mirror_worker
+from services.summary_service import SUMMARY_ENABLED, worker as summary_worker
+from services.analytics_service import ANALYTICS_ENABLED, worker as analytics_worker
+from services.item_search_service import ITEM_SEARCH_ENABLED, worker as item_search_worker
+from exceptions import (
+    DatabaseError,
+    NotFoundError,
+    BadRequestError,
+    ChangeTokenExpiredError,
+    IdempotencyKeyMismatchError,
+    IdempotencyKeyInProgressError,
+    ServiceUnavailableError,
+    RateLimitExceededError,
+    DeadlineExceededError,
 )
-from exceptions import DatabaseError, NotFoundError
 from models import VettedQtyValidationError
 
 
@@ -42,6 +95,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RateLimitHeadersMiddleware)
 
 
 # ---- Exception handlers: map domain exceptions to HTTP ----
@@ -61,6 +116,66 @@ def handle_database_error(request, exc: DatabaseError):
     )
 
 
+@app.exception_handler(BadRequestError)
+def handle_bad_request(request, exc: BadRequestError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(ChangeTokenExpiredError)
+def handle_change_token_expired(request, exc: ChangeTokenExpiredError):
+    return JSONResponse(
+        status_code=status.HTTP_410_GONE,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(IdempotencyKeyMismatchError)
+def handle_idempotency_key_mismatch(request, exc: IdempotencyKeyMismatchError):
+    return JSONResponse(
+        status_code=422,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(IdempotencyKeyInProgressError)
+def handle_idempotency_key_in_progress(request, exc: IdempotencyKeyInProgressError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(ServiceUnavailableError)
+def handle_service_unavailable(request, exc: ServiceUnavailableError):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers=headers,
+    )
+
+
+@app.exception_handler(RateLimitExceededError)
+def handle_rate_limit_exceeded(request, exc: RateLimitExceededError):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers=exc.headers,
+    )
+
+
+@app.exception_handler(DeadlineExceededError)
+def handle_deadline_exceeded(request, exc: DeadlineExceededError):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": str(exc)},
+    )
+
+
 @app.exception_handler(VettedQtyValidationError)
 def handle_vetted_qty_validation(request, exc: VettedQtyValidationError):
     return JSONResponse(
@@ -69,6 +184,67 @@ def handle_vetted_qty_validation(request, exc: VettedQtyValidationError):
     )
 
 
+def _versioned_read(request: Request, response: Response, kind: str, wos_serial: int, key: tuple, schema, loader):
+    """
+    Serve a WOS resource through the versioned cache. Returns 304 when If-None-Match carries
+    the current ETag, otherwise the cached or freshly loaded payload with its ETag.
+    """
+    def load():
+        result = loader()
+        if isinstance(result, list):
+            return [schema.model_validate(r).model_dump() for r in result]
+        return schema.model_validate(result).model_dump()
+
+    if from_mirror(request):
+        # Mirror data may be stale: never cache it or give it a validator.
+        return load()
+    version = wos_cache.version(wos_serial)
+    if version is None:
+        # Cache backend unavailable: serve uncached and without validators.
+        return load()
+    etag = wos_cache.etag(kind, wos_serial, version, *key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag, exists=False):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # Loading raises NotFoundError for a missing resource, so `*` never turns a 404 into a 304.
+    payload = wos_cache.get_or_load(kind, wos_serial, version, load, *key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return payload
+
+
+def _idempotent(
+    request: Request,
+    local_db: Session,
+    idempotency_key: Optional[str],
+    payload,
+    response_model,
+    run,
+    status_code: int = status.HTTP_200_OK,
+    exclude_none: bool = False,
+):
+    """
+    Run a vetting write once per caller and Idempotency-Key. Replays of a completed request
+    get the stored response (with Idempotent-Replayed: true) without touching Sybase.
+    """
+    if not idempotency_key:
+        return run()
+    adapter = TypeAdapter(response_model)
+
+    def execute():
+        result = adapter.validate_python(run(), from_attributes=True)
+        return status_code, adapter.dump_python(result, mode="json", exclude_none=exclude_none)
+
+    fingerprint = request_fingerprint(request.method, request.url.path, payload)
+    code, body, replayed = svc_run_idempotent(
+        local_db, client_key(request), idempotency_key, fingerprint, execute
+    )
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return JSONResponse(content=body, status_code=code, headers=headers)
+
+
 @app.on_event("startup")
 def startup_event():
     if os.getenv("TESTING") == "true":
@@ -91,8 +267,51 @@ def startup_event():
     except Exception as e:
         print(f"Critical error during startup: {e}")
 
+    try:
+        purge_change_log()
+    except DatabaseError as e:
+        print(f"Error purging change log: {e.message}")
+
+    try:
+        purge_idempotency_keys()
+    except DatabaseError as e:
+        print(f"Error purging idempotency keys: {e.message}")
+
+    health.probe.start()
+
+    try:
+        job_worker.start()
+    except DatabaseError as e:
+        print(f"Error starting vetting job worker: {e.message}")
+
+    if database.mirror_configured():
+        try:
+            mirror_worker.start()
+        except Exception as e:
+            print(f"Error starting WOS mirror sync: {e}")
+
+    if SUMMARY_ENABLED:
+        summary_worker.start()
 
-@app.get("/test")
+    if ANALYTICS_ENABLED:
+        analytics_worker.start()
+
+    if ITEM_SEARCH_ENABLED:
+        item_search_worker.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    item_search_worker.stop()
+    analytics_worker.stop()
+    summary_worker.stop()
+    mirror_worker.stop()
+    job_worker.stop()
+    health.probe.stop()
+
+
+@app.get("/test", dependencies=[Depends(deadline("reads"))])
+@bulkhead("reads")
 def test_endpoint(db: Session = Depends(database.get_db)):
     """Test endpoint to verify database connectivity."""
     try:
@@ -102,8 +321,9 @@ def test_endpoint(db: Session = Depends(database.get_db)):
         return {"message": "test failed", "error": e.message}
 
 
-@app.post("/login", response_model=schemas.LoginResponse)
-async def login(request: schemas.LoginRequest, db: Session = Depends(database.get_db)):
+@app.post("/login", response_model=schemas.LoginResponse, dependencies=[Depends(deadline("auth"))])
+@bulkhead("auth")
+def login(request: schemas.LoginRequest, db: Session = Depends(database.get_db)):
     """Authenticates user via Sybase and returns JWT."""
     try:
         return svc_login_user(db, request.username, request.password)
@@ -119,99 +339,551 @@ async def login(request: schemas.LoginRequest, db: Session = Depends(database.ge
         )
 
 
-@app.get("/users", response_model=list[schemas.User])
+@app.get(
+    "/users",
+    response_model=list[schemas.User],
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
 def read_users(
+    station_code: Optional[str] = None,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """Retrieves all users. Protected by JWT."""
-    return svc_get_all_users(db)
+    """Retrieves all users, optionally for one StationCode. Protected by JWT."""
+    return svc_get_all_users(db, station_code)
 
 
-@app.get("/db-check")
+@app.get("/db-check", dependencies=[Depends(deadline("reads"))])
+@bulkhead("reads")
 def db_check(db: Session = Depends(database.get_db)):
-    """Checks database connectivity using the main session."""
+    """Checks database connectivity using the main session and reports the circuit breaker state."""
     try:
         result = run_test_query(db)
-        return {"status": "ok", "result": result}
+        return {"status": "ok", "result": result, "breaker": database.main_breaker.snapshot()}
     except DatabaseError as e:
-        return {"status": "error", "detail": e.message}
+        return {"status": "error", "detail": e.message, "breaker": database.main_breaker.snapshot()}
+    except ServiceUnavailableError as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "detail": str(e), "breaker": database.main_breaker.snapshot()},
+        )
+
+
+@app.get("/health/live")
+def health_live():
+    """Liveness probe: the process is up. Never touches the database."""
+    return {"status": "ok"}
+
 
+@app.get("/health/ready")
+def health_ready():
+    """
+    Readiness probe from the background database check, connection pool and circuit
+    breaker state. Returns 503 when the database is unreachable or the breaker is open.
+    """
+    ready, details = health.probe.readiness()
+    if not ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=details)
+    return details
 
-@app.get("/wosmaster", response_model=list[schemas.WOSMaster])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Returns this worker's counters in Prometheus text format."""
+    return metrics.render()
+
+
+@app.get(
+    "/wosmaster",
+    response_model=list[schemas.WOSMaster],
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+@bulkhead("heavy")
 def get_wos_masters(
+    request: Request,
     customer_code: Optional[str] = None,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+):
+    """Returns WOSMaster records with optional filters. Honours Accept for MessagePack/Arrow."""
+    results = svc_get_wos_masters(db, customer_code=customer_code, from_date=from_date, to_date=to_date)
+    return negotiate_rows(request, results, schemas.WOSMaster)
+
+
+@app.get(
+    "/wosmaster/changes",
+    response_model=schemas.WOSMasterChanges,
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+@bulkhead("heavy")
+def get_wos_master_changes(
+    since: Optional[str] = None,
     db: Session = Depends(database.get_db),
 ):
-    """Returns WOSMaster records with optional filters."""
-    return svc_get_wos_masters(db, customer_code=customer_code, from_date=from_date, to_date=to_date)
+    """
+    Returns WOSMaster records changed since the `since` token, plus the token for the next poll.
+    Omit `since` for a full snapshot. Rows may repeat across polls; upsert by WOSSerial.
+    """
+    return svc_get_wos_master_changes(db, since)
 
 
-@app.get("/wosmaster/{serial_no}", response_model=schemas.WOSMaster)
-def get_wos_master(serial_no: int, db: Session = Depends(database.get_db)):
-    """Returns a specific WOSMaster record by serial number."""
-    return svc_get_wos_master(db, serial_no)
+@app.get(
+    "/wosmaster/{serial_no}",
+    response_model=schemas.WOSMaster,
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
+def get_wos_master(
+    serial_no: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_primary_db),
+):
+    """Returns a specific WOSMaster record by serial number. Supports If-None-Match."""
+    return _versioned_read(
+        request, response, "wosmaster", serial_no, (), schemas.WOSMaster,
+        lambda: svc_get_wos_master(db, serial_no),
+    )
 
 
-@app.get("/wosline", response_model=list[schemas.WOSLine])
+@app.get(
+    "/wosline",
+    response_model=list[schemas.WOSLine],
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+@bulkhead("heavy")
 def get_wos_lines(
+    request: Request,
+    response: Response,
     wos_serial: Optional[int] = None,
     db: Session = Depends(database.get_db),
 ):
-    """Returns WOSLine records, optionally filtered by WOSSerial."""
-    return svc_get_wos_lines(db, wos_serial=wos_serial)
+    """
+    Returns WOSLine records, optionally filtered by WOSSerial. Honours Accept for MessagePack/Arrow.
+    JSON responses filtered by WOSSerial carry an ETag and support If-None-Match.
+    """
+    if wos_serial is not None and prefers_json(request):
+        # Versioned cache entries must be loaded from the primary, or a lagging replica
+        # could store pre-write rows under the post-write version.
+        with primary_session(request, db) as primary_db:
+            return _versioned_read(
+                request, response, "woslines", wos_serial, (), schemas.WOSLine,
+                lambda: svc_get_wos_lines(primary_db, wos_serial=wos_serial),
+            )
+    with read_session(request, db) as read_db:
+        results = svc_get_wos_lines(read_db, wos_serial=wos_serial)
+    return negotiate_rows(request, results, schemas.WOSLine)
+
+
+@app.get(
+    "/wosline/changes",
+    response_model=schemas.WOSLineChanges,
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+@bulkhead("heavy")
+def get_wos_line_changes(
+    since: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    local_db: Session = Depends(database.get_local_db),
+):
+    """
+    Returns WOSLine records changed since the `since` token, plus the token for the next poll.
+    Omit `since` for a full snapshot. Returns 410 if the token is older than the change log.
+    """
+    return svc_get_wos_line_changes(db, local_db, since)
+
+
+@app.get("/wosline/export", dependencies=[Depends(rate_limit("heavy"))])
+@bulkhead("heavy")
+def export_wos_lines(
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    partitions: int = Query(EXPORT_PARTITIONS, ge=1, le=64),
+    ordered: bool = True,
+    db: Session = Depends(database.get_db),
+):
+    """
+    Streams every WOSLine whose WOS was initiated in the date range as NDJSON, one line per row.
+    The WOSSerial range is read in `partitions` parallel slices; `ordered=false` emits rows
+    as they arrive instead of in (WOSSerial, WOSLineSerial) order.
+    """
+    return StreamingResponse(
+        svc_export_wos_lines(db, from_date, to_date, partitions=partitions, ordered=ordered),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get(
+    "/wosline/search",
+    response_model=schemas.ItemSearchResult,
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def search_wos_lines(
+    q: str,
+    field: str = "all",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Searches WOSLine by partial ItemCode and ItemDesc from the in-process index, best match
+    first. `field` is all, code (ItemCode prefix) or desc (every term in ItemDesc).
+    404 unless ITEM_SEARCH_ENABLED is set; 503 until the first load finishes.
+    """
+    return svc_search_wos_line_items(q, field, offset, limit)
+
+
+@app.get("/wosline/{wos_serial}/events")
+async def wos_line_events(wos_serial: int, request: Request):
+    """
+    Server-Sent Events stream of VettedQty changes to the lines of a WOS, pushed after
+    each vetting write commits.
+    """
+    return StreamingResponse(
+        notifications.event_stream(request, wos_serial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@app.get("/wosline/{wos_serial}/{line_serial}", response_model=schemas.WOSLine)
+@app.get(
+    "/wosline/{wos_serial}/{line_serial}",
+    response_model=schemas.WOSLine,
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
 def get_wos_line(
     wos_serial: int,
     line_serial: int,
-    db: Session = Depends(database.get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_primary_db),
 ):
-    """Returns a specific WOSLine by WOSSerial and WOSLineSerial."""
-    return svc_get_wos_line(db, wos_serial, line_serial)
+    """Returns a specific WOSLine by WOSSerial and WOSLineSerial. Supports If-None-Match."""
+    return _versioned_read(
+        request, response, "wosline", wos_serial, (line_serial,), schemas.WOSLine,
+        lambda: svc_get_wos_line(db, wos_serial, line_serial),
+    )
 
 
-@app.put("/wosline/{wos_serial}/{line_serial}", response_model=schemas.WOSLine)
+@app.put(
+    "/wosline/{wos_serial}/{line_serial}",
+    response_model=schemas.WOSLine,
+    dependencies=[Depends(deadline("writes")), Depends(record_write)],
+)
+@bulkhead("writes")
 def update_wos_line(
     wos_serial: int,
     line_serial: int,
     line_update: schemas.WOSLineUpdate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(database.get_db),
+    local_db: Session = Depends(database.get_local_db),
 ):
-    """Updates VettedQty for a WOSLine. VettedQty cannot exceed AuthorisedQty."""
-    return svc_update_wos_line(db, wos_serial, line_serial, line_update.VettedQty)
+    """
+    Updates VettedQty for a WOSLine. VettedQty cannot exceed AuthorisedQty.
+    Supports Idempotency-Key.
+    """
+    return _idempotent(
+        request, local_db, idempotency_key, line_update.model_dump(mode="json"), schemas.WOSLine,
+        lambda: svc_update_wos_line(db, wos_serial, line_serial, line_update.VettedQty),
+    )
 
 
-@app.put("/wosline-bulk", response_model=List[schemas.WOSLine])
+@app.put(
+    "/wosline-bulk",
+    response_model=List[schemas.WOSLine],
+    dependencies=[Depends(deadline("writes")), Depends(record_write)],
+)
+@bulkhead("writes")
 def bulk_update_wos_lines(
     bulk_update: schemas.WOSLinesBulkUpdate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(database.get_db),
+    local_db: Session = Depends(database.get_local_db),
 ):
-    """Bulk updates VettedQty for multiple WOSLine records."""
+    """Bulk updates VettedQty for multiple WOSLine records. Supports Idempotency-Key."""
     lines = [
         {"WOSLineSerial": lu.WOSLineSerial, "VettedQty": lu.VettedQty}
         for lu in bulk_update.Lines
     ]
-    return svc_bulk_update_wos_lines(db, bulk_update.WOSSerial, lines)
+    return _idempotent(
+        request, local_db, idempotency_key, bulk_update.model_dump(mode="json"), List[schemas.WOSLine],
+        lambda: svc_bulk_update_wos_lines(db, bulk_update.WOSSerial, lines),
+    )
 
 
-@app.get("/correspondence/{wos_serial}", response_model=list[schemas.Correspondence])
-def get_correspondence(wos_serial: int, db: Session = Depends(database.get_db)):
+@app.put(
+    "/wosline-batch",
+    response_model=schemas.WOSLinesBatchResult,
+    response_model_exclude_none=True,
+    dependencies=[Depends(deadline("writes")), Depends(record_write)],
+)
+@bulkhead("writes")
+def batch_update_wos_lines(
+    batch_update: schemas.WOSLinesBatchUpdate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(database.get_db),
+    local_db: Session = Depends(database.get_local_db),
+):
+    """
+    Updates VettedQty for lines across many WOS, keyed by WOSSerial and WOSLineSerial.
+    Returns a per-line status; lines that cannot be applied are reported, not raised.
+    Supports Idempotency-Key.
+    """
+    lines = [
+        {"WOSSerial": lu.WOSSerial, "WOSLineSerial": lu.WOSLineSerial, "VettedQty": lu.VettedQty}
+        for lu in batch_update.Lines
+    ]
+    return _idempotent(
+        request, local_db, idempotency_key, batch_update.model_dump(mode="json"),
+        schemas.WOSLinesBatchResult, lambda: svc_batch_update_wos_lines(db, lines),
+        exclude_none=True,
+    )
+
+
+@app.post(
+    "/jobs/vetting",
+    response_model=schemas.VettingJob,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(deadline("writes")), Depends(record_write)],
+)
+@bulkhead("writes")
+def create_vetting_job(
+    job: schemas.VettingJobCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    local_db: Session = Depends(database.get_local_db),
+):
+    """
+    Queues a bulk vetting batch spanning any number of WOSSerials and returns at once.
+    Lines are applied in chunks by a background worker; poll GET /jobs/{id} for progress.
+    Supports Idempotency-Key, so a retried submission does not queue the batch twice.
+    """
+    lines = [
+        {"WOSSerial": lu.WOSSerial, "WOSLineSerial": lu.WOSLineSerial, "VettedQty": lu.VettedQty}
+        for lu in job.Lines
+    ]
+    return _idempotent(
+        request, local_db, idempotency_key, job.model_dump(mode="json"), schemas.VettingJob,
+        lambda: svc_submit_vetting_job(local_db, lines),
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@app.get(
+    "/jobs/{job_id}",
+    response_model=schemas.VettingJob,
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
+def get_vetting_job(job_id: str, local_db: Session = Depends(database.get_local_db)):
+    """Returns a vetting job's status, progress counters and the lines that were not applied."""
+    return svc_get_vetting_job_status(local_db, job_id)
+
+
+@app.get(
+    "/summary/customers",
+    response_model=list[schemas.SummaryRollup],
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def get_summary_by_customer(local_db: Session = Depends(database.get_local_db)):
+    """Returns WOS counts and line totals per CustomerCode, maintained incrementally."""
+    return svc_get_summary_by_customer(local_db)
+
+
+@app.get(
+    "/summary/customers/{customer_code}",
+    response_model=schemas.SummaryRollup,
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def get_customer_summary(customer_code: str, local_db: Session = Depends(database.get_local_db)):
+    """Returns WOS counts and line totals for one CustomerCode."""
+    return svc_get_customer_summary(local_db, customer_code)
+
+
+@app.get(
+    "/summary/wostypes",
+    response_model=list[schemas.SummaryRollup],
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def get_summary_by_wos_type(local_db: Session = Depends(database.get_local_db)):
+    """Returns WOS counts and line totals per WOSType."""
+    return svc_get_summary_by_wos_type(local_db)
+
+
+@app.get(
+    "/summary/wos",
+    response_model=list[schemas.WOSSummary],
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def get_wos_summaries(
+    customer_code: Optional[str] = None,
+    local_db: Session = Depends(database.get_local_db),
+):
+    """Returns per-WOS line totals, optionally for one CustomerCode."""
+    return svc_get_wos_summaries(local_db, customer_code=customer_code)
+
+
+@app.get(
+    "/summary/wos/{wos_serial}",
+    response_model=schemas.WOSSummary,
+    dependencies=[Depends(rate_limit("reads"))],
+)
+@bulkhead("reads")
+def get_wos_summary(wos_serial: int, local_db: Session = Depends(database.get_local_db)):
+    """Returns the line totals of one WOS."""
+    return svc_get_wos_summary(local_db, wos_serial)
+
+
+@app.get(
+    "/analytics/wosline",
+    response_model=schemas.AnalyticsResult,
+    dependencies=[Depends(rate_limit("heavy"))],
+)
+@bulkhead("heavy")
+def get_wos_line_analytics(
+    group_by: Optional[str] = None,
+    item_code: Optional[str] = None,
+    sos: Optional[str] = None,
+    item_deno: Optional[str] = None,
+    customer_code: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    measure: str = "vetted_qty",
+    percentiles: Optional[str] = None,
+    sort: str = "count",
+    limit: int = Query(100, ge=1, le=10000),
+):
+    """
+    Aggregates WOSLine quantities and cost from the in-memory columnar snapshot. `group_by`
+    takes comma-separated dimensions (item_code, sos, item_deno, customer_code); `percentiles`
+    (e.g. 50,90) are computed over `measure`. 404 unless ANALYTICS_ENABLED is set.
+    """
+    filters = {"item_code": item_code, "sos": sos, "item_deno": item_deno, "customer_code": customer_code}
+    return svc_query_wos_line_analytics(
+        group_by, filters, from_date, to_date,
+        measure=measure, percentiles=percentiles, sort=sort, limit=limit,
+    )
+
+
+@app.get("/analytics/status", response_model=schemas.AnalyticsStatus)
+def get_analytics_status():
+    """Returns the analytics snapshot's line count, memory use and age."""
+    return svc_get_analytics_status()
+
+
+@app.get(
+    "/correspondence/{wos_serial}",
+    response_model=list[schemas.Correspondence],
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
+def get_correspondence(wos_serial: int, db: Session = Depends(get_read_db)):
     """Returns correspondence list for a given WOSSerial with descriptions."""
     return svc_get_correspondence(db, wos_serial)
 
 
-@app.get("/codetable", response_model=list[schemas.CodeTable])
-def get_codetable_data(column_name: str, db: Session = Depends(database.get_db)):
+@app.get(
+    "/codetable",
+    response_model=list[schemas.CodeTable],
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+@bulkhead("reads")
+def get_codetable_data(column_name: str, db: Session = Depends(get_read_db)):
     """Returns CodeTable data for a given ColumnName."""
     return svc_get_codetable_data(db, column_name)
 
 
-@app.post("/forgot-password")
-async def forgot_password(
+# Async-engine variants of the read endpoints. They run on the event loop with
+# database.get_async_db sessions instead of on bulkhead threads; 404 unless ASYNC_DB_URL is set.
+
+@app.get(
+    "/async/wosmaster",
+    response_model=list[schemas.WOSMaster],
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+async def get_wos_masters_async(
+    request: Request,
+    customer_code: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    db=Depends(database.get_async_db),
+):
+    """Async variant of GET /wosmaster."""
+    results = await within(svc_get_wos_masters_async(
+        db, customer_code=customer_code, from_date=from_date, to_date=to_date
+    ))
+    return negotiate_rows(request, results, schemas.WOSMaster)
+
+
+@app.get(
+    "/async/wosmaster/{serial_no}",
+    response_model=schemas.WOSMaster,
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+async def get_wos_master_async(serial_no: int, db=Depends(database.get_async_db)):
+    """Async variant of GET /wosmaster/{serial_no}, without ETag support."""
+    return await within(svc_get_wos_master_async(db, serial_no))
+
+
+@app.get(
+    "/async/wosline",
+    response_model=list[schemas.WOSLine],
+    dependencies=[Depends(rate_limit("heavy")), Depends(deadline("heavy"))],
+)
+async def get_wos_lines_async(
+    request: Request,
+    wos_serial: Optional[int] = None,
+    db=Depends(database.get_async_db),
+):
+    """Async variant of GET /wosline, without ETag support."""
+    results = await within(svc_get_wos_lines_async(db, wos_serial=wos_serial))
+    return negotiate_rows(request, results, schemas.WOSLine)
+
+
+@app.get(
+    "/async/wosline/{wos_serial}/{line_serial}",
+    response_model=schemas.WOSLine,
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+async def get_wos_line_async(wos_serial: int, line_serial: int, db=Depends(database.get_async_db)):
+    """Async variant of GET /wosline/{wos_serial}/{line_serial}, without ETag support."""
+    return await within(svc_get_wos_line_async(db, wos_serial, line_serial))
+
+
+@app.get(
+    "/async/correspondence/{wos_serial}",
+    response_model=list[schemas.Correspondence],
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+async def get_correspondence_async(wos_serial: int, db=Depends(database.get_async_db)):
+    """Async variant of GET /correspondence/{wos_serial}, on the main database only."""
+    return await within(svc_get_correspondence_async(db, wos_serial))
+
+
+@app.get(
+    "/async/codetable",
+    response_model=list[schemas.CodeTable],
+    dependencies=[Depends(rate_limit("reads")), Depends(deadline("reads"))],
+)
+async def get_codetable_data_async(column_name: str, db=Depends(database.get_async_db)):
+    """Async variant of GET /codetable."""
+    return await within(svc_get_codetable_data_async(db, column_name))
+
+
+@app.post("/forgot-password", dependencies=[Depends(deadline("auth"))])
+@bulkhead("auth")
+def forgot_password(
     request: schemas.ForgotPasswordRequest,
     reset_db: Session = Depends(database.get_reset_db),
 ):
@@ -220,8 +892,9 @@ async def forgot_password(
     return {"message": "If the email exists, a password reset instruction has been sent."}
 
 
-@app.post("/reset-password")
-async def reset_password(
+@app.post("/reset-password", dependencies=[Depends(deadline("auth"))])
+@bulkhead("auth")
+def reset_password(
     request: schemas.ResetPasswordRequest,
     db: Session = Depends(database.get_db),
     reset_db: Session = Depends(database.get_reset_db),
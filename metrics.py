@@ -0,0 +1,89 @@
+"""
+In-process counters and summaries exposed in Prometheus text format at /metrics.
+
+Each worker process keeps its own counts; scrape every worker (or sum them) when running
+several.
+"""
+
+import threading
+
+_lock = threading.Lock()
+_counters: dict[tuple[str, tuple], float] = {}
+_summaries: dict[tuple[str, tuple], list] = {}
+_help: dict[str, str] = {}
+
+
+def describe(name: str, help_text: str) -> None:
+    """Register the HELP text for a metric name."""
+    _help[name] = help_text
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """Add `amount` to the counter identified by name and labels."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, amount: float, **labels) -> None:
+    """Record one observation (e.g. seconds waited) in the summary identified by name and labels."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        summary = _summaries.setdefault(key, [0.0, 0])
+        summary[0] += amount
+        summary[1] += 1
+
+
+def summary(name: str, **labels) -> tuple[float, int]:
+    """Return (sum, count) of a summary ((0, 0) if never observed)."""
+    with _lock:
+        total, count = _summaries.get((name, tuple(sorted(labels.items()))), (0.0, 0))
+        return total, count
+
+
+def value(name: str, **labels) -> float:
+    """Return the current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def reset() -> None:
+    """Zero every counter."""
+    with _lock:
+        _counters.clear()
+        _summaries.clear()
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, label_value in labels:
+        escaped = str(label_value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render() -> str:
+    """Return all metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        summaries = sorted((key, tuple(v)) for key, v in _summaries.items())
+    lines = []
+    seen = set()
+
+    def header(name: str, kind: str) -> None:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), count in counters:
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {count:g}")
+    for (name, labels), (total, count) in summaries:
+        header(name, "summary")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from database import MirrorBase
+
+class MirrorState(MirrorBase):
+    """
+    SQLAlchemy model for the sync position of the local WOS mirror (one row, id=1).
+    Tokens are change feed tokens; synced_at is when the last successful sync started.
+    """
+    __tablename__ = "mirror_state"
+
+    id = Column(Integer, primary_key=True)
+    master_token = Column(String(255))
+    line_token = Column(String(255))
+    correspondence_since = Column(DateTime)
+    synced_at = Column(DateTime)
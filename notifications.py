@@ -0,0 +1,174 @@
+"""
+Server-push notifications of vetting changes.
+
+A broker keeps the open Server-Sent Events streams per WOSSerial. Committed vetting writes
+arrive through vetting_events and are handed to a fan-out, which delivers them to the
+brokers of all workers: LocalFanOut for a single process, RedisFanOut (NOTIFY_FANOUT_URL)
+to reach every worker through Redis pub/sub.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import vetting_events
+from cache import CacheBackendError, create_backend
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_FANOUT_URL = os.getenv("NOTIFY_FANOUT_URL", "")
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", 15))
+SUBSCRIBER_QUEUE_SIZE = 256
+
+_CHANNEL = "vetting"
+
+
+class Subscription:
+    """An open stream's queue of events for one WOS."""
+
+    def __init__(self, wos_serial: int, loop: asyncio.AbstractEventLoop):
+        self.wos_serial = wos_serial
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping vetting event for slow subscriber on WOS %s", self.wos_serial)
+
+
+class Broker:
+    """Delivers events to the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[int, set[Subscription]] = {}
+
+    def subscribe(self, wos_serial: int) -> Subscription:
+        """Open a subscription on the running event loop."""
+        subscription = Subscription(wos_serial, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(wos_serial, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.wos_serial)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.wos_serial]
+
+    def subscriber_count(self, wos_serial: int) -> int:
+        with self._lock:
+            return len(self._subscriptions.get(wos_serial, ()))
+
+    def deliver(self, wos_serial: int, event: dict) -> None:
+        """Queue an event for every local subscriber of the WOS. Safe to call from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(wos_serial, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The subscriber's event loop has closed.
+                self.unsubscribe(subscription)
+
+
+class LocalFanOut:
+    """Fan-out for a single process: deliver straight to the local broker."""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+
+    def publish(self, wos_serial: int, event: dict) -> None:
+        self.broker.deliver(wos_serial, event)
+
+
+class RedisFanOut:
+    """
+    Fan-out through Redis pub/sub. Every worker, including the publisher, receives events
+    from its subscription thread and delivers them to its own broker.
+    """
+
+    def __init__(self, broker: Broker, url: str):
+        self.broker = broker
+        self.backend = create_backend(url)
+        self._thread = threading.Thread(target=self._listen, name="vetting-fanout", daemon=True)
+        self._thread.start()
+
+    def publish(self, wos_serial: int, event: dict) -> None:
+        message = json.dumps({"WOSSerial": wos_serial, "event": event})
+        try:
+            self.backend.publish(_CHANNEL, message.encode())
+        except CacheBackendError as e:
+            logger.warning("Fan-out unavailable, delivering locally only: %s", e)
+            self.broker.deliver(wos_serial, event)
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                for message in self.backend.listen(_CHANNEL):
+                    payload = json.loads(message)
+                    self.broker.deliver(payload["WOSSerial"], payload["event"])
+            except CacheBackendError as e:
+                logger.warning("Fan-out subscription failed, retrying: %s", e)
+                threading.Event().wait(1.0)
+
+
+def create_fanout(broker: Broker, url: str = NOTIFY_FANOUT_URL):
+    """Build the fan-out configured by NOTIFY_FANOUT_URL (empty means in-process only)."""
+    if url:
+        return RedisFanOut(broker, url)
+    return LocalFanOut(broker)
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(request, wos_serial: int, keepalive: float = SSE_KEEPALIVE_SECONDS):
+    """Yield SSE messages for a WOS until the client disconnects."""
+    subscription = broker.subscribe(wos_serial)
+    try:
+        yield format_sse("ready", {"WOSSerial": wos_serial})
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse("vetting", event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+broker = Broker()
+_fanout = None
+
+
+def get_fanout():
+    """Return the process-wide fan-out, creating it on first use."""
+    global _fanout
+    if _fanout is None:
+        _fanout = create_fanout(broker)
+    return _fanout
+
+
+@vetting_events.subscribe
+def _push_vetting_changes(wos_serial: int, changes: list[dict]) -> None:
+    get_fanout().publish(wos_serial, {
+        "WOSSerial": wos_serial,
+        "lines": [
+            {
+                "WOSLineSerial": change["WOSLineSerial"],
+                "VettedQty": change["VettedQty"],
+                "PreviousVettedQty": change["PreviousVettedQty"],
+            }
+            for change in changes
+        ],
+    })
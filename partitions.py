@@ -0,0 +1,57 @@
+"""
+Scatter-gather over the station partitions configured with STATION_SHARDS.
+
+A cross-station list query runs on every partition at once, each returning rows sorted by
+the same key, and the results are merged in that order with heapq.merge. The partition on
+the main server uses the caller's session on the calling thread; the others get their own
+sessions on a small shared pool. Without STATION_SHARDS, or on a mirror session (the mirror
+holds every partition's rows), the query simply runs once on the caller's session.
+"""
+
+import contextvars
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+SCATTER_MAX_WORKERS = int(os.getenv("SCATTER_MAX_WORKERS", 8))
+
+_executor = ThreadPoolExecutor(max_workers=SCATTER_MAX_WORKERS, thread_name_prefix="scatter")
+
+
+def _run_on_shard(session_factory, query, stations):
+    db = session_factory()
+    try:
+        return query(db, stations)
+    finally:
+        db.close()
+
+
+def scatter_gather(db, query, key, stations=None) -> list:
+    """
+    Run query(session, stations) on every partition holding one of `stations` (default: all)
+    and merge the per-partition results, each already sorted by `key`. The first partition
+    error is raised; partial results are never returned.
+    """
+    if not database.station_partitioned() or database.session_source(db) == "mirror":
+        return list(query(db, stations))
+    wanted = set(stations) if stations is not None else None
+    local, futures = None, []
+    for partition_stations, session_factory in database.station_partitions():
+        selected = [s for s in partition_stations if wanted is None or s in wanted]
+        if not selected:
+            continue
+        if session_factory is None:
+            local = selected
+        else:
+            # Each task gets its own context copy so the request deadline applies on the shard.
+            ctx = contextvars.copy_context()
+            futures.append(_executor.submit(ctx.run, _run_on_shard, session_factory, query, selected))
+    try:
+        results = [query(db, local)] if local is not None else []
+        results.extend(future.result() for future in futures)
+    finally:
+        for future in futures:
+            future.cancel()
+    return list(heapq.merge(*results, key=key))
@@ -0,0 +1,249 @@
+"""
+Per-user rate limiting for the WOS endpoints.
+
+Each client gets a token bucket per budget: `heavy` for list endpoints and change feeds,
+`reads` for single-row lookups. Clients are identified by the `sub` claim of their bearer
+token, or by IP address when they send none. Behind a reverse proxy, list its addresses in
+TRUSTED_PROXIES so the client IP is taken from X-Forwarded-For; otherwise every anonymous
+caller shares the proxy's budget. Responses carry RateLimit-Limit,
+RateLimit-Remaining, RateLimit-Reset and RateLimit-Policy headers; an empty bucket
+returns 429 with Retry-After.
+
+RATE_LIMIT_URL selects the store: memory:// keeps exact token buckets in this process.
+shm:// and redis:// (see CACHE_URL) share budgets across workers; since those stores
+only offer atomic increments, shared budgets are enforced as sliding-window counters
+whose window is the time the bucket takes to refill.
+"""
+
+import ipaddress
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi import Request
+
+import auth
+import cache
+import metrics
+from exceptions import RateLimitExceededError
+
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "memory://")
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Comma-separated addresses or CIDR networks of proxies allowed to set X-Forwarded-For.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if entry.strip()
+]
+
+metrics.describe("rate_limited_total", "Requests refused with 429 by the rate limiter.")
+
+
+@dataclass(frozen=True)
+class Policy:
+    """A budget: `capacity` requests in a burst, refilled at `per_minute`."""
+    name: str
+    capacity: int
+    per_minute: float
+
+    @property
+    def refill_seconds(self) -> float:
+        """Seconds for an empty bucket to refill completely."""
+        return self.capacity * 60.0 / self.per_minute
+
+
+def _policy(name: str, capacity: int, per_minute: float) -> Policy:
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return Policy(
+        name,
+        int(os.getenv(f"{prefix}_CAPACITY", capacity)),
+        float(os.getenv(f"{prefix}_PER_MINUTE", per_minute)),
+    )
+
+
+POLICIES = {
+    "heavy": _policy("heavy", 10, 30),
+    "reads": _policy("reads", 120, 600),
+}
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    remaining: int
+    reset_seconds: float
+    retry_after: float = 0.0
+
+
+class LocalLimiter:
+    """Exact token buckets kept in this process."""
+
+    # Idle (full) buckets are dropped once this many keys are tracked.
+    MAX_KEYS = 10000
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: dict[tuple[str, str], tuple[float, float]] = {}
+
+    def hit(self, key: str, policy: Policy) -> Decision:
+        rate = policy.per_minute / 60.0
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.get((policy.name, key), (policy.capacity, now))
+            tokens = min(policy.capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.MAX_KEYS:
+                self._prune(now)
+            self._buckets[(policy.name, key)] = (tokens, now)
+        return Decision(
+            allowed=allowed,
+            remaining=int(tokens),
+            reset_seconds=(policy.capacity - tokens) / rate,
+            retry_after=0.0 if allowed else (1 - tokens) / rate,
+        )
+
+    def _prune(self, now: float) -> None:
+        for bucket_key, (tokens, updated) in list(self._buckets.items()):
+            policy = POLICIES.get(bucket_key[0])
+            if policy is None or now - updated >= policy.refill_seconds:
+                del self._buckets[bucket_key]
+
+
+class SharedLimiter:
+    """Sliding-window counters on a shared cache backend (shm:// or redis://)."""
+
+    def __init__(self, backend: cache.CacheBackend, clock=time.time):
+        self.backend = backend
+        self._clock = clock
+
+    def hit(self, key: str, policy: Policy) -> Decision:
+        window = policy.refill_seconds
+        now = self._clock()
+        current = math.floor(now / window)
+        elapsed = now / window - current
+        prefix = f"ratelimit:{policy.name}:{key}:"
+        previous_count = self.backend.get(f"{prefix}{current - 1}") or 0
+        count = self.backend.incr(f"{prefix}{current}", 1, ttl=2 * window)
+        used = previous_count * (1 - elapsed) + count
+        allowed = used <= policy.capacity
+        if not allowed:
+            # Give the token back so rejected attempts do not extend the lockout.
+            self.backend.incr(f"{prefix}{current}", -1)
+        remaining = max(0, int(policy.capacity - used))
+        reset_seconds = (1 - elapsed) * window
+        retry_after = 0.0
+        if not allowed:
+            if previous_count:
+                # Time until enough of the previous window has slid out.
+                needed = (used - policy.capacity) / previous_count
+                retry_after = min(reset_seconds, needed * window)
+            else:
+                retry_after = reset_seconds
+        return Decision(allowed, remaining, reset_seconds, retry_after)
+
+
+def create_limiter(url: str = RATE_LIMIT_URL):
+    """Build the limiter for a RATE_LIMIT_URL value."""
+    if url.startswith("memory:"):
+        return LocalLimiter()
+    return SharedLimiter(cache.create_backend(url))
+
+
+limiter = create_limiter()
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_ip(request) -> str:
+    """
+    Return the caller's IP. When the peer is a trusted proxy, that is the right-most
+    X-Forwarded-For hop that is not itself a trusted proxy; hops further left are
+    client-supplied and ignored.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(host):
+        return host
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else host
+
+
+def client_key(request) -> str:
+    """Identify the caller: JWT subject when a valid bearer token is sent, else the client IP."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        subject = auth.get_token_subject(token)
+        if subject:
+            return f"user:{subject}"
+    return f"ip:{client_ip(request)}"
+
+
+def rate_limit(policy_name: str):
+    """Route dependency charging one request to the named budget. Raises RateLimitExceededError."""
+    if policy_name not in POLICIES:
+        raise ValueError(f"Unknown rate limit policy: {policy_name!r}")
+
+    def dependency(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        policy = POLICIES[policy_name]
+        try:
+            decision = limiter.hit(client_key(request), policy)
+        except cache.CacheBackendError:
+            # A shared store outage must not take the API down with it.
+            return
+        headers = {
+            "RateLimit-Limit": str(policy.capacity),
+            "RateLimit-Remaining": str(decision.remaining),
+            "RateLimit-Reset": str(math.ceil(decision.reset_seconds)),
+            "RateLimit-Policy": f"{policy.capacity};w={math.ceil(policy.refill_seconds)}",
+        }
+        if not decision.allowed:
+            metrics.inc("rate_limited_total", policy=policy.name)
+            headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+            raise RateLimitExceededError(headers)
+        request.scope.setdefault("state", {})["rate_limit_headers"] = headers
+
+    return dependency
+
+
+class RateLimitHeadersMiddleware:
+    """
+    ASGI middleware copying the headers set by the rate_limit dependency, and any other
+    dependency's `request.state.response_headers`, onto the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                state = scope.get("state", {})
+                headers = {**(state.get("rate_limit_headers") or {}), **(state.get("response_headers") or {})}
+                if headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in headers.items()
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
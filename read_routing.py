@@ -0,0 +1,195 @@
+"""
+Routing of read-only requests to the optional Sybase read replica and local WOS mirror.
+
+Routes that only read and are not served from the versioned WOS cache take `get_read_db`
+instead of `database.get_db`. The session comes from the replica unless:
+
+- no replica is configured (REPLICA_SYBASE_SERVER unset),
+- the replica's circuit breaker is open or a connection to it cannot be opened,
+- the caller wrote through a vetting route within the last
+  REPLICA_READ_YOUR_WRITES_SECONDS, so a lagging replica would hide their own update.
+
+Callers are identified like the rate limiter does (JWT subject, else client IP). Write
+markers live in the cache backend, so with a shared CACHE_URL they hold across workers.
+
+While the primary is degraded (its circuit breaker is open, or the last health probe
+failed or took over MIRROR_SLOW_MS), `get_read_db` and `get_primary_db` serve from the local
+WOS mirror instead, once it has synced (MIRROR_DB_URL). Such responses carry
+X-Data-Source: mirror and X-Data-Staleness (seconds since the last sync started).
+
+Routes that pick a source per request use the `read_session` and `primary_session` context
+managers instead, so only the session the chosen branch needs is ever opened.
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from fastapi import Depends, Request
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import cache
+import circuit_breaker
+import database
+import deadlines
+import health
+import metrics
+from exceptions import DatabaseError, ServiceUnavailableError
+from repositories import get_mirror_state
+from rate_limit import client_key
+
+# How long after a write the caller's reads stay on the primary. Set above the replica's lag.
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", 10))
+# Probe latency above which the primary counts as degraded and reads use the mirror.
+MIRROR_SLOW_MS = float(os.getenv("MIRROR_SLOW_MS", 2000))
+
+metrics.describe("db_reads_total", "Read-only requests by the database they were routed to.")
+
+
+def _marker_key(request: Request) -> str:
+    return f"recent-write:{client_key(request)}"
+
+
+def record_write(request: Request):
+    """Route dependency on write routes: pin the caller's reads to the primary for a while."""
+    if not database.replica_configured():
+        return
+    # Marked before the write runs, so cover the whole write budget as well as the lag window.
+    current = deadlines.current()
+    budget = current.remaining() if current is not None else deadlines.DEADLINES["writes"]
+    try:
+        cache.backend.set(_marker_key(request), True, ttl=max(0.0, budget) + REPLICA_READ_YOUR_WRITES_SECONDS)
+    except cache.CacheBackendError:
+        pass
+
+
+def recently_wrote(request: Request) -> bool:
+    """Return True if the caller wrote recently, or if that cannot be determined."""
+    try:
+        return cache.backend.get(_marker_key(request)) is not None
+    except cache.CacheBackendError:
+        return True
+
+
+def _open_replica_session():
+    db = database.get_replica_session_local()()
+    try:
+        # Check out a connection now, so a dead replica falls back instead of failing the read.
+        db.connection()
+    except (SQLAlchemyError, ServiceUnavailableError):
+        db.close()
+        return None
+    return db
+
+
+def _route(request: Request):
+    if not database.replica_configured():
+        return None, "not_configured"
+    if database.replica_breaker.state == circuit_breaker.OPEN:
+        return None, "replica_unavailable"
+    if recently_wrote(request):
+        return None, "read_your_writes"
+    db = _open_replica_session()
+    if db is None:
+        return None, "replica_unavailable"
+    return db, "replica"
+
+
+def primary_degraded() -> bool:
+    """Return True if the primary's breaker is open or its last probe failed or was slow."""
+    if database.main_breaker.state == circuit_breaker.OPEN:
+        return True
+    result = health.probe.last()
+    return result is not None and (not result["ok"] or result["latency_ms"] > MIRROR_SLOW_MS)
+
+
+def _open_mirror_session(request: Request):
+    """Return a mirror session if the primary is degraded and the mirror has synced, else None."""
+    if not database.mirror_configured() or not primary_degraded():
+        return None
+    db = database.get_mirror_session_local()()
+    try:
+        state = get_mirror_state(db)
+    except DatabaseError:
+        state = None
+    if state is None or state.synced_at is None:
+        db.close()
+        return None
+    staleness = max(0, int((datetime.now() - state.synced_at).total_seconds()))
+    request.state.data_source = "mirror"
+    request.state.response_headers = {"X-Data-Source": "mirror", "X-Data-Staleness": str(staleness)}
+    return db
+
+
+def from_mirror(request: Request) -> bool:
+    """Return True if this request's reads are served from the local mirror."""
+    return getattr(request.state, "data_source", None) == "mirror"
+
+
+def report_session_local():
+    """
+    Session factory for report queries that open their own sessions (exports): the replica
+    when one is configured and its breaker is not open, else the primary.
+    """
+    if database.replica_configured() and database.replica_breaker.state != circuit_breaker.OPEN:
+        return database.get_replica_session_local()
+    return database.get_session_local()
+
+
+@contextmanager
+def read_session(request: Request, primary: Session):
+    """
+    Session for a read-only request: the mirror while the primary is degraded, the replica
+    when it is configured, healthy and safe for this caller, else `primary`.
+    """
+    db = _open_mirror_session(request)
+    if db is not None:
+        metrics.inc("db_reads_total", target="mirror", reason="primary_degraded")
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    db, reason = _route(request)
+    if db is None:
+        metrics.inc("db_reads_total", target="primary", reason=reason)
+        yield primary
+        return
+    metrics.inc("db_reads_total", target="replica", reason=reason)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@contextmanager
+def primary_session(request: Request, primary: Session):
+    """
+    Session for reads that must not see replica lag (the versioned WOS cache): `primary`,
+    or the mirror while the primary is degraded.
+    """
+    db = _open_mirror_session(request)
+    if db is None:
+        yield primary
+        return
+    metrics.inc("db_reads_total", target="mirror", reason="primary_degraded")
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request, primary: Session = Depends(database.get_db)):
+    """
+    Dependency to get a read_session (the primary session opens no connection unless it
+    is used).
+    """
+    with read_session(request, primary) as db:
+        yield db
+
+
+def get_primary_db(request: Request, primary: Session = Depends(database.get_db)):
+    """Dependency to get a primary_session."""
+    with primary_session(request, primary) as db:
+        yield db
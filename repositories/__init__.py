@@ -10,13 +10,24 @@ from .user_repository import (
 from .wos_repository import (
     get_wos_masters_with_description,
     get_wos_master_by_serial,
+    get_wos_masters_initiated_between,
+    get_first_wos_master_initiated,
     get_wos_lines,
     get_wos_line,
     update_wos_line_vetted_qty,
     bulk_update_wos_lines_vetted_qty,
+    get_wos_masters_changed_since,
+    get_wos_lines_changed_since,
+    get_wos_lines_by_keys,
+    set_wos_lines_vetted_qty,
+    get_wos_line_serial_bounds,
+    iter_wos_lines_in_range,
+    get_wos_line_totals,
+    iter_wos_line_columns,
+    iter_wos_line_items,
 )
-from .correspondence_repository import get_correspondence_by_wos_serial
-from .codetable_repository import get_codetable_by_column_name
+from .correspondence_repository import get_correspondence_by_wos_serial, get_correspondence_since
+from .codetable_repository import get_codetable_by_column_name, get_all_codetable
 from .reset_repository import (
     get_user_email_by_email,
     create_password_reset,
@@ -25,6 +36,52 @@ from .reset_repository import (
     update_sybase_password,
 )
 from .database_repository import run_test_query
+from .change_repository import (
+    record_line_changes,
+    get_line_changes_since,
+    get_line_change_seq_bounds,
+    purge_line_changes_before,
+)
+from .job_repository import (
+    create_vetting_job,
+    get_vetting_job,
+    get_vetting_job_failures,
+    claim_next_vetting_job,
+    get_pending_job_lines,
+    record_job_line_results,
+    finish_vetting_job,
+    requeue_vetting_job,
+    renew_vetting_job_lease,
+)
+from .idempotency_repository import (
+    claim_idempotency_key,
+    get_idempotency_key,
+    complete_idempotency_key,
+    delete_idempotency_key,
+    purge_expired_idempotency_keys,
+)
+from .async_read_repository import (
+    get_wos_masters_with_description_async,
+    get_wos_master_by_serial_async,
+    get_wos_lines_async,
+    get_wos_line_async,
+    get_codetable_by_column_name_async,
+    get_correspondence_by_wos_serial_async,
+)
+from .mirror_repository import (
+    get_mirror_state,
+    apply_mirror_sync,
+    set_mirror_vetted_qty,
+)
+from .summary_repository import (
+    get_summary_state,
+    save_wos_summaries,
+    add_wos_vetting_delta,
+    get_summary_rollups,
+    get_summary_rollup,
+    get_wos_summaries,
+    get_wos_summary,
+)
 
 __all__ = [
     "get_user_count",
@@ -34,16 +91,63 @@ __all__ = [
     "sync_db_users",
     "get_wos_masters_with_description",
     "get_wos_master_by_serial",
+    "get_wos_masters_initiated_between",
+    "get_first_wos_master_initiated",
     "get_wos_lines",
     "get_wos_line",
     "update_wos_line_vetted_qty",
     "bulk_update_wos_lines_vetted_qty",
+    "get_wos_masters_changed_since",
+    "get_wos_lines_changed_since",
+    "get_wos_lines_by_keys",
+    "set_wos_lines_vetted_qty",
+    "get_wos_line_serial_bounds",
+    "iter_wos_lines_in_range",
+    "get_wos_line_totals",
+    "iter_wos_line_columns",
+    "iter_wos_line_items",
     "get_correspondence_by_wos_serial",
+    "get_correspondence_since",
     "get_codetable_by_column_name",
+    "get_all_codetable",
     "get_user_email_by_email",
     "create_password_reset",
     "get_password_reset_by_token",
     "delete_password_reset",
     "update_sybase_password",
     "run_test_query",
+    "record_line_changes",
+    "get_line_changes_since",
+    "get_line_change_seq_bounds",
+    "purge_line_changes_before",
+    "create_vetting_job",
+    "get_vetting_job",
+    "get_vetting_job_failures",
+    "claim_next_vetting_job",
+    "get_pending_job_lines",
+    "record_job_line_results",
+    "finish_vetting_job",
+    "requeue_vetting_job",
+    "renew_vetting_job_lease",
+    "claim_idempotency_key",
+    "get_idempotency_key",
+    "complete_idempotency_key",
+    "delete_idempotency_key",
+    "purge_expired_idempotency_keys",
+    "get_wos_masters_with_description_async",
+    "get_wos_master_by_serial_async",
+    "get_wos_lines_async",
+    "get_wos_line_async",
+    "get_codetable_by_column_name_async",
+    "get_correspondence_by_wos_serial_async",
+    "get_mirror_state",
+    "apply_mirror_sync",
+    "set_mirror_vetted_qty",
+    "get_summary_state",
+    "save_wos_summaries",
+    "add_wos_vetting_delta",
+    "get_summary_rollups",
+    "get_summary_rollup",
+    "get_wos_summaries",
+    "get_wos_summary",
 ]
@@ -0,0 +1,102 @@
+"""Async variants of the read-only WOS, CodeTable and correspondence queries."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+from exceptions import DatabaseError
+
+_WOS_TYPE_JOIN = (
+    (models.CodeTable.ColumnName == "WOSType") &
+    (models.CodeTable.CodeValue == models.WOSMaster.WOSType)
+)
+
+
+def _masters_with_description():
+    return select(
+        models.WOSMaster,
+        models.CodeTable.Description.label("WOSTypeDescription"),
+    ).outerjoin(models.CodeTable, _WOS_TYPE_JOIN)
+
+
+async def get_wos_masters_with_description_async(
+    db,
+    customer_code: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> list:
+    """Return WOSMaster rows with WOSTypeDescription. Raises DatabaseError on failure."""
+    try:
+        query = _masters_with_description()
+        if customer_code:
+            query = query.where(models.WOSMaster.CustomerCode == customer_code)
+        if from_date:
+            query = query.where(models.WOSMaster.DateTimeInitiated >= from_date)
+        if to_date:
+            query = query.where(models.WOSMaster.DateTimeInitiated <= to_date)
+        return (await db.execute(query)).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS masters", cause=e)
+
+
+async def get_wos_master_by_serial_async(db, serial_no: int) -> tuple | None:
+    """Return (WOSMaster, WOSTypeDescription) or None. Raises DatabaseError on failure."""
+    try:
+        query = _masters_with_description().where(models.WOSMaster.WOSSerial == serial_no)
+        return (await db.execute(query)).first()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS master by serial", cause=e)
+
+
+async def get_wos_lines_async(db, wos_serial: Optional[int] = None) -> list:
+    """Return WOSLine list, optionally filtered by WOSSerial. Raises DatabaseError on failure."""
+    try:
+        query = select(models.WOSLine)
+        if wos_serial is not None:
+            query = query.where(models.WOSLine.WOSSerial == wos_serial)
+        return (await db.scalars(query)).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS lines", cause=e)
+
+
+async def get_wos_line_async(db, wos_serial: int, line_serial: int):
+    """Return WOSLine or None. Raises DatabaseError on failure."""
+    try:
+        return (await db.scalars(select(models.WOSLine).where(
+            models.WOSLine.WOSSerial == wos_serial,
+            models.WOSLine.WOSLineSerial == line_serial,
+        ))).first()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line", cause=e)
+
+
+async def get_codetable_by_column_name_async(db, column_name: str) -> list:
+    """Return CodeTable rows for given ColumnName. Raises DatabaseError on failure."""
+    try:
+        return (await db.scalars(
+            select(models.CodeTable).where(models.CodeTable.ColumnName == column_name)
+        )).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch code table", cause=e)
+
+
+async def get_correspondence_by_wos_serial_async(db, wos_serial: int) -> list:
+    """Return correspondence list for WOSSerial with CorrespondenceTypeDescription. Raises DatabaseError."""
+    try:
+        query = select(
+            models.Correspondence,
+            models.CodeTable.Description.label("CorrespondenceTypeDescription"),
+        ).outerjoin(
+            models.CodeTable,
+            (models.CodeTable.ColumnName == "CorrespondenceType") &
+            (models.CodeTable.CodeValue == models.Correspondence.CorrespondenceType)
+        ).where(
+            models.Correspondence.TableName == "WOSMaster",
+            models.Correspondence.PrimaryKeyValue == str(wos_serial),
+        )
+        return (await db.execute(query)).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch correspondence", cause=e)
@@ -0,0 +1,67 @@
+"""Vetting change log (SQLite) queries with exception handling."""
+
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+import local_models
+from exceptions import DatabaseError
+
+
+def record_line_changes(db: Session, changes: list[dict], changed_at: datetime) -> None:
+    """Append vetting changes to the log. Raises DatabaseError on failure."""
+    try:
+        db.add_all([
+            local_models.WOSLineChange(
+                WOSSerial=change["WOSSerial"],
+                WOSLineSerial=change["WOSLineSerial"],
+                ChangedAt=changed_at,
+            )
+            for change in changes
+        ])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to record WOS line changes", cause=e)
+
+
+def get_line_changes_since(db: Session, seq: int) -> list:
+    """Return change log rows with seq greater than `seq`, oldest first. Raises DatabaseError."""
+    try:
+        return db.query(local_models.WOSLineChange).filter(
+            local_models.WOSLineChange.seq > seq
+        ).order_by(local_models.WOSLineChange.seq).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line changes", cause=e)
+
+
+def get_line_change_seq_bounds(db: Session) -> tuple[int | None, int | None]:
+    """Return (min seq, max seq) currently in the log. Raises DatabaseError."""
+    try:
+        return tuple(db.query(
+            func.min(local_models.WOSLineChange.seq),
+            func.max(local_models.WOSLineChange.seq),
+        ).one())
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line change bounds", cause=e)
+
+
+def purge_line_changes_before(db: Session, cutoff: datetime) -> int:
+    """
+    Delete log rows older than cutoff, always keeping the newest row so the lowest retained
+    seq shows which tokens have expired. Returns the number deleted. Raises DatabaseError.
+    """
+    try:
+        newest = db.query(func.max(local_models.WOSLineChange.seq)).scalar()
+        if newest is None:
+            return 0
+        deleted = db.query(local_models.WOSLineChange).filter(
+            local_models.WOSLineChange.ChangedAt < cutoff,
+            local_models.WOSLineChange.seq < newest,
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to purge WOS line changes", cause=e)
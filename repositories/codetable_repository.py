@@ -15,3 +15,11 @@ def get_codetable_by_column_name(db: Session, column_name: str) -> list:
         ).all()
     except SQLAlchemyError as e:
         raise DatabaseError("Failed to fetch code table", cause=e)
+
+
+def get_all_codetable(db: Session) -> list:
+    """Return every CodeTable row. Raises DatabaseError on failure."""
+    try:
+        return db.query(models.CodeTable).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch code table", cause=e)
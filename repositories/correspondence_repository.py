@@ -1,16 +1,19 @@
 """Correspondence database queries with exception handling."""
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy.exc import SQLAlchemyError
 
 import models
 from exceptions import DatabaseError
 
 
-def get_correspondence_by_wos_serial(db: Session, wos_serial: int) -> list:
-    """Return correspondence list for WOSSerial with CorrespondenceTypeDescription. Raises DatabaseError."""
+def get_correspondence_by_wos_serial(db: Session, wos_serial: int, stations=None) -> list:
+    """
+    Return correspondence list for WOSSerial with CorrespondenceTypeDescription. With
+    `stations`, only those stations' rows, ordered by LineNo. Raises DatabaseError.
+    """
     try:
-        return db.query(
+        query = db.query(
             models.Correspondence,
             models.CodeTable.Description.label("CorrespondenceTypeDescription")
         ).outerjoin(
@@ -20,6 +23,30 @@ def get_correspondence_by_wos_serial(db: Session, wos_serial: int) -> list:
         ).filter(
             models.Correspondence.TableName == "WOSMaster",
             models.Correspondence.PrimaryKeyValue == str(wos_serial)
-        ).all()
+        )
+        if stations is not None:
+            query = query.filter(models.Correspondence.StationCode.in_(stations)).order_by(
+                models.Correspondence.LineNo
+            )
+        return query.all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch correspondence", cause=e)
+
+
+def get_correspondence_since(db: Session, since, stations=None) -> list:
+    """
+    Return Correspondence rows dated at or after `since` (all rows when since is None),
+    without their Document. With `stations`, only those stations' rows, ordered by
+    DateTimeCorrespondence. Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(models.Correspondence).options(defer(models.Correspondence.Document))
+        if since is not None:
+            query = query.filter(models.Correspondence.DateTimeCorrespondence >= since)
+        if stations is not None:
+            query = query.filter(models.Correspondence.StationCode.in_(stations)).order_by(
+                models.Correspondence.DateTimeCorrespondence
+            )
+        return query.all()
     except SQLAlchemyError as e:
         raise DatabaseError("Failed to fetch correspondence", cause=e)
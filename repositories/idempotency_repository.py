@@ -0,0 +1,76 @@
+"""Idempotency key store (SQLite) queries with exception handling."""
+
+from datetime import datetime
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+import local_models
+from exceptions import DatabaseError
+
+
+def claim_idempotency_key(db: Session, key: str, fingerprint: str, expires_at: datetime) -> bool:
+    """
+    Insert an in-flight record for key. Returns False if the key already exists.
+    Raises DatabaseError on failure.
+    """
+    try:
+        db.execute(insert(local_models.IdempotencyKey).values(
+            key=key, fingerprint=fingerprint, created_at=datetime.now(), expires_at=expires_at,
+        ))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to store idempotency key", cause=e)
+
+
+def get_idempotency_key(db: Session, key: str):
+    """Return the IdempotencyKey record or None. Raises DatabaseError on failure."""
+    try:
+        db.expire_all()
+        return db.get(local_models.IdempotencyKey, key)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch idempotency key", cause=e)
+
+
+def complete_idempotency_key(
+    db: Session, key: str, status_code: int, response: bytes, expires_at: datetime
+) -> None:
+    """Store the response of the original request. Raises DatabaseError on failure."""
+    try:
+        db.execute(
+            update(local_models.IdempotencyKey)
+            .where(local_models.IdempotencyKey.key == key)
+            .values(status_code=status_code, response=response, expires_at=expires_at)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to store idempotent response", cause=e)
+
+
+def delete_idempotency_key(db: Session, key: str) -> None:
+    """Remove a record so the key can be used again. Raises DatabaseError on failure."""
+    try:
+        db.execute(delete(local_models.IdempotencyKey).where(local_models.IdempotencyKey.key == key))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to delete idempotency key", cause=e)
+
+
+def purge_expired_idempotency_keys(db: Session, now: datetime) -> int:
+    """Delete records past their expiry. Returns rows deleted. Raises DatabaseError on failure."""
+    try:
+        count = db.execute(
+            delete(local_models.IdempotencyKey).where(local_models.IdempotencyKey.expires_at < now)
+        ).rowcount
+        db.commit()
+        return count
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to purge idempotency keys", cause=e)
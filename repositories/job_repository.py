@@ -0,0 +1,188 @@
+"""Vetting job store (SQLite) queries with exception handling."""
+
+from datetime import datetime, timedelta
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+import local_models
+from exceptions import DatabaseError
+
+
+def create_vetting_job(db: Session, job_id: str, lines: list[dict]):
+    """Store a queued job and its line updates. Returns the VettingJob. Raises DatabaseError."""
+    try:
+        job = local_models.VettingJob(
+            id=job_id,
+            status="queued",
+            total_lines=len(lines),
+            processed_lines=0,
+            failed_lines=0,
+            created_at=datetime.now(),
+        )
+        db.add(job)
+        db.flush()
+        if lines:
+            db.execute(insert(local_models.VettingJobLine), [
+                {
+                    "job_id": job_id,
+                    "WOSSerial": line["WOSSerial"],
+                    "WOSLineSerial": line["WOSLineSerial"],
+                    "VettedQty": line["VettedQty"],
+                    "status": "pending",
+                }
+                for line in lines
+            ])
+        db.commit()
+        return job
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to create vetting job", cause=e)
+
+
+def get_vetting_job(db: Session, job_id: str):
+    """Return VettingJob or None. Raises DatabaseError on failure."""
+    try:
+        return db.get(local_models.VettingJob, job_id)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch vetting job", cause=e)
+
+
+def get_vetting_job_failures(db: Session, job_id: str) -> list:
+    """Return the job's lines that were not updated. Raises DatabaseError on failure."""
+    try:
+        return db.query(local_models.VettingJobLine).filter(
+            local_models.VettingJobLine.job_id == job_id,
+            local_models.VettingJobLine.status.notin_(["pending", "updated"]),
+        ).order_by(local_models.VettingJobLine.id).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch vetting job errors", cause=e)
+
+
+def claim_next_vetting_job(db: Session, owner: str, lease_seconds: float):
+    """
+    Lease the oldest claimable job to `owner`, mark it running and return it, or None.
+    Claimable jobs are queued ones and running ones whose lease has not been renewed for
+    `lease_seconds` (their worker died). The conditional update keeps two workers from
+    claiming the same job. Raises DatabaseError.
+    """
+    job_model = local_models.VettingJob
+    try:
+        while True:
+            now = datetime.now()
+            claimable = or_(
+                job_model.status == "queued",
+                and_(
+                    job_model.status == "running",
+                    or_(
+                        job_model.heartbeat_at.is_(None),
+                        job_model.heartbeat_at < now - timedelta(seconds=lease_seconds),
+                    ),
+                ),
+            )
+            job = db.query(job_model).filter(claimable).order_by(job_model.created_at).first()
+            if job is None:
+                return None
+            claimed = db.execute(
+                update(job_model)
+                .where(job_model.id == job.id, claimable)
+                .values(status="running", started_at=now, lease_owner=owner, heartbeat_at=now)
+            ).rowcount
+            db.commit()
+            if claimed:
+                db.refresh(job)
+                return job
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to claim vetting job", cause=e)
+
+
+def renew_vetting_job_lease(db: Session, job_id: str, owner: str) -> bool:
+    """
+    Extend `owner`'s lease on a running job. Returns False if the lease was lost to another
+    worker. Raises DatabaseError on failure.
+    """
+    try:
+        renewed = db.execute(
+            update(local_models.VettingJob)
+            .where(
+                local_models.VettingJob.id == job_id,
+                local_models.VettingJob.status == "running",
+                local_models.VettingJob.lease_owner == owner,
+            )
+            .values(heartbeat_at=datetime.now())
+        ).rowcount
+        db.commit()
+        return bool(renewed)
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to renew vetting job lease", cause=e)
+
+
+def get_pending_job_lines(db: Session, job_id: str, limit: int) -> list:
+    """Return up to `limit` pending lines of a job in submission order. Raises DatabaseError."""
+    try:
+        return db.query(local_models.VettingJobLine).filter(
+            local_models.VettingJobLine.job_id == job_id,
+            local_models.VettingJobLine.status == "pending",
+        ).order_by(local_models.VettingJobLine.id).limit(limit).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch pending job lines", cause=e)
+
+
+def record_job_line_results(db: Session, job_id: str, results: list[tuple[int, str, str | None]]) -> None:
+    """
+    Store (job line id, status, detail) results and advance the job's counters.
+    Raises DatabaseError on failure.
+    """
+    try:
+        for line_id, status, detail in results:
+            db.execute(
+                update(local_models.VettingJobLine)
+                .where(local_models.VettingJobLine.id == line_id)
+                .values(status=status, detail=detail)
+            )
+        failed = sum(1 for _, status, _ in results if status != "updated")
+        db.execute(
+            update(local_models.VettingJob)
+            .where(local_models.VettingJob.id == job_id)
+            .values(
+                processed_lines=local_models.VettingJob.processed_lines + len(results),
+                failed_lines=local_models.VettingJob.failed_lines + failed,
+            )
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to record vetting job results", cause=e)
+
+
+def finish_vetting_job(db: Session, job_id: str, owner: str, status: str, error: str | None = None) -> None:
+    """Mark a job leased to `owner` completed or failed. Raises DatabaseError on failure."""
+    try:
+        db.execute(
+            update(local_models.VettingJob)
+            .where(local_models.VettingJob.id == job_id, local_models.VettingJob.lease_owner == owner)
+            .values(status=status, finished_at=datetime.now(), error=error, lease_owner=None)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to finish vetting job", cause=e)
+
+
+def requeue_vetting_job(db: Session, job_id: str, owner: str) -> None:
+    """
+    Put a job leased to `owner` back in the queue; its pending lines are kept.
+    Raises DatabaseError on failure.
+    """
+    try:
+        db.execute(
+            update(local_models.VettingJob)
+            .where(local_models.VettingJob.id == job_id, local_models.VettingJob.lease_owner == owner)
+            .values(status="queued", lease_owner=None, heartbeat_at=None)
+        )
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to requeue vetting job", cause=e)
@@ -0,0 +1,62 @@
+"""Local WOS mirror queries with exception handling."""
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+import models
+from exceptions import DatabaseError
+from mirror_models import MirrorState
+
+# Rows per INSERT ... ON CONFLICT statement.
+_UPSERT_BATCH_SIZE = 500
+
+
+def get_mirror_state(mirror_db: Session):
+    """Return the mirror's sync state, or None if it was never synced. Raises DatabaseError."""
+    try:
+        return mirror_db.get(MirrorState, 1)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch mirror state", cause=e)
+
+
+def _upsert(mirror_db: Session, model, rows: list) -> None:
+    table = model.__table__
+    keys = [c.name for c in table.primary_key.columns]
+    for start in range(0, len(rows), _UPSERT_BATCH_SIZE):
+        statement = insert(table).values(rows[start:start + _UPSERT_BATCH_SIZE])
+        updates = {name: statement.excluded[name] for name in rows[start] if name not in keys}
+        mirror_db.execute(statement.on_conflict_do_update(index_elements=keys, set_=updates))
+
+
+def apply_mirror_sync(mirror_db: Session, upserts: dict, code_table: list, state: dict) -> None:
+    """
+    In one transaction: upsert rows ({model: [row dicts]}), replace the CodeTable copy and
+    save the sync state. Raises DatabaseError on failure.
+    """
+    try:
+        for model, rows in upserts.items():
+            if rows:
+                _upsert(mirror_db, model, rows)
+        mirror_db.query(models.CodeTable).delete()
+        if code_table:
+            _upsert(mirror_db, models.CodeTable, code_table)
+        mirror_db.merge(MirrorState(id=1, **state))
+        mirror_db.commit()
+    except SQLAlchemyError as e:
+        mirror_db.rollback()
+        raise DatabaseError("Failed to update WOS mirror", cause=e)
+
+
+def set_mirror_vetted_qty(mirror_db: Session, changes: list[dict]) -> None:
+    """Write committed VettedQty changes through to mirrored lines. Raises DatabaseError."""
+    try:
+        for change in changes:
+            mirror_db.query(models.WOSLine).filter(
+                models.WOSLine.WOSSerial == change["WOSSerial"],
+                models.WOSLine.WOSLineSerial == change["WOSLineSerial"],
+            ).update({models.WOSLine.VettedQty: change["VettedQty"]}, synchronize_session=False)
+        mirror_db.commit()
+    except SQLAlchemyError as e:
+        mirror_db.rollback()
+        raise DatabaseError("Failed to update WOS mirror", cause=e)
@@ -0,0 +1,135 @@
+"""WOS summary store (SQLite) queries with exception handling."""
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+
+import local_models
+from exceptions import DatabaseError
+
+_LINE_TOTALS = ("line_count", "vetted_line_count", "authorised_qty", "vetted_qty", "total_cost")
+_ROLLUP_TOTALS = ("wos_count", "closed_wos_count") + _LINE_TOTALS
+
+
+def _totals(summary) -> dict:
+    """Return a WOSSummary's contribution to its rollups (all zero for None)."""
+    if summary is None:
+        return dict.fromkeys(_ROLLUP_TOTALS, 0)
+    values = {name: getattr(summary, name) for name in _LINE_TOTALS}
+    return {"wos_count": 1, "closed_wos_count": int(summary.closed), **values}
+
+
+def _add_to_rollups(db: Session, customer_code: str, wos_type: str, deltas: dict) -> None:
+    """Add deltas to the customer and WOSType rollups with atomic upserts."""
+    if not any(deltas.values()):
+        return
+    table = local_models.SummaryRollup.__table__
+    for dimension, key in (("customer", customer_code), ("wostype", wos_type)):
+        statement = insert(table).values(dimension=dimension, key=key, **deltas)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["dimension", "key"],
+            set_={name: table.c[name] + statement.excluded[name] for name in deltas},
+        ))
+
+
+def get_summary_state(db: Session):
+    """Return the summaries' sync state, or None if never synced. Raises DatabaseError."""
+    try:
+        return db.get(local_models.SummaryState, 1)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch summary state", cause=e)
+
+
+def save_wos_summaries(db: Session, summaries: list[dict], state: dict) -> None:
+    """
+    Replace the given WOS summaries, move the difference into the rollups and save the
+    sync state, in one transaction. Raises DatabaseError on failure.
+
+    The state is written first so the transaction holds SQLite's write lock before any
+    summary is read: a concurrent save or vetting delta cannot change a summary between
+    reading it and moving its difference into the rollups.
+    """
+    table = local_models.SummaryState.__table__
+    statement = insert(table).values(id=1, **state)
+    try:
+        db.execute(statement.on_conflict_do_update(index_elements=["id"], set_=state))
+        for values in summaries:
+            old = db.get(local_models.WOSSummary, values["WOSSerial"], populate_existing=True)
+            before = _totals(old)
+            if old is None:
+                old = local_models.WOSSummary(WOSSerial=values["WOSSerial"])
+                db.add(old)
+            elif (old.CustomerCode, old.WOSType) != (values["CustomerCode"], values["WOSType"]):
+                _add_to_rollups(db, old.CustomerCode, old.WOSType, {k: -v for k, v in before.items()})
+                before = _totals(None)
+            for name, value in values.items():
+                setattr(old, name, value)
+            after = _totals(old)
+            _add_to_rollups(db, old.CustomerCode, old.WOSType, {k: after[k] - before[k] for k in after})
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to save WOS summaries", cause=e)
+
+
+def add_wos_vetting_delta(db: Session, wos_serial: int, vetted_line_count: int, vetted_qty: float) -> bool:
+    """
+    Add a vetting delta to a WOS summary and its rollups. Returns False if the WOS has no
+    summary yet. Raises DatabaseError on failure.
+    """
+    summary = local_models.WOSSummary
+    deltas = {"vetted_line_count": vetted_line_count, "vetted_qty": vetted_qty}
+    try:
+        # Update before reading the row's rollup keys, so a concurrent save cannot move
+        # the WOS to another customer or WOSType in between.
+        updated = db.query(summary).filter(summary.WOSSerial == wos_serial).update(
+            {getattr(summary, name): getattr(summary, name) + delta for name, delta in deltas.items()},
+            synchronize_session=False,
+        )
+        if not updated:
+            db.rollback()
+            return False
+        row = db.get(summary, wos_serial, populate_existing=True)
+        _add_to_rollups(db, row.CustomerCode, row.WOSType, deltas)
+        db.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to update WOS summary", cause=e)
+
+
+def get_summary_rollups(db: Session, dimension: str) -> list:
+    """Return the rollups of a dimension ordered by key. Raises DatabaseError on failure."""
+    try:
+        return db.query(local_models.SummaryRollup).filter(
+            local_models.SummaryRollup.dimension == dimension
+        ).order_by(local_models.SummaryRollup.key).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch summary rollups", cause=e)
+
+
+def get_summary_rollup(db: Session, dimension: str, key: str):
+    """Return one rollup or None. Raises DatabaseError on failure."""
+    try:
+        return db.get(local_models.SummaryRollup, (dimension, key))
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch summary rollup", cause=e)
+
+
+def get_wos_summaries(db: Session, customer_code=None) -> list:
+    """Return WOS summaries ordered by WOSSerial, optionally for one customer. Raises DatabaseError."""
+    try:
+        query = db.query(local_models.WOSSummary)
+        if customer_code:
+            query = query.filter(local_models.WOSSummary.CustomerCode == customer_code)
+        return query.order_by(local_models.WOSSummary.WOSSerial).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS summaries", cause=e)
+
+
+def get_wos_summary(db: Session, wos_serial: int):
+    """Return one WOS summary or None. Raises DatabaseError on failure."""
+    try:
+        return db.get(local_models.WOSSummary, wos_serial)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS summary", cause=e)
@@ -19,10 +19,16 @@ def get_user_count(db: Session) -> int:
         raise DatabaseError("Failed to count users", cause=e)
 
 
-def get_all_users(db: Session) -> list:
-    """Return all users. Raises DatabaseError on failure."""
+def get_all_users(db: Session, stations=None) -> list:
+    """
+    Return all users. With `stations`, only those stations' users, ordered by LoginId.
+    Raises DatabaseError on failure.
+    """
     try:
-        return db.query(models.User).all()
+        query = db.query(models.User)
+        if stations is not None:
+            query = query.filter(models.User.StationCode.in_(stations)).order_by(models.User.LoginId)
+        return query.all()
     except SQLAlchemyError as e:
         raise DatabaseError("Failed to fetch users", cause=e)
 
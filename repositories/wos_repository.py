@@ -2,10 +2,12 @@
 
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
 import models
+import vetting_events
 from exceptions import DatabaseError, NotFoundError
 from models import VettedQtyValidationError
 
@@ -37,6 +39,49 @@ def get_wos_masters_with_description(
         raise DatabaseError("Failed to fetch WOS masters", cause=e)
 
 
+def get_wos_masters_initiated_between(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    customer_code: Optional[str] = None,
+) -> list:
+    """
+    Return (WOSMaster, WOSTypeDescription) rows with start <= DateTimeInitiated < end.
+    Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(
+            models.WOSMaster,
+            models.CodeTable.Description.label("WOSTypeDescription")
+        ).outerjoin(
+            models.CodeTable,
+            (models.CodeTable.ColumnName == "WOSType") &
+            (models.CodeTable.CodeValue == models.WOSMaster.WOSType)
+        ).filter(
+            models.WOSMaster.DateTimeInitiated >= start,
+            models.WOSMaster.DateTimeInitiated < end,
+        )
+        if customer_code:
+            query = query.filter(models.WOSMaster.CustomerCode == customer_code)
+        return query.all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS masters", cause=e)
+
+
+def get_first_wos_master_initiated(db: Session, customer_code: Optional[str] = None) -> datetime | None:
+    """
+    Return the earliest DateTimeInitiated, optionally for one customer, or None if there
+    are no WOS. Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(func.min(models.WOSMaster.DateTimeInitiated))
+        if customer_code:
+            query = query.filter(models.WOSMaster.CustomerCode == customer_code)
+        return query.scalar()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch first WOS master date", cause=e)
+
+
 def get_wos_master_by_serial(db: Session, serial_no: int) -> tuple | None:
     """Return (WOSMaster, WOSTypeDescription) or None. Raises DatabaseError on failure."""
     try:
@@ -74,6 +119,247 @@ def get_wos_line(db: Session, wos_serial: int, line_serial: int):
         raise DatabaseError("Failed to fetch WOS line", cause=e)
 
 
+def _filter_initiated(query, from_date: Optional[datetime], to_date: Optional[datetime]):
+    if from_date is None and to_date is None:
+        return query
+    query = query.join(models.WOSMaster, models.WOSMaster.WOSSerial == models.WOSLine.WOSSerial)
+    if from_date:
+        query = query.filter(models.WOSMaster.DateTimeInitiated >= from_date)
+    if to_date:
+        query = query.filter(models.WOSMaster.DateTimeInitiated <= to_date)
+    return query
+
+
+def get_wos_line_serial_bounds(
+    db: Session,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> tuple[int | None, int | None]:
+    """
+    Return the (min, max) WOSSerial of the lines whose WOS was initiated in the date range,
+    or (None, None) if there are none. Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(func.min(models.WOSLine.WOSSerial), func.max(models.WOSLine.WOSSerial))
+        return tuple(_filter_initiated(query, from_date, to_date).one())
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line bounds", cause=e)
+
+
+def iter_wos_lines_in_range(
+    db: Session,
+    first_serial: int,
+    last_serial: int,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    batch_size: int = 1000,
+):
+    """
+    Yield lists of up to batch_size WOSLines with first_serial <= WOSSerial <= last_serial,
+    in (WOSSerial, WOSLineSerial) order. Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(models.WOSLine).filter(
+            models.WOSLine.WOSSerial >= first_serial,
+            models.WOSLine.WOSSerial <= last_serial,
+        )
+        query = _filter_initiated(query, from_date, to_date).order_by(
+            models.WOSLine.WOSSerial, models.WOSLine.WOSLineSerial
+        )
+        batch = []
+        for line in query.yield_per(batch_size):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to export WOS lines", cause=e)
+
+
+_MASTER_CHANGE_COLUMNS = (
+    models.WOSMaster.DateTimeInitiated,
+    models.WOSMaster.DateTimeConcurred,
+    models.WOSMaster.DateTimeApproved,
+    models.WOSMaster.DateTimeClosed,
+)
+
+
+def get_wos_masters_changed_since(
+    db: Session,
+    since: Optional[datetime],
+    customer_code: Optional[str] = None,
+    initiated_from: Optional[datetime] = None,
+    initiated_before: Optional[datetime] = None,
+) -> list:
+    """
+    Return (WOSMaster, WOSTypeDescription) rows initiated, concurred, approved or closed
+    at or after `since` (all rows when since is None), optionally only one customer's and
+    only those initiated in [initiated_from, initiated_before). Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(
+            models.WOSMaster,
+            models.CodeTable.Description.label("WOSTypeDescription")
+        ).outerjoin(
+            models.CodeTable,
+            (models.CodeTable.ColumnName == "WOSType") &
+            (models.CodeTable.CodeValue == models.WOSMaster.WOSType)
+        )
+        if since is not None:
+            query = query.filter(or_(*(column >= since for column in _MASTER_CHANGE_COLUMNS)))
+        if customer_code:
+            query = query.filter(models.WOSMaster.CustomerCode == customer_code)
+        if initiated_from is not None:
+            query = query.filter(models.WOSMaster.DateTimeInitiated >= initiated_from)
+        if initiated_before is not None:
+            query = query.filter(models.WOSMaster.DateTimeInitiated < initiated_before)
+        return query.all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch changed WOS masters", cause=e)
+
+
+def get_wos_lines_changed_since(db: Session, since: Optional[datetime]) -> list:
+    """
+    Return (WOSLine, WOSMaster.DateTimeInitiated) rows for lines closed at or after `since`,
+    or belonging to a WOS initiated at or after it (all rows when since is None).
+    Raises DatabaseError on failure.
+    """
+    try:
+        query = db.query(models.WOSLine, models.WOSMaster.DateTimeInitiated).join(models.WOSMaster)
+        if since is not None:
+            query = query.filter(or_(
+                models.WOSLine.DateTimeClosed >= since,
+                models.WOSMaster.DateTimeInitiated >= since,
+            ))
+        return query.all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch changed WOS lines", cause=e)
+
+
+def _line_keys_filter(keys: list[tuple[int, int]]):
+    by_wos: dict[int, set[int]] = {}
+    for wos_serial, line_serial in keys:
+        by_wos.setdefault(wos_serial, set()).add(line_serial)
+    return or_(*(
+        and_(models.WOSLine.WOSSerial == wos_serial, models.WOSLine.WOSLineSerial.in_(sorted(lines)))
+        for wos_serial, lines in sorted(by_wos.items())
+    ))
+
+
+def get_wos_lines_by_keys(db: Session, keys: list[tuple[int, int]]) -> list:
+    """Return WOSLine rows for (WOSSerial, WOSLineSerial) keys. Raises DatabaseError on failure."""
+    if not keys:
+        return []
+    try:
+        return db.query(models.WOSLine).filter(_line_keys_filter(keys)).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS lines by key", cause=e)
+
+
+_ANALYTICS_COLUMNS = (
+    models.WOSLine.WOSSerial,
+    models.WOSLine.WOSLineSerial,
+    models.WOSLine.ItemCode,
+    models.WOSLine.SOS,
+    models.WOSLine.ItemDeno,
+    models.WOSMaster.CustomerCode,
+    models.WOSLine.AuthorisedQty,
+    models.WOSLine.ReceivedQty,
+    models.WOSLine.VettedQty,
+    models.WOSLine.TotalCost,
+    models.WOSMaster.DateTimeInitiated,
+    models.WOSLine.DateTimeClosed,
+)
+
+
+def _iter_changed_line_rows(db: Session, columns, since, keys, batch_size: int):
+    if keys is not None and not keys:
+        return
+    query = db.query(*columns).join(
+        models.WOSMaster, models.WOSMaster.WOSSerial == models.WOSLine.WOSSerial
+    )
+    if keys is not None:
+        query = query.filter(_line_keys_filter(keys))
+    elif since is not None:
+        query = query.filter(or_(
+            models.WOSLine.DateTimeClosed >= since,
+            models.WOSMaster.DateTimeInitiated >= since,
+        ))
+    batch = []
+    for row in query.yield_per(batch_size):
+        batch.append(tuple(row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_wos_line_columns(
+    db: Session,
+    since: Optional[datetime] = None,
+    keys: Optional[list[tuple[int, int]]] = None,
+    batch_size: int = 10000,
+):
+    """
+    Yield lists of up to batch_size column tuples (WOSSerial, WOSLineSerial, ItemCode, SOS,
+    ItemDeno, CustomerCode, AuthorisedQty, ReceivedQty, VettedQty, TotalCost,
+    DateTimeInitiated, DateTimeClosed) for the lines with the given keys, else for lines
+    closed at or after `since` or of a WOS initiated at or after it (all lines when since is
+    None). Raises DatabaseError on failure.
+    """
+    try:
+        yield from _iter_changed_line_rows(db, _ANALYTICS_COLUMNS, since, keys, batch_size)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line columns", cause=e)
+
+
+_ITEM_COLUMNS = (
+    models.WOSLine.WOSSerial,
+    models.WOSLine.WOSLineSerial,
+    models.WOSLine.ItemCode,
+    models.WOSLine.ItemDesc,
+    models.WOSMaster.DateTimeInitiated,
+    models.WOSLine.DateTimeClosed,
+)
+
+
+def iter_wos_line_items(db: Session, since: Optional[datetime] = None, batch_size: int = 10000):
+    """
+    Yield lists of up to batch_size (WOSSerial, WOSLineSerial, ItemCode, ItemDesc,
+    DateTimeInitiated, DateTimeClosed) tuples for lines closed at or after `since` or of a
+    WOS initiated at or after it (all lines when since is None). Raises DatabaseError.
+    """
+    try:
+        yield from _iter_changed_line_rows(db, _ITEM_COLUMNS, since, None, batch_size)
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line items", cause=e)
+
+
+def get_wos_line_totals(db: Session, wos_serials: list[int]) -> list:
+    """
+    Return per-WOS line totals for the given WOSSerials: (WOSSerial, line_count,
+    vetted_line_count, authorised_qty, vetted_qty, total_cost). WOS without lines are
+    omitted. Raises DatabaseError on failure.
+    """
+    if not wos_serials:
+        return []
+    line = models.WOSLine
+    try:
+        return db.query(
+            line.WOSSerial,
+            func.count().label("line_count"),
+            func.count(line.VettedQty).label("vetted_line_count"),
+            func.coalesce(func.sum(line.AuthorisedQty), 0).label("authorised_qty"),
+            func.coalesce(func.sum(line.VettedQty), 0).label("vetted_qty"),
+            func.coalesce(func.sum(line.TotalCost), 0).label("total_cost"),
+        ).filter(line.WOSSerial.in_(wos_serials)).group_by(line.WOSSerial).all()
+    except SQLAlchemyError as e:
+        raise DatabaseError("Failed to fetch WOS line totals", cause=e)
+
+
 def update_wos_line_vetted_qty(
     db: Session,
     wos_serial: int,
@@ -91,9 +377,11 @@ def update_wos_line_vetted_qty(
         ).first()
         if not line:
             raise NotFoundError("WOSLine not found")
+        previous = line.VettedQty
         line.VettedQty = vetted_qty
         db.commit()
         db.refresh(line)
+        vetting_events.publish(wos_serial, [vetting_events.line_change(line, previous)])
         return line
     except NotFoundError:
         raise
@@ -115,9 +403,11 @@ def bulk_update_wos_lines_vetted_qty(
     Returns list of refreshed WOSLine. Raises NotFoundError, DatabaseError, or VettedQtyValidationError.
     """
     try:
-        updated = []
-        for line_serial, vetted_qty in line_updates:
-            line = db.query(models.WOSLine).filter(
+        lines = {}
+        previous = {}
+        # Touch rows in key order so concurrent writers take page locks in the same order.
+        for line_serial, vetted_qty in sorted(line_updates, key=lambda u: u[0]):
+            line = lines.get(line_serial) or db.query(models.WOSLine).filter(
                 models.WOSLine.WOSSerial == wos_serial,
                 models.WOSLine.WOSLineSerial == line_serial
             ).first()
@@ -125,12 +415,16 @@ def bulk_update_wos_lines_vetted_qty(
                 raise NotFoundError(
                     f"WOSLine with LineSerial {line_serial} not found for WosSerial {wos_serial}"
                 )
+            previous.setdefault(line_serial, line.VettedQty)
             line.VettedQty = vetted_qty
-            updated.append(line)
+            lines[line_serial] = line
         db.commit()
-        for line in updated:
+        for line in lines.values():
             db.refresh(line)
-        return updated
+        vetting_events.publish(wos_serial, [
+            vetting_events.line_change(line, previous[line_serial]) for line_serial, line in lines.items()
+        ])
+        return [lines[line_serial] for line_serial, _ in line_updates]
     except NotFoundError:
         db.rollback()
         raise
@@ -140,3 +434,32 @@ def bulk_update_wos_lines_vetted_qty(
     except SQLAlchemyError as e:
         db.rollback()
         raise DatabaseError("Failed to bulk update WOS lines", cause=e)
+
+
+def set_wos_lines_vetted_qty(db: Session, assignments: list[tuple]) -> list:
+    """
+    Set VettedQty on WOSLines already loaded in this session, in one transaction.
+    assignments: [(WOSLine, VettedQty), ...], possibly spanning several WOSSerials.
+    Returns the updated WOSLines. Raises DatabaseError or VettedQtyValidationError.
+    """
+    try:
+        previous = {}
+        for line, vetted_qty in sorted(assignments, key=lambda a: (a[0].WOSSerial, a[0].WOSLineSerial)):
+            previous.setdefault(id(line), line.VettedQty)
+            line.VettedQty = vetted_qty
+        db.commit()
+        changes_by_wos: dict[int, list] = {}
+        for line in {id(line): line for line, _ in assignments}.values():
+            db.refresh(line)
+            changes_by_wos.setdefault(line.WOSSerial, []).append(
+                vetting_events.line_change(line, previous[id(line)])
+            )
+        for wos_serial, changes in changes_by_wos.items():
+            vetting_events.publish(wos_serial, changes)
+        return [line for line, _ in assignments]
+    except VettedQtyValidationError:
+        db.rollback()
+        raise
+    except SQLAlchemyError as e:
+        db.rollback()
+        raise DatabaseError("Failed to update WOS lines", cause=e)
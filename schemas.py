@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class LoginRequest(BaseModel):
@@ -100,6 +100,40 @@ class WOSLinesBulkUpdate(BaseModel):
     WOSSerial: int
     Lines: List[WOSLineUpdateSingle]
 
+class WOSLineKeyedUpdate(BaseModel):
+    WOSSerial: int
+    WOSLineSerial: int
+    VettedQty: float
+
+class WOSLinesBatchUpdate(BaseModel):
+    Lines: List[WOSLineKeyedUpdate]
+
+class WOSLineUpdateResult(BaseModel):
+    WOSSerial: int
+    WOSLineSerial: int
+    status: str
+    detail: Optional[str] = None
+
+class WOSLinesBatchResult(BaseModel):
+    updated: int
+    failed: int
+    results: List[WOSLineUpdateResult]
+
+class VettingJobCreate(BaseModel):
+    Lines: List[WOSLineKeyedUpdate]
+
+class VettingJob(BaseModel):
+    id: str
+    status: str
+    total_lines: int
+    processed_lines: int
+    failed_lines: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    errors: List[WOSLineUpdateResult] = []
+
 class WOSMasterBase(BaseModel):
     WOSSerial: int
     CustomerCode: str
@@ -126,6 +160,14 @@ class WOSMasterWithLines(WOSMasterBase):
     lines: List[WOSLine] = []
     model_config = ConfigDict(from_attributes=True)
 
+class WOSMasterChanges(BaseModel):
+    changes: List[WOSMaster]
+    next: str
+
+class WOSLineChanges(BaseModel):
+    changes: List[WOSLine]
+    next: str
+
 class CodeTableBase(BaseModel):
     ColumnName: str
     CodeValue: str
@@ -152,3 +194,76 @@ class CorrespondenceBase(BaseModel):
 
 class Correspondence(CorrespondenceBase):
     model_config = ConfigDict(from_attributes=True)
+
+
+class SummaryRollup(BaseModel):
+    key: str
+    wos_count: int
+    open_wos_count: int
+    closed_wos_count: int
+    line_count: int
+    vetted_line_count: int
+    authorised_qty: float
+    vetted_qty: float
+    total_cost: float
+
+
+class WOSSummary(BaseModel):
+    WOSSerial: int
+    CustomerCode: str
+    WOSType: str
+    closed: bool
+    line_count: int
+    vetted_line_count: int
+    authorised_qty: float
+    vetted_qty: float
+    total_cost: float
+    updated_at: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AnalyticsGroup(BaseModel):
+    group: Dict[str, str]
+    count: int
+    authorised_qty: float
+    authorised_qty_lines: int
+    received_qty: float
+    received_qty_lines: int
+    vetted_qty: float
+    vetted_qty_lines: int
+    total_cost: float
+    total_cost_lines: int
+    percentiles: Dict[str, Optional[float]]
+
+
+class AnalyticsResult(BaseModel):
+    as_of: datetime
+    truncated: bool
+    lines: int
+    measure: str
+    groups: List[AnalyticsGroup]
+
+
+class AnalyticsStatus(BaseModel):
+    ready: bool
+    lines: int
+    truncated: bool
+    as_of: Optional[datetime] = None
+    memory_bytes: int
+
+
+class ItemSearchHit(BaseModel):
+    WOSSerial: int
+    WOSLineSerial: int
+    ItemCode: str
+    ItemDesc: str
+    score: int
+
+
+class ItemSearchResult(BaseModel):
+    as_of: datetime
+    truncated: bool
+    total: int
+    offset: int
+    limit: int
+    results: List[ItemSearchHit]
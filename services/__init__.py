@@ -8,10 +8,34 @@ from .wos_service import (
     get_wos_line,
     update_wos_line,
     bulk_update_wos_lines,
+    batch_update_wos_lines,
 )
 from .correspondence_service import get_correspondence
 from .codetable_service import get_codetable_data
 from .auth_service import login_user, forgot_password, reset_password
+from .change_feed_service import get_wos_master_changes, get_wos_line_changes, purge_change_log
+from .job_service import submit_vetting_job, get_vetting_job_status
+from .idempotency_service import request_fingerprint, run_idempotent, purge_idempotency_keys
+from .export_service import export_wos_lines
+from .mirror_service import sync_mirror, init_mirror
+from .summary_service import (
+    sync_summaries,
+    get_summary_by_customer,
+    get_customer_summary,
+    get_summary_by_wos_type,
+    get_wos_summaries,
+    get_wos_summary,
+)
+from .analytics_service import query_wos_line_analytics, get_analytics_status
+from .item_search_service import search_wos_line_items
+from .async_read_service import (
+    get_wos_masters_async,
+    get_wos_master_by_serial_async,
+    get_wos_lines_async,
+    get_wos_line_async,
+    get_codetable_data_async,
+    get_correspondence_async,
+)
 
 __all__ = [
     "get_all_users",
@@ -21,9 +45,36 @@ __all__ = [
     "get_wos_line",
     "update_wos_line",
     "bulk_update_wos_lines",
+    "batch_update_wos_lines",
     "get_correspondence",
     "get_codetable_data",
     "login_user",
     "forgot_password",
     "reset_password",
+    "get_wos_master_changes",
+    "get_wos_line_changes",
+    "purge_change_log",
+    "submit_vetting_job",
+    "get_vetting_job_status",
+    "request_fingerprint",
+    "run_idempotent",
+    "purge_idempotency_keys",
+    "export_wos_lines",
+    "sync_mirror",
+    "init_mirror",
+    "sync_summaries",
+    "get_summary_by_customer",
+    "get_customer_summary",
+    "get_summary_by_wos_type",
+    "get_wos_summaries",
+    "get_wos_summary",
+    "query_wos_line_analytics",
+    "get_analytics_status",
+    "search_wos_line_items",
+    "get_wos_masters_async",
+    "get_wos_master_by_serial_async",
+    "get_wos_lines_async",
+    "get_wos_line_async",
+    "get_codetable_data_async",
+    "get_correspondence_async",
 ]
@@ -0,0 +1,478 @@
+"""
+Columnar in-memory snapshot of WOSLine for item-level analytics.
+
+The snapshot holds one NumPy array per column: ItemCode, SOS, ItemDeno and the WOS's
+CustomerCode as dictionary codes (int32), AuthorisedQty, ReceivedQty, VettedQty and TotalCost
+as float64 (NaN for NULL), and DateTimeInitiated as datetime64. Filters are boolean masks
+and group-bys are np.unique over the combined group codes followed by np.bincount, so a
+query over millions of lines never loops in Python.
+
+After the first full load, a background thread refreshes every ANALYTICS_REFRESH_SECONDS
+with the same rules as the WOSLine change feed: lines of newly initiated WOS, closed lines
+and lines named in the vetting change log are re-read and updated in place or appended.
+Vetting writes through this API queue their VettedQty changes, which are applied at once
+unless a refresh holds the snapshot, and otherwise by the next query or refresh. Queries
+hold the lock only to take the column views; a refresh running meanwhile may show through
+for some lines. Memory is bounded by
+ANALYTICS_MAX_LINES: about 70 bytes per line, up to twice that while capacity grows, plus
+the distinct strings. Lines beyond it are not loaded and results report `truncated`.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import circuit_breaker
+import database
+import metrics
+import vetting_events
+from repositories import get_line_changes_since, get_line_change_seq_bounds, iter_wos_line_columns
+from exceptions import BadRequestError, DatabaseError, NotFoundError, ServiceUnavailableError
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "false").lower() in ("1", "true", "yes")
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", 60))
+ANALYTICS_MAX_LINES = int(os.getenv("ANALYTICS_MAX_LINES", 5_000_000))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 10000))
+
+DIMENSIONS = ("item_code", "sos", "item_deno", "customer_code")
+MEASURES = ("authorised_qty", "received_qty", "vetted_qty", "total_cost")
+
+# Keys per query when re-reading lines named in the change log.
+_KEY_BATCH_SIZE = 500
+
+metrics.describe("analytics_refresh_total", "WOSLine analytics snapshot refreshes by result.")
+
+
+def _line_key(wos_serial, line_serial):
+    return (np.asarray(wos_serial, dtype=np.int64) << 32) | np.asarray(line_serial, dtype=np.int64)
+
+
+class _Dictionary:
+    """Dictionary encoding of a string column: value <-> int32 code."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class LineSnapshot:
+    """Columnar WOSLine snapshot with incremental refresh and vectorised aggregates."""
+
+    def __init__(self, max_lines: int = ANALYTICS_MAX_LINES):
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self.size = 0
+        self.truncated = False
+        self.as_of = None
+        self._seq = 0
+        self._watermark = None
+        self._dictionaries = {name: _Dictionary() for name in DIMENSIONS}
+        self._columns = self._allocate(0)
+        self._sorted_keys = np.empty(0, dtype=np.int64)
+        self._order = np.empty(0, dtype=np.int64)
+
+    @staticmethod
+    def _allocate(capacity: int) -> dict:
+        columns = {
+            "key": np.empty(capacity, dtype=np.int64),
+            "initiated": np.empty(capacity, dtype="datetime64[s]"),
+        }
+        columns.update({name: np.empty(capacity, dtype=np.int32) for name in DIMENSIONS})
+        columns.update({name: np.empty(capacity, dtype=np.float64) for name in MEASURES})
+        return columns
+
+    @property
+    def ready(self) -> bool:
+        return self.as_of is not None
+
+    def memory_bytes(self) -> int:
+        index = self._sorted_keys.nbytes + self._order.nbytes
+        return sum(column.nbytes for column in self._columns.values()) + index
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        """Return the row index of each key, or -1 where the key is not loaded."""
+        if not len(self._sorted_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+        return np.where(self._sorted_keys[found] == keys, self._order[found], -1)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._columns["key"])
+        if needed <= capacity:
+            return
+        columns = self._allocate(min(max(needed, capacity * 2, 1024), self.max_lines))
+        for name, column in columns.items():
+            column[:self.size] = self._columns[name][:self.size]
+        self._columns = columns
+
+    def _reindex(self) -> None:
+        self._order = np.argsort(self._columns["key"][:self.size], kind="stable")
+        self._sorted_keys = self._columns["key"][:self.size][self._order]
+
+    def _apply(self, rows: list, reindex: bool = True) -> None:
+        """
+        Upsert a batch of iter_wos_line_columns rows. Caller holds the lock, or owns the
+        snapshot during a full load, where reindex=False defers the key index to the end.
+        """
+        if not rows:
+            return
+        keys = _line_key([r[0] for r in rows], [r[1] for r in rows])
+        values = {
+            "key": keys,
+            "initiated": np.array([r[10] for r in rows], dtype="datetime64[s]"),
+        }
+        for i, name in enumerate(DIMENSIONS, start=2):
+            encode = self._dictionaries[name].encode
+            values[name] = np.fromiter((encode(r[i]) for r in rows), dtype=np.int32, count=len(rows))
+        for i, name in enumerate(MEASURES, start=6):
+            values[name] = np.array(
+                [np.nan if r[i] is None else float(r[i]) for r in rows], dtype=np.float64
+            )
+
+        positions = self._positions(keys)
+        existing = positions >= 0
+        for name, column in values.items():
+            self._columns[name][positions[existing]] = column[existing]
+
+        new = np.flatnonzero(~existing)
+        room = self.max_lines - self.size
+        if len(new) > room:
+            self.truncated = True
+            new = new[:room]
+        if len(new):
+            self._grow(self.size + len(new))
+            end = self.size + len(new)
+            for name, column in values.items():
+                self._columns[name][self.size:end] = column[new]
+            self.size = end
+            if reindex:
+                self._reindex()
+
+        for r in rows:
+            for moment in (r[10], r[11]):
+                if moment is not None and (self._watermark is None or moment > self._watermark):
+                    self._watermark = moment
+
+    def refresh(self, db: Session, local_db: Session) -> int:
+        """
+        Load every line on the first call, afterwards only changed lines. Returns the number
+        of rows read. Raises DatabaseError or ServiceUnavailableError.
+        """
+        started = datetime.now()
+        # Read the log before Sybase so nothing committed in between is skipped.
+        min_seq, max_seq = get_line_change_seq_bounds(local_db)
+        with self._lock:
+            full = not self.ready or (min_seq is not None and self._seq < min_seq - 1)
+            since, seq = (None, 0) if full else (self._watermark, self._seq)
+        if full:
+            # Build a fresh snapshot batch by batch, then swap it in; queries keep the old one.
+            fresh = LineSnapshot(self.max_lines)
+            rows = 0
+            for batch in iter_wos_line_columns(db, batch_size=ANALYTICS_BATCH_SIZE):
+                fresh._apply(batch, reindex=False)
+                rows += len(batch)
+            fresh._reindex()
+            fresh._seq = max_seq or 0
+            fresh.as_of = started
+            with self._lock:
+                for name, value in vars(fresh).items():
+                    if name not in ("_lock", "_pending_lock", "_pending"):
+                        setattr(self, name, value)
+                self._apply_pending()
+            return rows
+
+        logged = get_line_changes_since(local_db, seq)
+        next_seq = logged[-1].seq if logged else max(seq, max_seq or 0)
+        batches = list(iter_wos_line_columns(db, since=since, batch_size=ANALYTICS_BATCH_SIZE))
+        keys = sorted({(c.WOSSerial, c.WOSLineSerial) for c in logged})
+        for start in range(0, len(keys), _KEY_BATCH_SIZE):
+            batches.extend(iter_wos_line_columns(db, keys=keys[start:start + _KEY_BATCH_SIZE]))
+
+        with self._lock:
+            for batch in batches:
+                self._apply(batch)
+            self._seq = next_seq
+            self.as_of = started
+            self._apply_pending()
+        return sum(len(batch) for batch in batches)
+
+    def set_vetted_qty(self, changes: list[dict]) -> None:
+        """
+        Queue committed VettedQty changes and apply them unless the snapshot is busy, in
+        which case the lock holder or the next query applies them. Never blocks the caller.
+        """
+        with self._pending_lock:
+            self._pending.extend(changes)
+        if self._lock.acquire(blocking=False):
+            try:
+                self._apply_pending()
+            finally:
+                self._lock.release()
+
+    def _apply_pending(self) -> None:
+        """Apply queued VettedQty changes to loaded lines. Caller holds the lock."""
+        with self._pending_lock:
+            changes, self._pending = self._pending, []
+        if not changes:
+            return
+        keys = _line_key([c["WOSSerial"] for c in changes], [c["WOSLineSerial"] for c in changes])
+        vetted = np.array(
+            [np.nan if c["VettedQty"] is None else c["VettedQty"] for c in changes], dtype=np.float64
+        )
+        positions = self._positions(keys)
+        loaded = positions >= 0
+        self._columns["vetted_qty"][positions[loaded]] = vetted[loaded]
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "lines": self.size,
+                "truncated": self.truncated,
+                "as_of": self.as_of,
+                "memory_bytes": self.memory_bytes(),
+            }
+
+    def aggregate(
+        self,
+        group_by: tuple = (),
+        filters: Optional[dict] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        measure: str = "vetted_qty",
+        percentiles: tuple = (),
+        sort: str = "count",
+        limit: Optional[int] = None,
+    ) -> dict:
+        """
+        Group the lines matching `filters` (dimension -> value) and the WOS initiation date
+        range by the `group_by` dimensions. Each group has its line count, the sum and
+        non-NULL count of every measure, and the requested percentiles (0-100) of `measure`.
+        Groups are ordered by `sort` (count or a measure) descending.
+        """
+        with self._lock:
+            if not self.ready:
+                raise ServiceUnavailableError("Analytics snapshot is loading", retry_after=5)
+            self._apply_pending()
+            n = self.size
+            columns = {name: column[:n] for name, column in self._columns.items()}
+            dictionaries = self._dictionaries
+            filter_codes = {
+                name: dictionaries[name].codes.get(value) for name, value in (filters or {}).items()
+            }
+            as_of, truncated = self.as_of, self.truncated
+
+        mask = np.ones(n, dtype=bool)
+        for name, code in filter_codes.items():
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= columns[name] == code
+        if from_date is not None:
+            mask &= columns["initiated"] >= np.datetime64(from_date, "s")
+        if to_date is not None:
+            mask &= columns["initiated"] <= np.datetime64(to_date, "s")
+        rows = np.flatnonzero(mask)
+
+        group_codes = [columns[name][rows] for name in group_by]
+        # Sized after copying the codes: a value is added to its dictionary before its code
+        # is written, so every copied code is in range.
+        sizes = [len(dictionaries[name].values) for name in group_by]
+        if group_by and len(rows):
+            group_ids = np.ravel_multi_index(group_codes, sizes)
+            groups, inverse = np.unique(group_ids, return_inverse=True)
+        else:
+            groups = np.zeros(1 if len(rows) else 0, dtype=np.int64)
+            inverse = np.zeros(len(rows), dtype=np.int64)
+        count = len(groups)
+
+        result = {"count": np.bincount(inverse, minlength=count)}
+        for name in MEASURES:
+            values = columns[name][rows]
+            present = ~np.isnan(values)
+            sums = np.bincount(inverse, weights=np.where(present, values, 0.0), minlength=count)
+            result[name] = sums
+            result[f"{name}_lines"] = np.bincount(inverse[present], minlength=count)
+
+        values = columns[measure][rows]
+        present = ~np.isnan(values)
+        quantiles = _group_percentiles(inverse[present], values[present], count, percentiles)
+        labels = []
+        if group_by and count:
+            for name, size, codes in zip(group_by, sizes, np.unravel_index(groups, sizes)):
+                labels.append(np.asarray(dictionaries[name].values[:size], dtype=object)[codes])
+
+        order = np.argsort(-result[sort], kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        output = []
+        for g in order:
+            group = {
+                "group": {name: str(label[g]) for name, label in zip(group_by, labels)},
+                "count": int(result["count"][g]),
+                "percentiles": {_percentile_label(p): _number(q[g]) for p, q in quantiles.items()},
+            }
+            for name in MEASURES:
+                group[name] = float(result[name][g])
+                group[f"{name}_lines"] = int(result[f"{name}_lines"][g])
+            output.append(group)
+        return {
+            "as_of": as_of,
+            "truncated": truncated,
+            "lines": int(len(rows)),
+            "measure": measure,
+            "groups": output,
+        }
+
+
+def _group_percentiles(inverse: np.ndarray, values: np.ndarray, count: int, percentiles) -> dict:
+    """Linear-interpolated percentiles of values per group id, NaN for empty groups."""
+    if not percentiles:
+        return {}
+    order = np.lexsort((values, inverse))
+    values = values[order]
+    sizes = np.bincount(inverse, minlength=count)
+    starts = np.cumsum(sizes) - sizes
+    results = {}
+    for p in percentiles:
+        position = starts + (p / 100.0) * np.maximum(sizes - 1, 0)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        if len(values):
+            low, high = np.minimum(low, len(values) - 1), np.minimum(high, len(values) - 1)
+            interpolated = values[low] + (values[high] - values[low]) * (position - low)
+        else:
+            interpolated = np.full(count, np.nan)
+        results[p] = np.where(sizes > 0, interpolated, np.nan)
+    return results
+
+
+def _percentile_label(p: float) -> str:
+    return f"p{p:g}"
+
+
+def _number(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+snapshot = LineSnapshot()
+
+
+def _split(value: Optional[str]) -> list[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def query_wos_line_analytics(
+    group_by: Optional[str],
+    filters: dict,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    measure: str = "vetted_qty",
+    percentiles: Optional[str] = None,
+    sort: str = "count",
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    Validate an analytics query and run it on the snapshot. group_by and percentiles are
+    comma-separated; None filter values are ignored. Raises NotFoundError when analytics
+    are disabled, BadRequestError for an invalid query and ServiceUnavailableError while
+    the first load is running.
+    """
+    if not ANALYTICS_ENABLED:
+        raise NotFoundError("WOSLine analytics are not enabled")
+    dimensions = _split(group_by)
+    filters = {name: value for name, value in filters.items() if value is not None}
+    unknown = [name for name in dimensions + list(filters) if name not in DIMENSIONS]
+    if unknown:
+        raise BadRequestError(f"Unknown dimension(s): {', '.join(unknown)}")
+    if len(set(dimensions)) != len(dimensions):
+        raise BadRequestError("Duplicate group_by dimension")
+    if measure not in MEASURES:
+        raise BadRequestError(f"measure must be one of: {', '.join(MEASURES)}")
+    if sort != "count" and sort not in MEASURES:
+        raise BadRequestError(f"sort must be count or one of: {', '.join(MEASURES)}")
+    try:
+        points = [float(p) for p in _split(percentiles)]
+    except ValueError:
+        raise BadRequestError("percentiles must be numbers")
+    if any(not 0 <= p <= 100 for p in points):
+        raise BadRequestError("percentiles must be between 0 and 100")
+    return snapshot.aggregate(
+        tuple(dimensions), filters, database.naive_local(from_date), database.naive_local(to_date),
+        measure, tuple(points), sort, limit,
+    )
+
+
+def get_analytics_status() -> dict:
+    """Return the snapshot's size, memory use and age. Raises NotFoundError if disabled."""
+    if not ANALYTICS_ENABLED:
+        raise NotFoundError("WOSLine analytics are not enabled")
+    return snapshot.status()
+
+
+def refresh_once() -> bool:
+    """Refresh the snapshot. Returns False if skipped or failed; failures are logged."""
+    if database.main_breaker.state == circuit_breaker.OPEN:
+        metrics.inc("analytics_refresh_total", result="skipped")
+        return False
+    db = database.get_session_local()()
+    local_db = database.get_local_session_local()()
+    try:
+        snapshot.refresh(db, local_db)
+    except (DatabaseError, ServiceUnavailableError) as e:
+        print(f"WOSLine analytics refresh error: {getattr(e, 'message', None) or e}")
+        metrics.inc("analytics_refresh_total", result="error")
+        return False
+    finally:
+        db.close()
+        local_db.close()
+    metrics.inc("analytics_refresh_total", result="ok")
+    return True
+
+
+class AnalyticsRefresher:
+    """Background thread loading and refreshing the analytics snapshot."""
+
+    def __init__(self, interval: float = ANALYTICS_REFRESH_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="wosline-analytics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            refresh_once()
+            self._stop.wait(self.interval)
+
+
+worker = AnalyticsRefresher()
+
+
+@vetting_events.subscribe
+def _apply_vetting(wos_serial: int, changes: list[dict]) -> None:
+    if snapshot.ready:
+        snapshot.set_vetted_qty(changes)
@@ -0,0 +1,74 @@
+"""Async read services backing the /async endpoints."""
+
+from datetime import datetime
+from typing import Optional
+
+import database
+import schemas
+from cache import cached_async, CODETABLE_CACHE_TTL
+from exceptions import NotFoundError
+from repositories import (
+    get_wos_masters_with_description_async,
+    get_wos_master_by_serial_async as repo_get_wos_master_async,
+    get_wos_lines_async as repo_get_wos_lines_async,
+    get_wos_line_async as repo_get_wos_line_async,
+    get_codetable_by_column_name_async,
+    get_correspondence_by_wos_serial_async,
+)
+from services.wos_service import master_to_dict
+
+
+async def get_wos_masters_async(
+    db,
+    customer_code: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> list:
+    """Return WOSMaster list with WOSTypeDescription."""
+    results = await get_wos_masters_with_description_async(
+        db, customer_code=customer_code,
+        from_date=database.naive_local(from_date), to_date=database.naive_local(to_date),
+    )
+    return [master_to_dict(master, desc) for master, desc in results]
+
+
+async def get_wos_master_by_serial_async(db, serial_no: int) -> dict:
+    """Return single WOSMaster by serial or raise NotFoundError."""
+    result = await repo_get_wos_master_async(db, serial_no)
+    if not result:
+        raise NotFoundError("WOSMaster not found")
+    master, description = result
+    return master_to_dict(master, description)
+
+
+async def get_wos_lines_async(db, wos_serial: Optional[int] = None) -> list:
+    """Return WOSLine list, optionally filtered by WOSSerial."""
+    return await repo_get_wos_lines_async(db, wos_serial=wos_serial)
+
+
+async def get_wos_line_async(db, wos_serial: int, line_serial: int):
+    """Return single WOSLine or raise NotFoundError."""
+    line = await repo_get_wos_line_async(db, wos_serial, line_serial)
+    if not line:
+        raise NotFoundError("WOSLine not found")
+    return line
+
+
+async def get_codetable_data_async(db, column_name: str) -> list:
+    """Return CodeTable rows for given ColumnName, sharing the sync path's cache entries."""
+
+    async def load():
+        rows = await get_codetable_by_column_name_async(db, column_name)
+        return [schemas.CodeTable.model_validate(row).model_dump() for row in rows]
+
+    return await cached_async(f"codetable:{column_name}", load, ttl=CODETABLE_CACHE_TTL)
+
+
+async def get_correspondence_async(db, wos_serial: int) -> list:
+    """Return correspondence list for WOSSerial with CorrespondenceTypeDescription."""
+    output = []
+    for correspondence, description in await get_correspondence_by_wos_serial_async(db, wos_serial):
+        c_dict = {c.name: getattr(correspondence, c.name) for c in correspondence.__table__.columns}
+        c_dict["CorrespondenceTypeDescription"] = description
+        output.append(c_dict)
+    return output
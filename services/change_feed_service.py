@@ -0,0 +1,123 @@
+"""Incremental change feeds for WOSMaster and WOSLine."""
+
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.orm import Session
+
+import database
+import vetting_events
+from repositories import (
+    get_wos_masters_changed_since,
+    get_wos_lines_changed_since,
+    get_wos_lines_by_keys,
+    record_line_changes,
+    get_line_changes_since,
+    get_line_change_seq_bounds,
+    purge_line_changes_before,
+)
+from exceptions import BadRequestError, ChangeTokenExpiredError
+from .wos_service import master_to_dict
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", 30))
+
+# Keys per query when re-reading lines named in the change log.
+_KEY_BATCH_SIZE = 500
+
+
+def encode_token(watermark: Optional[datetime], seq: int) -> str:
+    """Encode a feed position: a Sybase timestamp watermark and a change log sequence number."""
+    payload = {"t": watermark.isoformat() if watermark else None, "s": seq}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_token(token: Optional[str]) -> tuple[Optional[datetime], int]:
+    """Decode a feed token; None means the start of the feed. Raises BadRequestError if malformed."""
+    if not token:
+        return None, 0
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        watermark = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        return watermark, int(payload["s"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise BadRequestError("Invalid change token")
+
+
+def _max_time(current: Optional[datetime], *candidates: Optional[datetime]) -> Optional[datetime]:
+    values = [v for v in (current, *candidates) if v is not None]
+    return max(values) if values else None
+
+
+def get_wos_master_changes(db: Session, since: Optional[str]) -> dict:
+    """
+    Return WOSMaster rows initiated, concurred, approved or closed since the token, and the
+    next token. Rows at the watermark itself are returned again, so clients should upsert.
+    """
+    watermark, seq = decode_token(since)
+    results = get_wos_masters_changed_since(db, watermark)
+    next_watermark = watermark
+    for master, _ in results:
+        next_watermark = _max_time(
+            next_watermark,
+            master.DateTimeInitiated, master.DateTimeConcurred,
+            master.DateTimeApproved, master.DateTimeClosed,
+        )
+    return {
+        "changes": [master_to_dict(master, desc) for master, desc in results],
+        "next": encode_token(next_watermark, seq),
+    }
+
+
+def get_wos_line_changes(db: Session, local_db: Session, since: Optional[str]) -> dict:
+    """
+    Return WOSLine rows changed since the token: lines vetted through this API (from the
+    change log), lines closed, and lines of newly initiated WOS. Raises
+    ChangeTokenExpiredError if the log no longer covers the token's position.
+    """
+    watermark, seq = decode_token(since)
+    min_seq, max_seq = get_line_change_seq_bounds(local_db)
+    if since and min_seq is not None and seq < min_seq - 1:
+        raise ChangeTokenExpiredError()
+
+    # Read the log before Sybase so nothing committed in between is skipped.
+    logged = get_line_changes_since(local_db, seq) if since else []
+    next_seq = logged[-1].seq if logged else max(seq, max_seq or 0)
+
+    lines = {}
+    next_watermark = watermark
+    for line, initiated in get_wos_lines_changed_since(db, watermark):
+        lines[(line.WOSSerial, line.WOSLineSerial)] = line
+        next_watermark = _max_time(next_watermark, initiated, line.DateTimeClosed)
+
+    keys = sorted({(c.WOSSerial, c.WOSLineSerial) for c in logged} - lines.keys())
+    for start in range(0, len(keys), _KEY_BATCH_SIZE):
+        for line in get_wos_lines_by_keys(db, keys[start:start + _KEY_BATCH_SIZE]):
+            lines[(line.WOSSerial, line.WOSLineSerial)] = line
+
+    return {
+        "changes": [lines[key] for key in sorted(lines)],
+        "next": encode_token(next_watermark, next_seq),
+    }
+
+
+def purge_change_log() -> int:
+    """Drop change log entries older than CHANGE_LOG_RETENTION_DAYS. Returns rows deleted."""
+    local_db = database.get_local_session_local()()
+    try:
+        cutoff = datetime.now() - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+        return purge_line_changes_before(local_db, cutoff)
+    finally:
+        local_db.close()
+
+
+@vetting_events.subscribe
+def _log_vetting_changes(wos_serial: int, changes: list[dict]) -> None:
+    local_db = database.get_local_session_local()()
+    try:
+        record_line_changes(local_db, changes, datetime.now())
+    finally:
+        local_db.close()
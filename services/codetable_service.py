@@ -2,9 +2,18 @@
 
 from sqlalchemy.orm import Session
 
+import schemas
+from cache import cached, CODETABLE_CACHE_TTL
 from repositories import get_codetable_by_column_name
 
 
 def get_codetable_data(db: Session, column_name: str) -> list:
-    """Return CodeTable rows for given ColumnName."""
-    return get_codetable_by_column_name(db, column_name)
+    """Return CodeTable rows for given ColumnName. Cached per ColumnName for CODETABLE_CACHE_TTL seconds."""
+    return cached(
+        f"codetable:{column_name}",
+        lambda: [
+            schemas.CodeTable.model_validate(row).model_dump()
+            for row in get_codetable_by_column_name(db, column_name)
+        ],
+        ttl=CODETABLE_CACHE_TTL,
+    )
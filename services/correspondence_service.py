@@ -2,12 +2,17 @@
 
 from sqlalchemy.orm import Session
 
+from partitions import scatter_gather
 from repositories import get_correspondence_by_wos_serial
 
 
 def get_correspondence(db: Session, wos_serial: int) -> list:
     """Return correspondence list for WOSSerial with CorrespondenceTypeDescription."""
-    results = get_correspondence_by_wos_serial(db, wos_serial)
+    results = scatter_gather(
+        db,
+        lambda session, stations: get_correspondence_by_wos_serial(session, wos_serial, stations),
+        key=lambda row: row[0].LineNo,
+    )
     output = []
     for correspondence, description in results:
         c_dict = {
@@ -0,0 +1,194 @@
+"""
+Parallel range-partitioned WOSLine export, streamed as NDJSON.
+
+The WOSSerial key space of the selected lines is split into contiguous ranges, and each
+range is read on its own pooled connection by a worker from a shared, bounded pool. Each
+range feeds a small queue of row batches, so a slow client holds back the readers instead
+of buffering the whole export in memory.
+
+- ordered: ranges are emitted one after another. Ranges are disjoint and ascending, so
+  the output is in (WOSSerial, WOSLineSerial) order while later ranges prefetch.
+- unordered: batches are emitted as soon as any range produces them.
+
+A client that stops reading without disconnecting would hold the readers, their connections
+and their cursors indefinitely. A reader blocked on a full queue for EXPORT_STALL_SECONDS
+while the client has taken nothing from any range for EXPORT_STALL_SECONDS cancels the whole
+export instead, and the stream ends truncated if the client ever resumes.
+"""
+
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+import database
+import metrics
+import read_routing
+import schemas
+from repositories import get_wos_line_serial_bounds, iter_wos_lines_in_range
+
+EXPORT_PARTITIONS = int(os.getenv("EXPORT_PARTITIONS", 4))
+# Connections used by all running exports together.
+EXPORT_MAX_WORKERS = int(os.getenv("EXPORT_MAX_WORKERS", 8))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Batches a range may read ahead of the client.
+EXPORT_QUEUE_BATCHES = int(os.getenv("EXPORT_QUEUE_BATCHES", 4))
+# Seconds a reader waits for the client to take a batch before the export is abandoned.
+EXPORT_STALL_SECONDS = float(os.getenv("EXPORT_STALL_SECONDS", 60))
+
+_executor = ThreadPoolExecutor(max_workers=EXPORT_MAX_WORKERS, thread_name_prefix="export")
+
+metrics.describe("export_rows_total", "WOSLine rows streamed by exports.")
+metrics.describe("export_seconds", "Wall time of completed WOSLine exports.")
+
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _Progress:
+    """Cancellation flag shared by an export's readers, and when its client last took a batch."""
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.last_read = time.monotonic()
+
+    def stalled(self) -> bool:
+        return time.monotonic() - self.last_read >= EXPORT_STALL_SECONDS
+
+
+def split_key_range(first: int, last: int, partitions: int) -> list[tuple[int, int]]:
+    """Split [first, last] into at most `partitions` contiguous, ascending, inclusive ranges."""
+    partitions = max(1, min(partitions, last - first + 1))
+    size, extra = divmod(last - first + 1, partitions)
+    ranges, start = [], first
+    for i in range(partitions):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _encode(lines: list) -> bytes:
+    return b"".join(
+        schemas.WOSLine.model_validate(line).model_dump_json().encode() + b"\n" for line in lines
+    )
+
+
+def _put(q: queue.Queue, item, progress: _Progress) -> None:
+    while True:
+        if progress.stop.is_set():
+            raise _Cancelled()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            if progress.stalled():
+                # The client stopped reading: release every range of this export.
+                progress.stop.set()
+                raise _Cancelled()
+
+
+def _get(q: queue.Queue, progress: _Progress):
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            if progress.stop.is_set():
+                raise TimeoutError(
+                    f"Export abandoned: the client read nothing for {EXPORT_STALL_SECONDS:g}s"
+                ) from None
+            continue
+        progress.last_read = time.monotonic()
+        return item
+
+
+def _read_range(session_factory, key_range, from_date, to_date, out: queue.Queue, progress: _Progress):
+    if progress.stop.is_set():
+        return
+    db = session_factory()
+    try:
+        for lines in iter_wos_lines_in_range(
+            db, key_range[0], key_range[1], from_date, to_date, batch_size=EXPORT_BATCH_SIZE
+        ):
+            _put(out, (len(lines), _encode(lines)), progress)
+        _put(out, _DONE, progress)
+    except _Cancelled:
+        pass
+    except Exception as e:
+        try:
+            _put(out, e, progress)
+        except _Cancelled:
+            pass
+    finally:
+        db.close()
+
+
+def _drain(q: queue.Queue, progress: _Progress):
+    """Yield the batches of one queue until its range is done; re-raise a reader's error."""
+    while True:
+        item = _get(q, progress)
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def export_wos_lines(
+    db,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    partitions: int = EXPORT_PARTITIONS,
+    ordered: bool = True,
+):
+    """
+    Plan an export of the WOSLines whose WOS was initiated in the date range and return a
+    generator of NDJSON chunks. The key bounds are read with `db`; the ranges themselves
+    are read on separate sessions. Raises DatabaseError if the plan query fails.
+    """
+    from_date, to_date = database.naive_local(from_date), database.naive_local(to_date)
+    first, last = get_wos_line_serial_bounds(db, from_date, to_date)
+    ranges = [] if first is None else split_key_range(first, last, partitions)
+    return _stream(ranges, from_date, to_date, ordered)
+
+
+def _stream(ranges, from_date, to_date, ordered):
+    started = time.perf_counter()
+    session_factory = read_routing.report_session_local()
+    progress = _Progress()
+    shared = queue.Queue(maxsize=EXPORT_QUEUE_BATCHES * max(1, len(ranges)))
+    queues = [queue.Queue(maxsize=EXPORT_QUEUE_BATCHES) if ordered else shared for _ in ranges]
+    for key_range, q in zip(ranges, queues):
+        ctx = contextvars.copy_context()
+        _executor.submit(ctx.run, _read_range, session_factory, key_range, from_date, to_date, q, progress)
+
+    rows = 0
+    try:
+        if ordered:
+            for q in queues:
+                for count, chunk in _drain(q, progress):
+                    rows += count
+                    yield chunk
+        else:
+            remaining = len(ranges)
+            while remaining:
+                item = _get(shared, progress)
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                rows += item[0]
+                yield item[1]
+        metrics.observe("export_seconds", time.perf_counter() - started)
+    finally:
+        # Client gone or a range failed: release the readers still holding connections.
+        progress.stop.set()
+        metrics.inc("export_rows_total", rows)
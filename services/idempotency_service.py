@@ -0,0 +1,110 @@
+"""Idempotency-Key handling for vetting writes."""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy.orm import Session
+
+import database
+import deadlines
+from repositories import (
+    claim_idempotency_key,
+    get_idempotency_key,
+    complete_idempotency_key,
+    delete_idempotency_key,
+    purge_expired_idempotency_keys,
+)
+from exceptions import (
+    BadRequestError,
+    DatabaseError,
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyMismatchError,
+)
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+# An original request still unfinished after this long is assumed dead; its key is reused.
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT = int(os.getenv("IDEMPOTENCY_IN_FLIGHT_TIMEOUT", 600))
+# How often a duplicate checks whether the original request has stored its response.
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", 0.1))
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(method: str, path: str, payload) -> str:
+    """Hash a request's method, path and JSON payload to detect key reuse with another request."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{method} {path}\n{body}".encode()).hexdigest()
+
+
+def scoped_key(caller: str, key: str) -> str:
+    """Return the stored form of a caller's Idempotency-Key, so callers cannot collide."""
+    return hashlib.sha256(f"{caller}\n{key}".encode()).hexdigest()
+
+
+def run_idempotent(
+    local_db: Session, caller: str, key: str, fingerprint: str, fn: Callable[[], tuple[int, object]]
+) -> tuple[int, object, bool]:
+    """
+    Run fn() at most once per caller and key. fn returns (status_code, JSON-ready body).
+    Returns (status_code, body, replayed). A duplicate of a request still running waits for
+    its response, for at most the request deadline (else IDEMPOTENCY_IN_FLIGHT_TIMEOUT, after
+    which the original is presumed dead and the key is taken over).
+    Raises BadRequestError, IdempotencyKeyMismatchError, or IdempotencyKeyInProgressError
+    when the deadline passes first.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise BadRequestError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+    key = scoped_key(caller, key)
+    deadline = deadlines.current()
+    while True:
+        now = datetime.now()
+        if claim_idempotency_key(local_db, key, fingerprint, now + timedelta(seconds=IDEMPOTENCY_IN_FLIGHT_TIMEOUT)):
+            break
+        record = get_idempotency_key(local_db, key)
+        if record is None:
+            continue
+        if record.expires_at < now:
+            delete_idempotency_key(local_db, key)
+            continue
+        if record.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatchError()
+        if record.response is not None:
+            return record.status_code, json.loads(zlib.decompress(record.response)), True
+        wait = IDEMPOTENCY_POLL_SECONDS
+        if deadline is not None:
+            if deadline.remaining() <= 0:
+                raise IdempotencyKeyInProgressError()
+            wait = min(wait, deadline.remaining())
+        time.sleep(wait)
+
+    try:
+        status_code, body = fn()
+    except BaseException:
+        # Nothing was stored, so a retry with the same key runs the request again.
+        try:
+            delete_idempotency_key(local_db, key)
+        except DatabaseError:
+            pass
+        raise
+    response = zlib.compress(json.dumps(body, separators=(",", ":")).encode())
+    expires_at = datetime.now() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    try:
+        complete_idempotency_key(local_db, key, status_code, response, expires_at)
+    except DatabaseError as e:
+        # The write is already committed in Sybase: the caller must still get its result.
+        # The key stays in flight, so duplicates wait and retry rather than write again.
+        print(f"Failed to store idempotent response: {e.message}")
+    return status_code, body, False
+
+
+def purge_idempotency_keys() -> int:
+    """Drop expired idempotency records. Returns rows deleted."""
+    local_db = database.get_local_session_local()()
+    try:
+        return purge_expired_idempotency_keys(local_db, datetime.now())
+    finally:
+        local_db.close()
@@ -0,0 +1,384 @@
+"""
+In-memory search index over WOSLine ItemCode and ItemDesc.
+
+ItemCodes (upper-cased) are held in a prefix trie whose nodes count the lines below them,
+so a code prefix lookup walks len(query) nodes and pages through matches in code order
+without visiting the rest, for field=all as well as field=code. ItemDesc is split into lower-case alphanumeric tokens with an
+inverted index token -> line keys, plus a trigram index over the token vocabulary so that
+partial words ("wash" in "washer", "sher" in "washer") resolve to whole tokens first and
+only their posting sets are intersected.
+
+After the first full load, a background thread re-reads every ITEM_SEARCH_REFRESH_SECONDS
+the lines of newly initiated WOS and closed lines, and rebuilds the whole index every
+ITEM_SEARCH_REBUILD_SECONDS to pick up item edits made to older lines. Vetting does not
+touch item fields, so vetting writes do not update the index. Memory is bounded by
+ITEM_SEARCH_MAX_LINES; lines beyond it are not indexed and results report `truncated`.
+"""
+
+import heapq
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+import circuit_breaker
+import database
+import metrics
+from repositories import iter_wos_line_items
+from exceptions import BadRequestError, DatabaseError, NotFoundError, ServiceUnavailableError
+
+ITEM_SEARCH_ENABLED = os.getenv("ITEM_SEARCH_ENABLED", "false").lower() in ("1", "true", "yes")
+ITEM_SEARCH_REFRESH_SECONDS = float(os.getenv("ITEM_SEARCH_REFRESH_SECONDS", 60))
+ITEM_SEARCH_REBUILD_SECONDS = float(os.getenv("ITEM_SEARCH_REBUILD_SECONDS", 86400))
+ITEM_SEARCH_MAX_LINES = int(os.getenv("ITEM_SEARCH_MAX_LINES", 5_000_000))
+ITEM_SEARCH_BATCH_SIZE = int(os.getenv("ITEM_SEARCH_BATCH_SIZE", 10000))
+
+FIELDS = ("all", "code", "desc")
+
+# Scores: an exact ItemCode beats a code prefix, which beats any single description token.
+_CODE_EXACT, _CODE_PREFIX = 10, 5
+_TOKEN_EXACT, _TOKEN_PREFIX, _TOKEN_SUBSTRING = 3, 2, 1
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+metrics.describe("item_search_refresh_total", "WOSLine item search index refreshes by result.")
+
+
+def _tokens(text: Optional[str]) -> set[str]:
+    return set(_TOKEN.findall((text or "").lower()))
+
+
+def _grams(token: str) -> set[str]:
+    """Trigrams of ^token$, so two-character prefixes are indexed too."""
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Node:
+    __slots__ = ("children", "keys", "count")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = None  # line keys whose ItemCode ends here
+        self.count = 0  # lines at or below this node
+
+
+class ItemIndex:
+    """ItemCode trie and ItemDesc inverted index over WOSLine, keyed by (WOSSerial, WOSLineSerial)."""
+
+    def __init__(self, max_lines: int = ITEM_SEARCH_MAX_LINES):
+        self.max_lines = max_lines
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.truncated = False
+        self.as_of = None
+        self.built_at = None
+        self._watermark = None
+        self._lines = {}  # key -> (ItemCode, ItemDesc)
+        self._root = _Node()
+        self._postings = {}  # token -> set of keys
+        self._vocabulary = {}  # trigram -> set of tokens
+
+    @property
+    def ready(self) -> bool:
+        return self.as_of is not None
+
+    @property
+    def size(self) -> int:
+        return len(self._lines)
+
+    def _add(self, key: int, code: str, desc: str) -> None:
+        self._lines[key] = (code, desc)
+        node = self._root
+        node.count += 1
+        for char in code:
+            node = node.children.setdefault(char, _Node())
+            node.count += 1
+        if node.keys is None:
+            node.keys = set()
+        node.keys.add(key)
+        for token in _tokens(desc):
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                for gram in _grams(token):
+                    self._vocabulary.setdefault(gram, set()).add(token)
+            posting.add(key)
+
+    def _remove(self, key: int) -> None:
+        code, desc = self._lines.pop(key)
+        path = [self._root]
+        for char in code:
+            path.append(path[-1].children[char])
+        path[-1].keys.discard(key)
+        for node in path:
+            node.count -= 1
+        for parent, char, node in zip(path, code, path[1:]):
+            if not node.count:
+                del parent.children[char]
+                break
+        for token in _tokens(desc):
+            posting = self._postings[token]
+            posting.discard(key)
+            if not posting:
+                del self._postings[token]
+                for gram in _grams(token):
+                    tokens = self._vocabulary[gram]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._vocabulary[gram]
+
+    def _apply(self, rows: list) -> None:
+        """Upsert a batch of iter_wos_line_items rows. Caller holds the lock or owns the index."""
+        for wos_serial, line_serial, code, desc, initiated, closed in rows:
+            key = wos_serial << 32 | line_serial
+            code = sys.intern((code or "").strip().upper())
+            desc = sys.intern(desc or "")
+            current = self._lines.get(key)
+            if current == (code, desc):
+                pass
+            elif current is not None:
+                self._remove(key)
+                self._add(key, code, desc)
+            elif len(self._lines) < self.max_lines:
+                self._add(key, code, desc)
+            else:
+                self.truncated = True
+            for moment in (initiated, closed):
+                if moment is not None and (self._watermark is None or moment > self._watermark):
+                    self._watermark = moment
+
+    def refresh(self, db: Session, rebuild_seconds: float = ITEM_SEARCH_REBUILD_SECONDS) -> int:
+        """
+        Index every line on the first call and every rebuild_seconds, otherwise only lines of
+        new WOS and closed lines. Returns the number of rows read.
+        Raises DatabaseError or ServiceUnavailableError.
+        """
+        started = datetime.now()
+        with self._lock:
+            full = not self.ready or (started - self.built_at).total_seconds() >= rebuild_seconds
+            since = self._watermark
+        rows = 0
+        if full:
+            # Build a fresh index, then swap it in; searches keep using the old one meanwhile.
+            fresh = ItemIndex(self.max_lines)
+            for batch in iter_wos_line_items(db, batch_size=ITEM_SEARCH_BATCH_SIZE):
+                fresh._apply(batch)
+                rows += len(batch)
+            fresh.as_of = fresh.built_at = started
+            with self._lock:
+                for name, value in vars(fresh).items():
+                    if name != "_lock":
+                        setattr(self, name, value)
+            return rows
+
+        for batch in iter_wos_line_items(db, since=since, batch_size=ITEM_SEARCH_BATCH_SIZE):
+            with self._lock:
+                self._apply(batch)
+            rows += len(batch)
+        with self._lock:
+            self.as_of = started
+        return rows
+
+    def _code_matches(self, prefix: str):
+        """Yield (ItemCode, keys) under a code prefix: the exact code first, then in code order."""
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return
+        stack = [(prefix, node)]
+        while stack:
+            code, node = stack.pop()
+            if node.keys:
+                yield code, node.keys
+            for char in sorted(node.children, reverse=True):
+                stack.append((code + char, node.children[char]))
+
+    def _code_count(self, prefix: str) -> int:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return 0
+        return node.count
+
+    def _expand(self, term: str) -> dict:
+        """Return {vocabulary token: score} for the tokens a query term matches."""
+        matches = {}
+        if len(term) >= 2:
+            # A two-character term can only be matched as a prefix, through its ^xx trigram.
+            grams = [term[i:i + 3] for i in range(len(term) - 2)] if len(term) >= 3 else [f"^{term}"]
+            candidates = sorted((self._vocabulary.get(gram, set()) for gram in grams), key=len)
+            tokens = set.intersection(*candidates) if candidates[0] else set()
+            for token in tokens:
+                if token.startswith(term):
+                    matches[token] = _TOKEN_PREFIX
+                elif term in token:
+                    matches[token] = _TOKEN_SUBSTRING
+        if term in self._postings:
+            matches[term] = _TOKEN_EXACT
+        return matches
+
+    def _desc_scores(self, terms: set[str]) -> dict:
+        """Return {key: score} for lines whose ItemDesc matches every term."""
+        expanded = [self._expand(term) for term in terms]
+        if not all(expanded):
+            return {}
+        # Most selective term first, so later terms only intersect with its candidates.
+        expanded.sort(key=lambda matches: sum(len(self._postings[t]) for t in matches))
+        scores = None
+        for matches in expanded:
+            candidates = None if scores is None else scores.keys()
+            term_scores = {}
+            # Lower scores first, so a line holding several matching tokens keeps the best.
+            for token, score in sorted(matches.items(), key=lambda item: item[1]):
+                posting = self._postings[token]
+                for key in (posting if candidates is None else posting & candidates):
+                    term_scores[key] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: scores[key] + score for key, score in term_scores.items()}
+            if not scores:
+                break
+        return scores
+
+    def _hit(self, key: int, score: int) -> dict:
+        code, desc = self._lines[key]
+        return {
+            "WOSSerial": key >> 32,
+            "WOSLineSerial": key & 0xFFFFFFFF,
+            "ItemCode": code,
+            "ItemDesc": desc,
+            "score": score,
+        }
+
+    def search(self, query: str, field: str = "all", offset: int = 0, limit: int = 20) -> dict:
+        """
+        Return a page of lines matching `query`, best first. field="code" matches ItemCode
+        prefixes, "desc" requires every query term in ItemDesc (whole tokens, prefixes or,
+        for terms of three or more characters, substrings) and "all" returns either, scoring
+        lines that match both higher. Raises ServiceUnavailableError before the first load.
+        """
+        code = query.strip().upper()
+        terms = _tokens(query)
+        with self._lock:
+            if not self.ready:
+                raise ServiceUnavailableError("Item search index is loading", retry_after=5)
+            result = {"as_of": self.as_of, "truncated": self.truncated, "offset": offset, "limit": limit}
+
+            if field == "code":
+                # Trie order is already rank order, so only the requested page is visited.
+                hits, skip = [], offset
+                for match, keys in self._code_matches(code):
+                    if skip >= len(keys):
+                        skip -= len(keys)
+                        continue
+                    score = _CODE_EXACT if match == code else _CODE_PREFIX
+                    for key in sorted(keys)[skip:skip + limit - len(hits)]:
+                        hits.append(self._hit(key, score))
+                    skip = 0
+                    if len(hits) == limit:
+                        break
+                result.update(total=self._code_count(code), results=hits)
+                return result
+
+            lines = self._lines
+            scores = self._desc_scores(terms) if terms else {}
+            total = len(scores)
+            if field == "all" and code:
+                both = 0
+                for key in scores:
+                    if lines[key][0].startswith(code):
+                        scores[key] += _CODE_EXACT if lines[key][0] == code else _CODE_PREFIX
+                        both += 1
+                total += self._code_count(code) - both
+                # Lines matching only the code rank in trie order, so the page can only hold
+                # the first offset + limit of them: stop there instead of walking the subtree.
+                wanted = offset + limit
+                code_only = {}
+                for match, keys in self._code_matches(code):
+                    score = _CODE_EXACT if match == code else _CODE_PREFIX
+                    for key in sorted(keys):
+                        if len(code_only) >= wanted:
+                            break
+                        if key not in scores:
+                            code_only[key] = score
+                    if len(code_only) >= wanted:
+                        break
+                scores.update(code_only)
+            page = heapq.nsmallest(
+                offset + limit, scores.items(), key=lambda item: (-item[1], lines[item[0]][0], item[0])
+            )[offset:]
+            result.update(total=total, results=[self._hit(key, score) for key, score in page])
+            return result
+
+index = ItemIndex()
+
+
+def search_wos_line_items(query: Optional[str], field: str = "all", offset: int = 0, limit: int = 20) -> dict:
+    """
+    Validate an item search and run it on the index. Raises NotFoundError when search is
+    disabled, BadRequestError for an invalid query and ServiceUnavailableError while the
+    first load is running.
+    """
+    if not ITEM_SEARCH_ENABLED:
+        raise NotFoundError("WOSLine item search is not enabled")
+    if field not in FIELDS:
+        raise BadRequestError(f"field must be one of: {', '.join(FIELDS)}")
+    if not query or not query.strip():
+        raise BadRequestError("q must not be empty")
+    if field == "desc" and not _tokens(query):
+        raise BadRequestError("q has no letters or digits to search ItemDesc for")
+    return index.search(query, field, offset, limit)
+
+
+def refresh_once() -> bool:
+    """Refresh the index. Returns False if skipped or failed; failures are logged."""
+    if database.main_breaker.state == circuit_breaker.OPEN:
+        metrics.inc("item_search_refresh_total", result="skipped")
+        return False
+    db = database.get_session_local()()
+    try:
+        index.refresh(db)
+    except (DatabaseError, ServiceUnavailableError) as e:
+        print(f"WOSLine item search refresh error: {getattr(e, 'message', None) or e}")
+        metrics.inc("item_search_refresh_total", result="error")
+        return False
+    finally:
+        db.close()
+    metrics.inc("item_search_refresh_total", result="ok")
+    return True
+
+
+class ItemSearchRefresher:
+    """Background thread loading and refreshing the item search index."""
+
+    def __init__(self, interval: float = ITEM_SEARCH_REFRESH_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="wosline-item-search", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            refresh_once()
+            self._stop.wait(self.interval)
+
+
+worker = ItemSearchRefresher()
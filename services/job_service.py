@@ -0,0 +1,162 @@
+"""Asynchronous bulk vetting jobs: submission, status, and the chunked worker."""
+
+import os
+import socket
+import threading
+import uuid
+from typing import List
+from sqlalchemy.orm import Session
+
+import database
+from repositories import (
+    create_vetting_job,
+    get_vetting_job,
+    get_vetting_job_failures,
+    claim_next_vetting_job,
+    get_pending_job_lines,
+    record_job_line_results,
+    finish_vetting_job,
+    requeue_vetting_job,
+    renew_vetting_job_lease,
+)
+from exceptions import DatabaseError, NotFoundError, ServiceUnavailableError
+from models import VettedQtyValidationError
+from .wos_service import apply_keyed_vetted_qty
+
+# Lines per Sybase transaction. Small chunks keep page locks short on allpages-locked tables.
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", 200))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 2))
+# A running job whose lease is not renewed for this long is taken over by another worker.
+# The lease is renewed before every chunk, so it must exceed the slowest chunk.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 300))
+
+# Identifies this process's leases; unique across restarts that reuse a PID.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def submit_vetting_job(local_db: Session, lines: List[dict]) -> dict:
+    """
+    Queue a vetting batch. lines: [{"WOSSerial", "WOSLineSerial", "VettedQty"}, ...].
+    Returns the job status dict.
+    """
+    job = create_vetting_job(local_db, uuid.uuid4().hex, lines)
+    return _job_to_dict(job, [])
+
+
+def get_vetting_job_status(local_db: Session, job_id: str) -> dict:
+    """Return progress and per-line errors for a job. Raises NotFoundError."""
+    job = get_vetting_job(local_db, job_id)
+    if not job:
+        raise NotFoundError("Job not found")
+    return _job_to_dict(job, get_vetting_job_failures(local_db, job_id))
+
+
+def _job_to_dict(job, failures) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "total_lines": job.total_lines,
+        "processed_lines": job.processed_lines,
+        "failed_lines": job.failed_lines,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+        "errors": [
+            {
+                "WOSSerial": line.WOSSerial,
+                "WOSLineSerial": line.WOSLineSerial,
+                "status": line.status,
+                "detail": line.detail,
+            }
+            for line in failures
+        ],
+    }
+
+
+def _run_job(local_db: Session, job_id: str) -> bool:
+    """Apply the job's pending lines chunk by chunk. Returns False if its lease was lost."""
+    SessionLocal = database.get_session_local()
+    while True:
+        if not renew_vetting_job_lease(local_db, job_id, WORKER_ID):
+            return False
+        pending = get_pending_job_lines(local_db, job_id, JOB_CHUNK_SIZE)
+        if not pending:
+            return True
+        items = [
+            {"WOSSerial": p.WOSSerial, "WOSLineSerial": p.WOSLineSerial, "VettedQty": p.VettedQty}
+            for p in pending
+        ]
+        db = SessionLocal()
+        try:
+            results = apply_keyed_vetted_qty(db, items)
+        except (DatabaseError, VettedQtyValidationError) as e:
+            # The chunk was rolled back as a whole; report it and carry on with the next one.
+            message = e.message if isinstance(e, DatabaseError) else str(e)
+            results = [("failed", message)] * len(items)
+        finally:
+            db.close()
+        record_job_line_results(
+            local_db, job_id,
+            [(p.id, status, detail) for p, (status, detail) in zip(pending, results)],
+        )
+
+
+def process_next_job() -> bool:
+    """
+    Claim and run the oldest queued job, or one whose worker stopped renewing its lease.
+    Returns False if there was nothing to claim or Sybase is unavailable, in which case the
+    job goes back in the queue with its remaining lines.
+    """
+    local_db = database.get_local_session_local()()
+    try:
+        job = claim_next_vetting_job(local_db, WORKER_ID, JOB_LEASE_SECONDS)
+        if job is None:
+            return False
+        try:
+            leased = _run_job(local_db, job.id)
+        except ServiceUnavailableError:
+            requeue_vetting_job(local_db, job.id, WORKER_ID)
+            return False
+        except Exception as e:
+            local_db.rollback()
+            finish_vetting_job(local_db, job.id, WORKER_ID, "failed", getattr(e, "message", str(e)))
+        else:
+            if leased:
+                finish_vetting_job(local_db, job.id, WORKER_ID, "completed")
+        return True
+    finally:
+        local_db.close()
+
+
+class JobWorker:
+    """Background thread draining the vetting job queue."""
+
+    def __init__(self, poll_seconds: float = JOB_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        # Jobs interrupted by a stopped worker are not requeued here: another worker may
+        # still be running them. Their leases expire and claim_next_vetting_job takes them.
+        self._thread = threading.Thread(target=self._run, name="vetting-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                worked = process_next_job()
+            except DatabaseError as e:
+                print(f"Vetting job worker error: {e.message}")
+                worked = False
+            if not worked:
+                self._stop.wait(self.poll_seconds)
+
+
+worker = JobWorker()
@@ -0,0 +1,204 @@
+"""
+Local read-through mirror of the WOS read tables, for serving reads while Sybase is down.
+
+When MIRROR_DB_URL is set, WOSMaster, WOSLine, CodeTable and Correspondence are copied to
+an embedded SQLite file. A background worker syncs it every MIRROR_SYNC_SECONDS:
+
+- WOSMaster and WOSLine through the change feeds, resuming from the stored tokens (a full
+  snapshot the first time, or when the change log no longer covers the line token),
+- Correspondence by DateTimeCorrespondence, re-reading the last MIRROR_CLOCK_SKEW seconds,
+  from every station partition (STATION_SHARDS) so the mirror holds all of it,
+- CodeTable in full.
+
+Vetting writes made through this API are written through to the mirror as they commit.
+Other Sybase edits reach it on the next sync. read_routing decides when reads use it.
+
+All workers of a host share the mirror file, but only one syncs it: the worker holding an
+exclusive lock on `<mirror file>.lock`. Another worker takes over if that one exits.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+import circuit_breaker
+import database
+import metrics
+import models
+import vetting_events
+from partitions import scatter_gather
+from repositories import (
+    get_mirror_state,
+    apply_mirror_sync,
+    set_mirror_vetted_qty,
+    get_correspondence_since,
+    get_all_codetable,
+)
+from exceptions import ChangeTokenExpiredError, DatabaseError, ServiceUnavailableError
+from .change_feed_service import get_wos_master_changes, get_wos_line_changes
+
+MIRROR_SYNC_SECONDS = float(os.getenv("MIRROR_SYNC_SECONDS", 60))
+MIRROR_CLOCK_SKEW = int(os.getenv("MIRROR_CLOCK_SKEW", 300))
+
+MIRRORED_MODELS = (models.WOSMaster, models.WOSLine, models.CodeTable, models.Correspondence)
+
+metrics.describe("mirror_sync_total", "Local WOS mirror sync runs by result.")
+
+
+def init_mirror() -> None:
+    """Create the mirror tables if they do not exist."""
+    engine = database.get_mirror_engine()
+    models.Base.metadata.create_all(bind=engine, tables=[m.__table__ for m in MIRRORED_MODELS])
+    database.MirrorBase.metadata.create_all(bind=engine)
+
+
+def _row(model, obj, exclude=()) -> dict:
+    if isinstance(obj, dict):
+        return {c.name: obj[c.name] for c in model.__table__.columns if c.name in obj}
+    return {c.name: getattr(obj, c.name) for c in model.__table__.columns if c.name not in exclude}
+
+
+def sync_mirror(db: Session, local_db: Session, mirror_db: Session) -> dict:
+    """
+    Copy changes since the last sync from Sybase into the mirror, in one mirror transaction.
+    Returns row counts per table. Raises DatabaseError or ServiceUnavailableError.
+    """
+    started = datetime.now()
+    state = get_mirror_state(mirror_db)
+    masters = get_wos_master_changes(db, state.master_token if state else None)
+    try:
+        lines = get_wos_line_changes(db, local_db, state.line_token if state else None)
+    except ChangeTokenExpiredError:
+        lines = get_wos_line_changes(db, local_db, None)
+
+    correspondence_since = state.correspondence_since if state else None
+    since = correspondence_since - timedelta(seconds=MIRROR_CLOCK_SKEW) if correspondence_since else None
+    correspondence = scatter_gather(
+        db,
+        lambda session, stations: get_correspondence_since(session, since, stations),
+        key=lambda c: c.DateTimeCorrespondence,
+    )
+    code_table = get_all_codetable(db)
+
+    upserts = {
+        models.WOSMaster: [_row(models.WOSMaster, m) for m in masters["changes"]],
+        models.WOSLine: [_row(models.WOSLine, line) for line in lines["changes"]],
+        models.Correspondence: [
+            _row(models.Correspondence, c, exclude=("Document",)) for c in correspondence
+        ],
+    }
+    apply_mirror_sync(
+        mirror_db, upserts, [_row(models.CodeTable, c) for c in code_table],
+        {
+            "master_token": masters["next"],
+            "line_token": lines["next"],
+            "correspondence_since": max(
+                [c.DateTimeCorrespondence for c in correspondence]
+                + ([correspondence_since] if correspondence_since else []),
+                default=None,
+            ),
+            "synced_at": started,
+        },
+    )
+    return {model.__tablename__: len(rows) for model, rows in upserts.items()} | {
+        models.CodeTable.__tablename__: len(code_table)
+    }
+
+
+def sync_once() -> bool:
+    """Run one mirror sync. Returns False if skipped or failed; failures are logged."""
+    if database.main_breaker.state == circuit_breaker.OPEN:
+        metrics.inc("mirror_sync_total", result="skipped")
+        return False
+    db = database.get_session_local()()
+    local_db = database.get_local_session_local()()
+    mirror_db = database.get_mirror_session_local()()
+    try:
+        sync_mirror(db, local_db, mirror_db)
+    except (DatabaseError, ServiceUnavailableError) as e:
+        print(f"WOS mirror sync error: {getattr(e, 'message', None) or e}")
+        metrics.inc("mirror_sync_total", result="error")
+        return False
+    finally:
+        db.close()
+        local_db.close()
+        mirror_db.close()
+    metrics.inc("mirror_sync_total", result="ok")
+    return True
+
+
+def _lock_path() -> str | None:
+    path = database.get_mirror_engine().url.database
+    if fcntl is None or not path or path == ":memory:":
+        return None
+    return path + ".lock"
+
+
+class MirrorSync:
+    """Background thread keeping the local WOS mirror in sync, in one worker per mirror file."""
+
+    def __init__(self, interval: float = MIRROR_SYNC_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_fd = None
+        self._ready = False
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="wos-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self._ready = False
+
+    def owns_mirror(self) -> bool:
+        """Take the mirror's sync lock unless another worker holds it. Returns True if held."""
+        if self._lock_fd is None:
+            path = _lock_path()
+            if path is not None:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    return False
+                self._lock_fd = fd
+        if not self._ready:
+            init_mirror()
+            self._ready = True
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.owns_mirror():
+                    sync_once()
+            except Exception as e:
+                print(f"Error starting WOS mirror sync: {e}")
+            self._stop.wait(self.interval)
+
+
+worker = MirrorSync()
+
+
+@vetting_events.subscribe
+def _write_through(wos_serial: int, changes: list[dict]) -> None:
+    if not database.mirror_configured():
+        return
+    mirror_db = database.get_mirror_session_local()()
+    try:
+        set_mirror_vetted_qty(mirror_db, changes)
+    finally:
+        mirror_db.close()
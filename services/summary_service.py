@@ -0,0 +1,215 @@
+"""
+Audit rollups per WOS, CustomerCode and WOSType, kept in the local SQLite store.
+
+Each WOS has a summary row with its line count, vetted line count and summed
+AuthorisedQty, VettedQty and TotalCost. Customer and WOSType rollups are the sums of those
+rows and are only ever changed by deltas, so reading a dashboard costs O(groups).
+
+- Vetting writes through this API add their VettedQty delta as they commit.
+- A background worker (every SUMMARY_SYNC_SECONDS) recomputes from Sybase the WOS that
+  the WOSMaster change feed reports (new, concurred, approved or closed) and the WOS named
+  in the vetting change log. The first sync computes every WOS.
+
+Each change log entry is replayed by two consecutive syncs, so a vetting delta that lands
+while a sync recomputes the same WOS is corrected by the next one. Line edits made in
+Sybase outside this API show up when their WOS is next recomputed.
+
+SUMMARY_ENABLED is off by default and meant for one worker process: the first sync scans
+every WOS, and several processes syncing would write the same SQLite file at once. Vetting
+writes served by other workers reach the rollups through the change log at the next sync.
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Session
+
+import circuit_breaker
+import database
+import metrics
+import vetting_events
+from repositories import (
+    get_wos_line_totals,
+    get_line_changes_since,
+    get_line_change_seq_bounds,
+    get_summary_state,
+    save_wos_summaries,
+    add_wos_vetting_delta,
+    get_summary_rollups,
+    get_summary_rollup,
+    get_wos_summaries as repo_get_wos_summaries,
+    get_wos_summary as repo_get_wos_summary,
+)
+from exceptions import DatabaseError, NotFoundError, ServiceUnavailableError
+from .change_feed_service import get_wos_master_changes
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "false").lower() in ("1", "true", "yes")
+SUMMARY_SYNC_SECONDS = float(os.getenv("SUMMARY_SYNC_SECONDS", 60))
+
+# WOSSerials per line totals query.
+_KEY_BATCH_SIZE = 500
+
+metrics.describe("summary_sync_total", "WOS summary sync runs by result.")
+
+
+def sync_summaries(db: Session, local_db: Session) -> int:
+    """
+    Recompute the summaries of WOS changed since the last sync (all WOS the first time)
+    and update the rollups. Returns the number of WOS recomputed.
+    Raises DatabaseError or ServiceUnavailableError.
+    """
+    started = datetime.now()
+    state = get_summary_state(local_db)
+    # Read the log position before Sybase so nothing committed in between is skipped.
+    _, max_seq = get_line_change_seq_bounds(local_db)
+    log_seq = max_seq or 0
+
+    masters = get_wos_master_changes(db, state.master_token if state else None)
+    targets = {
+        m["WOSSerial"]: (m["CustomerCode"], m["WOSType"], m["DateTimeClosed"] is not None)
+        for m in masters["changes"]
+    }
+    if state is not None:
+        for change in get_line_changes_since(local_db, state.line_seq):
+            if change.WOSSerial in targets:
+                continue
+            summary = repo_get_wos_summary(local_db, change.WOSSerial)
+            if summary is not None:
+                targets[change.WOSSerial] = (summary.CustomerCode, summary.WOSType, summary.closed)
+
+    serials = sorted(targets)
+    totals = {}
+    for start in range(0, len(serials), _KEY_BATCH_SIZE):
+        for row in get_wos_line_totals(db, serials[start:start + _KEY_BATCH_SIZE]):
+            totals[row.WOSSerial] = row
+
+    summaries = []
+    for serial in serials:
+        customer_code, wos_type, closed = targets[serial]
+        row = totals.get(serial)
+        summaries.append({
+            "WOSSerial": serial,
+            "CustomerCode": customer_code,
+            "WOSType": wos_type,
+            "closed": closed,
+            "line_count": row.line_count if row else 0,
+            "vetted_line_count": row.vetted_line_count if row else 0,
+            "authorised_qty": float(row.authorised_qty) if row else 0.0,
+            "vetted_qty": float(row.vetted_qty) if row else 0.0,
+            "total_cost": float(row.total_cost) if row else 0.0,
+            "updated_at": started,
+        })
+    save_wos_summaries(local_db, summaries, {
+        "master_token": masters["next"],
+        "line_seq": state.next_line_seq if state else log_seq,
+        "next_line_seq": log_seq,
+        "synced_at": started,
+    })
+    return len(summaries)
+
+
+def sync_once() -> bool:
+    """Run one summary sync. Returns False if skipped or failed; failures are logged."""
+    if database.main_breaker.state == circuit_breaker.OPEN:
+        metrics.inc("summary_sync_total", result="skipped")
+        return False
+    db = database.get_session_local()()
+    local_db = database.get_local_session_local()()
+    try:
+        sync_summaries(db, local_db)
+    except (DatabaseError, ServiceUnavailableError) as e:
+        print(f"WOS summary sync error: {getattr(e, 'message', None) or e}")
+        metrics.inc("summary_sync_total", result="error")
+        return False
+    finally:
+        db.close()
+        local_db.close()
+    metrics.inc("summary_sync_total", result="ok")
+    return True
+
+
+class SummarySync:
+    """Background thread keeping the WOS summaries in sync."""
+
+    def __init__(self, interval: float = SUMMARY_SYNC_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="wos-summary", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            sync_once()
+            self._stop.wait(self.interval)
+
+
+worker = SummarySync()
+
+
+def _rollup_to_dict(rollup) -> dict:
+    return {
+        "key": rollup.key,
+        "wos_count": rollup.wos_count,
+        "open_wos_count": rollup.wos_count - rollup.closed_wos_count,
+        "closed_wos_count": rollup.closed_wos_count,
+        "line_count": rollup.line_count,
+        "vetted_line_count": rollup.vetted_line_count,
+        "authorised_qty": rollup.authorised_qty,
+        "vetted_qty": rollup.vetted_qty,
+        "total_cost": rollup.total_cost,
+    }
+
+
+def get_summary_by_customer(local_db: Session) -> list:
+    """Return one rollup per CustomerCode."""
+    return [_rollup_to_dict(r) for r in get_summary_rollups(local_db, "customer") if r.wos_count]
+
+
+def get_customer_summary(local_db: Session, customer_code: str) -> dict:
+    """Return a CustomerCode's rollup or raise NotFoundError."""
+    rollup = get_summary_rollup(local_db, "customer", customer_code)
+    if rollup is None or not rollup.wos_count:
+        raise NotFoundError("Customer summary not found")
+    return _rollup_to_dict(rollup)
+
+
+def get_summary_by_wos_type(local_db: Session) -> list:
+    """Return one rollup per WOSType."""
+    return [_rollup_to_dict(r) for r in get_summary_rollups(local_db, "wostype") if r.wos_count]
+
+
+def get_wos_summaries(local_db: Session, customer_code: Optional[str] = None) -> list:
+    """Return per-WOS summaries, optionally for one CustomerCode."""
+    return repo_get_wos_summaries(local_db, customer_code=customer_code)
+
+
+def get_wos_summary(local_db: Session, wos_serial: int):
+    """Return a WOS summary or raise NotFoundError."""
+    summary = repo_get_wos_summary(local_db, wos_serial)
+    if summary is None:
+        raise NotFoundError("WOS summary not found")
+    return summary
+
+
+@vetting_events.subscribe
+def _add_vetting_delta(wos_serial: int, changes: list[dict]) -> None:
+    if not SUMMARY_ENABLED:
+        return
+    vetted_lines = sum(
+        (c["VettedQty"] is not None) - (c["PreviousVettedQty"] is not None) for c in changes
+    )
+    vetted_qty = sum((c["VettedQty"] or 0) - (c["PreviousVettedQty"] or 0) for c in changes)
+    local_db = database.get_local_session_local()()
+    try:
+        add_wos_vetting_delta(local_db, wos_serial, vetted_lines, vetted_qty)
+    finally:
+        local_db.close()
@@ -1,10 +1,22 @@
 """User-related business logic."""
 
+from typing import Optional
+
 from sqlalchemy.orm import Session
 
+import database
+from exceptions import BadRequestError
 from repositories import get_all_users as repo_get_all_users
 
 
-def get_all_users(db: Session) -> list:
-    """Return all users."""
-    return repo_get_all_users(db)
+def get_all_users(db: Session, station_code: Optional[str] = None) -> list:
+    """
+    Return all users, or one station's. Users stay on the main server even with
+    STATION_SHARDS, so /users always agrees with the login and token lookups.
+    """
+    stations = None
+    if station_code is not None:
+        if station_code not in database.STATION_CODES:
+            raise BadRequestError(f"Unknown station code: {station_code}")
+        stations = [station_code]
+    return repo_get_all_users(db, stations)
@@ -0,0 +1,149 @@
+"""
+Month segments for date-range WOSMaster queries.
+
+A `/wosmaster?from_date=...` query is answered from per-month segments keyed by
+CustomerCode and the month of DateTimeInitiated. A segment holds every WOSMaster of
+that customer (or all customers) initiated in a closed month, that is, any month before the
+current one. Segments are kept in the cache backend for WOS_SEGMENT_TTL seconds. Only the
+current month is queried live, and missing closed months are loaded with one query per
+contiguous run.
+
+Closed months still see approvals and closures. Before use, cached segments are patched
+with a single change-feed query for masters concurred, approved or closed since the
+oldest segment was built, minus WOS_SEGMENT_CLOCK_SKEW for clock differences with
+Sybase. Edits that set no timestamp (Remarks, WONumber, ...) show up when the segment
+expires.
+
+Months before the first WOS of the customer are skipped, so a from_date far in the past
+does not fill the cache with empty segments.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+import cache
+import database
+from repositories import (
+    get_first_wos_master_initiated,
+    get_wos_masters_changed_since,
+    get_wos_masters_initiated_between,
+    get_wos_masters_with_description,
+)
+from . import wos_service
+
+WOS_SEGMENT_CACHE_ENABLED = os.getenv("WOS_SEGMENT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+WOS_SEGMENT_TTL = int(os.getenv("WOS_SEGMENT_TTL", 3600))
+WOS_SEGMENT_CLOCK_SKEW = int(os.getenv("WOS_SEGMENT_CLOCK_SKEW", 300))
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def _segment_key(customer_code: Optional[str], month: datetime) -> str:
+    return f"wosmaster-segment:{customer_code or '*'}:{month:%Y-%m}"
+
+
+def _get_segment(key: str):
+    try:
+        return cache.backend.get(key)
+    except cache.CacheBackendError:
+        return None
+
+
+def _store_segment(key: str, segment) -> None:
+    try:
+        cache.backend.set(key, segment, ttl=WOS_SEGMENT_TTL)
+    except cache.CacheBackendError:
+        pass
+
+
+def _first_initiated(db, customer_code: Optional[str]) -> Optional[datetime]:
+    key = f"wosmaster-segment:{customer_code or '*'}:first"
+    try:
+        return cache.cached(
+            key, lambda: get_first_wos_master_initiated(db, customer_code), ttl=WOS_SEGMENT_TTL
+        )
+    except cache.CacheBackendError:
+        return get_first_wos_master_initiated(db, customer_code)
+
+
+def _load_run(db, customer_code, run: list, built_at: datetime) -> dict:
+    """Query a contiguous run of closed months at once and store one segment per month."""
+    rows = {month: [] for month in run}
+    for master, description in get_wos_masters_initiated_between(
+        db, run[0], next_month(run[-1]), customer_code=customer_code
+    ):
+        row = wos_service.master_to_dict(master, description)
+        rows[month_start(master.DateTimeInitiated)].append(row)
+    for month, month_rows in rows.items():
+        _store_segment(_segment_key(customer_code, month), (built_at, month_rows))
+    return rows
+
+
+def get_wos_masters_by_segments(
+    db: Session,
+    customer_code: Optional[str],
+    from_date: datetime,
+    to_date: Optional[datetime] = None,
+    now: Optional[datetime] = None,
+) -> list:
+    """Return WOSMaster dicts initiated in [from_date, to_date], ordered by DateTimeInitiated."""
+    from_date, to_date = database.naive_local(from_date), database.naive_local(to_date)
+    now = now or datetime.now()
+    current_month = month_start(now)
+    last_closed = current_month if to_date is None else min(current_month, next_month(month_start(to_date)))
+
+    first = _first_initiated(db, customer_code)
+    months, month = [], max(month_start(from_date), month_start(first)) if first else last_closed
+    while month < last_closed:
+        months.append(month)
+        month = next_month(month)
+
+    segments, oldest_built, run = {}, None, []
+    for month in months + [None]:
+        segment = _get_segment(_segment_key(customer_code, month)) if month is not None else None
+        if segment is None and month is not None:
+            run.append(month)
+            continue
+        if run:
+            segments.update(_load_run(db, customer_code, run, now))
+            run = []
+        if segment is not None:
+            built_at, segments[month] = segment
+            oldest_built = built_at if oldest_built is None else min(oldest_built, built_at)
+
+    by_serial = {}
+    for month in months:
+        for row in segments[month]:
+            by_serial[row["WOSSerial"]] = row
+
+    if oldest_built is not None:
+        # Patch cached segments with masters changed since they were built.
+        since = oldest_built - timedelta(seconds=WOS_SEGMENT_CLOCK_SKEW)
+        for master, description in get_wos_masters_changed_since(
+            db, since, customer_code=customer_code,
+            initiated_from=months[0], initiated_before=next_month(months[-1]),
+        ):
+            by_serial[master.WOSSerial] = wos_service.master_to_dict(master, description)
+
+    rows = [
+        row for row in by_serial.values()
+        if row["DateTimeInitiated"] >= from_date and (to_date is None or row["DateTimeInitiated"] <= to_date)
+    ]
+    if to_date is None or to_date >= current_month:
+        for master, description in get_wos_masters_with_description(
+            db, customer_code=customer_code, from_date=max(from_date, current_month), to_date=to_date
+        ):
+            rows.append(wos_service.master_to_dict(master, description))
+    rows.sort(key=lambda row: (row["DateTimeInitiated"], row["WOSSerial"]))
+    return rows
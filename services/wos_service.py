@@ -1,9 +1,13 @@
 """WOSMaster and WOSLine business logic."""
 
+import os
 from typing import Optional, List
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+import database
+from coalescing import SingleFlight, request_key
+from db_retry import retry_on_deadlock
 from models import VettedQtyValidationError
 from repositories import (
     get_wos_masters_with_description,
@@ -12,17 +16,33 @@ from repositories import (
     get_wos_line as repo_get_wos_line,
     update_wos_line_vetted_qty,
     bulk_update_wos_lines_vetted_qty,
+    get_wos_lines_by_keys,
+    set_wos_lines_vetted_qty,
 )
-from exceptions import NotFoundError
+from exceptions import DatabaseError, NotFoundError
+from . import wos_segment_cache
 
+# Lines per transaction for cross-WOS batch vetting.
+VETTING_BATCH_CHUNK_SIZE = int(os.getenv("VETTING_BATCH_CHUNK_SIZE", 500))
 
-def _master_to_dict(master, description):
+# Concurrent identical reads share one in-flight query. Keys include the session's source,
+# so a primary read never joins a replica or mirror read of the same rows. Loaders return
+# plain dicts: ORM instances stay bound to the leader's session, which closes with its request.
+_reads = SingleFlight()
+
+
+def master_to_dict(master, description):
     """Build WOSMaster response dict with WOSTypeDescription."""
     m_dict = {c.name: getattr(master, c.name) for c in master.__table__.columns}
     m_dict["WOSTypeDescription"] = description
     return m_dict
 
 
+def line_to_dict(line):
+    """Build WOSLine response dict, detached from the session that loaded it."""
+    return {c.name: getattr(line, c.name) for c in line.__table__.columns}
+
+
 def get_wos_masters(
     db: Session,
     customer_code: Optional[str] = None,
@@ -30,34 +50,68 @@ def get_wos_masters(
     to_date: Optional[datetime] = None,
 ) -> list:
     """Return WOSMaster list with WOSTypeDescription."""
-    results = get_wos_masters_with_description(
-        db, customer_code=customer_code, from_date=from_date, to_date=to_date
+    from_date, to_date = database.naive_local(from_date), database.naive_local(to_date)
+    source = database.session_source(db)
+    key = request_key(
+        "wosmaster", source=source, customer_code=customer_code, from_date=from_date, to_date=to_date
     )
-    return [_master_to_dict(master, desc) for master, desc in results]
+    # Mirror sessions may be stale, so they never feed the shared segments.
+    use_segments = wos_segment_cache.WOS_SEGMENT_CACHE_ENABLED and source != "mirror"
+    if from_date is not None and use_segments:
+        # Closed months come from cached month segments; only the current month is scanned.
+        return _reads.do(key, lambda: wos_segment_cache.get_wos_masters_by_segments(
+            db, customer_code, from_date, to_date
+        ))
+    return _reads.do(key, lambda: [
+        master_to_dict(master, desc)
+        for master, desc in get_wos_masters_with_description(
+            db, customer_code=customer_code, from_date=from_date, to_date=to_date
+        )
+    ])
 
 
 def get_wos_master_by_serial(db: Session, serial_no: int) -> dict:
     """Return single WOSMaster by serial or raise NotFoundError."""
-    result = repo_get_wos_master(db, serial_no)
-    if not result:
+    def load():
+        result = repo_get_wos_master(db, serial_no)
+        return master_to_dict(*result) if result else None
+
+    master = _reads.do(
+        request_key("wosmaster_by_serial", source=database.session_source(db), serial_no=serial_no),
+        load,
+    )
+    if not master:
         raise NotFoundError("WOSMaster not found")
-    master, description = result
-    return _master_to_dict(master, description)
+    return master
 
 
 def get_wos_lines(db: Session, wos_serial: Optional[int] = None) -> list:
     """Return WOSLine list, optionally filtered by WOSSerial."""
-    return repo_get_wos_lines(db, wos_serial=wos_serial)
+    return _reads.do(
+        request_key("wosline", source=database.session_source(db), wos_serial=wos_serial),
+        lambda: [line_to_dict(line) for line in repo_get_wos_lines(db, wos_serial=wos_serial)],
+    )
 
 
-def get_wos_line(db: Session, wos_serial: int, line_serial: int):
+def get_wos_line(db: Session, wos_serial: int, line_serial: int) -> dict:
     """Return single WOSLine or raise NotFoundError."""
-    line = repo_get_wos_line(db, wos_serial, line_serial)
+    def load():
+        line = repo_get_wos_line(db, wos_serial, line_serial)
+        return line_to_dict(line) if line else None
+
+    line = _reads.do(
+        request_key(
+            "wosline_by_key", source=database.session_source(db),
+            wos_serial=wos_serial, line_serial=line_serial,
+        ),
+        load,
+    )
     if not line:
         raise NotFoundError("WOSLine not found")
     return line
 
 
+@retry_on_deadlock("update_wos_line")
 def update_wos_line(
     db: Session,
     wos_serial: int,
@@ -78,6 +132,7 @@ def update_wos_line(
     return update_wos_line_vetted_qty(db, wos_serial, line_serial, vetted_qty)
 
 
+@retry_on_deadlock("bulk_update_wos_lines")
 def bulk_update_wos_lines(
     db: Session,
     wos_serial: int,
@@ -99,3 +154,61 @@ def bulk_update_wos_lines(
             )
     line_updates = [(item["WOSLineSerial"], item["VettedQty"]) for item in lines]
     return bulk_update_wos_lines_vetted_qty(db, wos_serial, line_updates)
+
+
+@retry_on_deadlock("apply_keyed_vetted_qty")
+def apply_keyed_vetted_qty(db: Session, items: List[dict]) -> list[tuple[str, str | None]]:
+    """
+    Validate and apply one chunk of keyed VettedQty updates in a single transaction.
+    items: [{"WOSSerial", "WOSLineSerial", "VettedQty"}, ...]. Lines that are missing or
+    whose VettedQty exceeds AuthorisedQty are skipped and reported; the rest are written.
+    Returns a (status, detail) pair per item, in order.
+    """
+    keys = [(item["WOSSerial"], item["WOSLineSerial"]) for item in items]
+    lines = {(line.WOSSerial, line.WOSLineSerial): line for line in get_wos_lines_by_keys(db, keys)}
+    results = []
+    assignments = []
+    for key, item in zip(keys, items):
+        line = lines.get(key)
+        if line is None:
+            results.append(("not_found", "WOSLine not found"))
+        elif item["VettedQty"] > line.AuthorisedQty:
+            results.append((
+                "invalid",
+                f"VettedQty ({item['VettedQty']}) cannot be greater than AuthorisedQty ({line.AuthorisedQty})",
+            ))
+        else:
+            results.append(("updated", None))
+            assignments.append((line, item["VettedQty"]))
+    if assignments:
+        set_wos_lines_vetted_qty(db, assignments)
+    return results
+
+
+def batch_update_wos_lines(db: Session, lines: List[dict]) -> dict:
+    """
+    Update VettedQty for lines keyed by (WOSSerial, WOSLineSerial) across any number of WOS.
+    Lines are applied in key order, VETTING_BATCH_CHUNK_SIZE per transaction. Invalid lines
+    and chunks whose transaction fails are reported rather than raised.
+    Returns {"updated", "failed", "results": [{"WOSSerial", "WOSLineSerial", "status", "detail"}]}.
+    """
+    ordered = sorted(lines, key=lambda item: (item["WOSSerial"], item["WOSLineSerial"]))
+    results = []
+    for start in range(0, len(ordered), VETTING_BATCH_CHUNK_SIZE):
+        chunk = ordered[start:start + VETTING_BATCH_CHUNK_SIZE]
+        try:
+            outcomes = apply_keyed_vetted_qty(db, chunk)
+        except (DatabaseError, VettedQtyValidationError) as e:
+            message = e.message if isinstance(e, DatabaseError) else str(e)
+            outcomes = [("failed", message)] * len(chunk)
+        results.extend(
+            {
+                "WOSSerial": item["WOSSerial"],
+                "WOSLineSerial": item["WOSLineSerial"],
+                "status": status,
+                "detail": detail,
+            }
+            for item, (status, detail) in zip(chunk, outcomes)
+        )
+    updated = sum(1 for r in results if r["status"] == "updated")
+    return {"updated": updated, "failed": len(results) - updated, "results": results}
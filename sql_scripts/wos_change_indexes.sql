@@ -0,0 +1,27 @@
+-- Indexes supporting the change feeds (/wosmaster/changes and /wosline/changes).
+-- Each timestamp predicate in the feed queries can then use an index instead of a
+-- table scan, so polling cost follows the number of changed rows.
+
+use csilms
+go
+
+setuser 'dbo'
+go
+
+create nonclustered index idx_WOSMaster_Initiated on WOSMaster (DateTimeInitiated)
+go
+
+create nonclustered index idx_WOSMaster_Concurred on WOSMaster (DateTimeConcurred)
+go
+
+create nonclustered index idx_WOSMaster_Approved on WOSMaster (DateTimeApproved)
+go
+
+create nonclustered index idx_WOSMaster_Closed on WOSMaster (DateTimeClosed)
+go
+
+create nonclustered index idx_WOSLine_Closed on WOSLine (DateTimeClosed)
+go
+
+setuser
+go
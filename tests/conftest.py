@@ -1,8 +1,29 @@
 import pytest
 from fastapi.testclient import TestClient
 from main import app
+from cache import wos_cache
+import rate_limit
+from tests.resp_stub import start_stub_server
 
 @pytest.fixture
 def client():
     with TestClient(app) as c:
         yield c
+
+@pytest.fixture(autouse=True)
+def clear_wos_cache():
+    wos_cache.clear()
+    yield
+    wos_cache.clear()
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits(monkeypatch):
+    monkeypatch.setattr(rate_limit, "limiter", rate_limit.LocalLimiter())
+
+@pytest.fixture
+def resp_server():
+    """A local stand-in for a Redis-protocol server."""
+    server = start_stub_server()
+    yield server
+    server.shutdown()
+    server.server_close()
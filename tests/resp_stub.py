@@ -0,0 +1,102 @@
+"""Minimal Redis-protocol stand-in covering the commands the app's Redis clients use."""
+
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self.encode(item) for item in value)
+        if value == "OK":
+            return b"+OK\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def reply(self, value):
+        with self.server.write_lock:
+            self.wfile.write(self.encode(value))
+
+    def handle(self):
+        store = self.server.store
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    return
+                self.dispatch(store, args[0].upper(), args)
+        finally:
+            with self.server.lock:
+                for subscribers in self.server.channels.values():
+                    subscribers.discard(self)
+
+    def dispatch(self, store, cmd, args):
+        with self.server.lock:
+            now = time.monotonic()
+            for key in [k for k, (_, exp) in store.items() if exp and exp <= now]:
+                del store[key]
+            if cmd == b"GET":
+                entry = store.get(args[1])
+                self.reply(entry[0] if entry else None)
+            elif cmd == b"SET":
+                options = [a.upper() for a in args[3:]]
+                expires = None
+                if b"PX" in options:
+                    expires = now + int(args[3 + options.index(b"PX") + 1]) / 1000
+                if b"NX" in options and args[1] in store:
+                    self.reply(None)
+                else:
+                    store[args[1]] = (args[2], expires)
+                    self.reply("OK")
+            elif cmd == b"DEL":
+                self.reply(sum(1 for k in args[1:] if store.pop(k, None) is not None))
+            elif cmd == b"INCRBY":
+                value, expires = store.get(args[1], (b"0", None))
+                value = int(value) + int(args[2])
+                store[args[1]] = (str(value).encode(), expires)
+                self.reply(value)
+            elif cmd == b"PEXPIRE":
+                value, _ = store[args[1]]
+                store[args[1]] = (value, now + int(args[2]) / 1000)
+                self.reply(1)
+            elif cmd == b"KEYS":
+                pattern = args[1].decode()
+                self.reply([k for k in store if fnmatch.fnmatchcase(k.decode(), pattern)])
+            elif cmd == b"SUBSCRIBE":
+                self.server.channels.setdefault(args[1], set()).add(self)
+                self.reply([b"subscribe", args[1], 1])
+            elif cmd == b"PUBLISH":
+                subscribers = list(self.server.channels.get(args[1], ()))
+                for subscriber in subscribers:
+                    subscriber.reply([b"message", args[1], args[2]])
+                self.reply(len(subscribers))
+            else:
+                self.reply("OK")
+
+
+def start_stub_server():
+    """Start a stub server on a free local port. Call shutdown() and server_close() when done."""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    server.store = {}
+    server.channels = {}
+    server.lock = threading.Lock()
+    server.write_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
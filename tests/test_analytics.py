@@ -0,0 +1,201 @@
+import numpy as np
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import models
+import vetting_events
+from repositories import record_line_changes
+from services import analytics_service
+from services.analytics_service import LineSnapshot
+
+ITEMS = ["BOLT", "NUT", "WASHER"]
+
+
+def memory_sessionmaker(metadata):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def add_wos(db, serial, customer, initiated, quantities):
+    db.add(models.WOSMaster(
+        WOSSerial=serial, CustomerCode=customer, WOSType="TYP", InitiatedBy="user1",
+        DateTimeInitiated=initiated,
+    ))
+    for n, (item, authorised, vetted) in enumerate(quantities, start=1):
+        db.add(models.WOSLine(
+            WOSSerial=serial, WOSLineSerial=n, ItemCode=item, ItemDesc="Item", ItemDeno="EA",
+            SOS="S1" if n % 2 else "S2", AuthorisedQty=authorised, VettedQty=vetted,
+            TotalCost=authorised * 2, AuthorityRef="REF", AuthorityDate=initiated, Justification="J",
+        ))
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    MainSession = memory_sessionmaker(models.Base.metadata)
+    LocalSession = memory_sessionmaker(database.LocalBase.metadata)
+    monkeypatch.setattr(database, "_LocalSessionLocal", LocalSession)
+    rng = np.random.default_rng(7)
+    db = MainSession()
+    for serial in range(1, 41):
+        quantities = [
+            (ITEMS[int(rng.integers(3))], float(rng.integers(50, 100)),
+             None if rng.random() < 0.3 else float(rng.integers(0, 50)))
+            for _ in range(int(rng.integers(1, 6)))
+        ]
+        customer = "C001" if serial % 3 else "C002"
+        add_wos(db, serial, customer, datetime(2026, 1, 1 + serial % 28), quantities)
+    db.commit()
+    db.close()
+    return MainSession, LocalSession
+
+
+def refresh(snapshot, sessions):
+    MainSession, LocalSession = sessions
+    db, local_db = MainSession(), LocalSession()
+    try:
+        return snapshot.refresh(db, local_db)
+    finally:
+        db.close()
+        local_db.close()
+
+
+def all_lines(sessions):
+    MainSession, _ = sessions
+    db = MainSession()
+    try:
+        return [
+            (line, master.CustomerCode)
+            for line, master in db.query(models.WOSLine, models.WOSMaster).join(models.WOSMaster)
+        ]
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def enabled(monkeypatch, sessions):
+    snapshot = LineSnapshot()
+    refresh(snapshot, sessions)
+    monkeypatch.setattr(analytics_service, "snapshot", snapshot)
+    monkeypatch.setattr(analytics_service, "ANALYTICS_ENABLED", True)
+    return snapshot
+
+
+def test_group_by_matches_row_by_row_results(sessions):
+    snapshot = LineSnapshot()
+    refresh(snapshot, sessions)
+    result = snapshot.aggregate(("item_code", "customer_code"), percentiles=(50, 90))
+
+    expected = {}
+    for line, customer in all_lines(sessions):
+        expected.setdefault((line.ItemCode, customer), []).append(line)
+    assert result["lines"] == sum(len(lines) for lines in expected.values())
+    assert len(result["groups"]) == len(expected)
+    for group in result["groups"]:
+        lines = expected[(group["group"]["item_code"], group["group"]["customer_code"])]
+        vetted = [line.VettedQty for line in lines if line.VettedQty is not None]
+        assert group["count"] == len(lines)
+        assert group["authorised_qty"] == pytest.approx(sum(line.AuthorisedQty for line in lines))
+        assert group["total_cost"] == pytest.approx(sum(float(line.TotalCost) for line in lines))
+        assert group["vetted_qty_lines"] == len(vetted)
+        if vetted:
+            assert group["percentiles"]["p50"] == pytest.approx(np.percentile(vetted, 50))
+            assert group["percentiles"]["p90"] == pytest.approx(np.percentile(vetted, 90))
+        else:
+            assert group["percentiles"]["p50"] is None
+    counts = [group["count"] for group in result["groups"]]
+    assert counts == sorted(counts, reverse=True)
+
+
+def test_filters_and_date_range(sessions):
+    snapshot = LineSnapshot()
+    refresh(snapshot, sessions)
+    result = snapshot.aggregate(
+        filters={"item_code": "NUT", "sos": "S1"}, from_date=datetime(2026, 1, 10),
+    )
+    MainSession, _ = sessions
+    db = MainSession()
+    expected = db.query(models.WOSLine).join(models.WOSMaster).filter(
+        models.WOSLine.ItemCode == "NUT", models.WOSLine.SOS == "S1",
+        models.WOSMaster.DateTimeInitiated >= datetime(2026, 1, 10),
+    ).count()
+    db.close()
+    assert result["lines"] == expected
+    assert snapshot.aggregate(filters={"item_code": "MISSING"})["groups"] == []
+
+
+def test_refresh_reads_only_changed_lines(sessions):
+    snapshot = LineSnapshot()
+    loaded = refresh(snapshot, sessions)
+    MainSession, LocalSession = sessions
+    db = MainSession()
+    add_wos(db, 100, "C003", datetime(2026, 3, 1), [("BOLT", 10.0, 5.0)])
+    line = db.get(models.WOSLine, (1, 1))
+    line.VettedQty = 0.0
+    db.commit()
+    local_db = LocalSession()
+    record_line_changes(local_db, [{"WOSSerial": 1, "WOSLineSerial": 1}], datetime.now())
+    local_db.close()
+    db.close()
+
+    # The new and the logged line, plus lines at the watermark, instead of all lines.
+    assert refresh(snapshot, sessions) < 10 < loaded
+    assert snapshot.size == loaded + 1
+    assert snapshot.aggregate(filters={"customer_code": "C003"})["groups"][0]["vetted_qty"] == 5.0
+    row = snapshot._positions(analytics_service._line_key([1], [1]))[0]
+    assert snapshot._columns["vetted_qty"][row] == 0.0
+
+
+def test_vetting_writes_update_the_snapshot(enabled):
+    vetting_events.publish(2, [{
+        "WOSSerial": 2, "WOSLineSerial": 1, "AuthorisedQty": 1.0,
+        "PreviousVettedQty": None, "VettedQty": 1234.0,
+    }])
+    assert enabled.aggregate(sort="vetted_qty")["groups"][0]["vetted_qty"] >= 1234.0
+
+
+def test_memory_is_bounded_by_max_lines(sessions):
+    snapshot = LineSnapshot(max_lines=10)
+    refresh(snapshot, sessions)
+    assert snapshot.size == 10
+    assert snapshot.status()["truncated"] is True
+    assert snapshot.aggregate()["truncated"] is True
+
+
+def test_analytics_route(client, enabled):
+    response = client.get("/analytics/wosline", params={
+        "group_by": "sos", "percentiles": "50", "measure": "authorised_qty",
+        "sort": "total_cost", "limit": 1,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["groups"]) == 1 and set(body["groups"][0]["group"]) == {"sos"}
+    assert "p50" in body["groups"][0]["percentiles"]
+    assert client.get("/analytics/wosline", params={"group_by": "colour"}).status_code == 400
+    assert client.get("/analytics/wosline", params={"percentiles": "101"}).status_code == 400
+    assert client.get("/analytics/status").json()["lines"] == enabled.size
+
+
+def test_analytics_route_before_load_and_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(analytics_service, "snapshot", LineSnapshot())
+    monkeypatch.setattr(analytics_service, "ANALYTICS_ENABLED", True)
+    assert client.get("/analytics/wosline").status_code == 503
+    monkeypatch.setattr(analytics_service, "ANALYTICS_ENABLED", False)
+    assert client.get("/analytics/wosline").status_code == 404
+
+
+def test_vetting_writes_do_not_wait_for_a_busy_snapshot(enabled):
+    change = {"WOSSerial": 2, "WOSLineSerial": 1, "AuthorisedQty": 1.0,
+              "PreviousVettedQty": None, "VettedQty": 4321.0}
+    row = enabled._positions(analytics_service._line_key([2], [1]))[0]
+    with enabled._lock:  # a refresh or query in progress
+        vetting_events.publish(2, [change])
+        assert enabled._columns["vetted_qty"][row] != 4321.0
+    assert enabled.aggregate(sort="vetted_qty")["groups"][0]["vetted_qty"] >= 4321.0
+    assert enabled._columns["vetted_qty"][row] == 4321.0 and not enabled._pending
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+from deadlines import Deadline, _current, within
+from exceptions import DeadlineExceededError
+
+pytest.importorskip("greenlet")
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def async_db(tmp_path, monkeypatch):
+    path = tmp_path / "wos.db"
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.CodeTable(ColumnName="WOSType", CodeValue="TYP", Description="Type"))
+    db.add(models.WOSMaster(
+        WOSSerial=1, CustomerCode="C001", WOSType="TYP",
+        InitiatedBy="user1", DateTimeInitiated=datetime(2026, 1, 1),
+    ))
+    for n in (1, 2):
+        db.add(models.WOSLine(
+            WOSSerial=1, WOSLineSerial=n, ItemCode=f"ITEM{n}", ItemDesc="Item",
+            ItemDeno="EA", SOS="SOS", AuthorisedQty=10.0, AuthorityRef="REF",
+            AuthorityDate=datetime(2026, 1, 1), Justification="J",
+        ))
+    db.add(models.Correspondence(
+        LineNo=1, TableName="WOSMaster", PrimaryKeyValue="1", RoleName="LOGO",
+        CorrespondenceBy="u1", CorrespondenceToRole="NLAO",
+        DateTimeCorrespondence=datetime(2026, 1, 2), CorrespondenceType="Fwded", StationCode="K",
+    ))
+    db.commit()
+    db.close()
+    engine.dispose()
+
+    monkeypatch.setattr(database, "ASYNC_DB_URL", f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(database, "_async_engine", None)
+    monkeypatch.setattr(database, "_AsyncSessionLocal", None)
+    yield
+
+
+def test_async_endpoints_are_disabled_by_default(client, monkeypatch):
+    monkeypatch.setattr(database, "ASYNC_DB_URL", "")
+    assert client.get("/async/wosline").status_code == 404
+
+
+def test_async_reads(client, async_db):
+    masters = client.get("/async/wosmaster", params={"customer_code": "C001"}).json()
+    assert [(m["WOSSerial"], m["WOSTypeDescription"]) for m in masters] == [(1, "Type")]
+    assert client.get("/async/wosmaster/1").json()["CustomerCode"] == "C001"
+    assert client.get("/async/wosmaster/9").status_code == 404
+
+    lines = client.get("/async/wosline", params={"wos_serial": 1}).json()
+    assert [l["WOSLineSerial"] for l in lines] == [1, 2]
+    assert client.get("/async/wosline/1/2").json()["ItemCode"] == "ITEM2"
+    assert client.get("/async/wosline/1/9").status_code == 404
+
+    correspondence = client.get("/async/correspondence/1").json()
+    assert [c["CorrespondenceType"] for c in correspondence] == ["Fwded"]
+    codes = client.get("/async/codetable", params={"column_name": "WOSType"}).json()
+    assert codes == [{"ColumnName": "WOSType", "CodeValue": "TYP", "Description": "Type"}]
+
+
+def test_async_read_past_deadline_returns_504(client, async_db):
+    response = client.get("/async/wosline", headers={"X-Request-Timeout": "0.000001"})
+    assert response.status_code == 504
+
+
+def test_within_times_out_slow_awaitables():
+    async def run():
+        token = _current.set(Deadline(0.05))
+        try:
+            with pytest.raises(DeadlineExceededError):
+                await within(asyncio.sleep(1))
+        finally:
+            _current.reset(token)
+        assert await within(asyncio.sleep(0, result="ok")) == "ok"
+
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import threading
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from bulkheads import Bulkhead, bulkhead, bulkheads
+from exceptions import ServiceUnavailableError
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_runs_on_own_threads_with_caller_context():
+    pool = Bulkhead("test", max_workers=1, max_queue=4)
+
+    def work():
+        return threading.current_thread().name, request_id.get()
+
+    async def main():
+        request_id.set("abc")
+        return await pool.run(work)
+
+    thread_name, seen = asyncio.run(main())
+    assert thread_name.startswith("bulkhead-test")
+    assert seen == "abc"
+    total, count = metrics.summary("bulkhead_queue_seconds", bulkhead="test")
+    assert count == 1 and total >= 0
+    pool.shutdown()
+
+
+def test_full_queue_is_rejected():
+    pool = Bulkhead("tiny", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(pool.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ServiceUnavailableError):
+            await pool.run(lambda: "rejected")
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(main()) == (True, "queued")
+    assert metrics.value("bulkhead_rejected_total", bulkhead="tiny") == 1
+    assert pool.snapshot()["queued"] == 0
+    pool.shutdown()
+
+
+def test_decorated_route_keeps_dependencies():
+    app = FastAPI()
+
+    def get_value():
+        return 41
+
+    @app.get("/items/{item_id}")
+    @bulkhead("reads")
+    def read_item(item_id: int, value: int = Depends(get_value)):
+        return {"item_id": item_id, "value": value + 1, "thread": threading.current_thread().name}
+
+    body = TestClient(app).get("/items/7").json()
+    assert body["item_id"] == 7 and body["value"] == 42
+    assert body["thread"].startswith("bulkhead-reads")
+
+
+def test_app_routes_use_separate_bulkheads(client, monkeypatch):
+    from main import app
+    from database import get_db
+    from unittest.mock import MagicMock
+
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    try:
+        client.get("/test")
+        client.post("/forgot-password", json={"email": "nobody@example.com"})
+    finally:
+        app.dependency_overrides.clear()
+    assert metrics.summary("bulkhead_queue_seconds", bulkhead="reads")[1] == 1
+    assert metrics.summary("bulkhead_queue_seconds", bulkhead="auth")[1] == 1
+    assert set(bulkheads) == {"reads", "heavy", "writes", "auth"}
@@ -0,0 +1,174 @@
+import asyncio
+import pickle
+import threading
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+import cache
+from cache import (
+    CacheBackendError,
+    MemoryBackend,
+    RedisBackend,
+    SharedMemoryBackend,
+    WOSCache,
+    create_backend,
+)
+
+
+@pytest.fixture(params=["memory", "shm", "redis"])
+def backend_pair(request, tmp_path):
+    """Two backend instances over the same store, standing in for two workers."""
+    if request.param == "memory":
+        backend = MemoryBackend(max_entries=64)
+        return backend, backend
+    if request.param == "shm":
+        path = str(tmp_path / "cache.bin")
+        return (
+            SharedMemoryBackend(path, slots=64, slot_size=1024),
+            SharedMemoryBackend(path, slots=64, slot_size=1024),
+        )
+    server = request.getfixturevalue("resp_server")
+    host, port = server.server_address
+    return RedisBackend(host, port), RedisBackend(host, port)
+
+
+def test_backend_operations(backend_pair):
+    a, b = backend_pair
+    assert a.get("missing") is None
+    a.set("k", {"rows": [1, 2]})
+    assert b.get("k") == {"rows": [1, 2]}
+    assert a.add("k", "other") is False
+    assert b.add("new", "value") is True
+    assert a.incr("counter") == 1
+    assert b.incr("counter", 5) == 6
+    a.delete("k")
+    assert b.get("k") is None
+    a.set("short", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert b.get("short") is None
+    a.clear()
+    assert b.get("new") is None
+
+
+def test_incr_without_ttl_keeps_the_counter_expiry(backend_pair):
+    a, b = backend_pair
+    assert a.incr("slots", 1, ttl=0.1) == 1
+    assert b.incr("slots", 1, ttl=0.1) == 2
+    # A refund passes no ttl and must not make the counter permanent.
+    assert a.incr("slots", -1) == 1
+    time.sleep(0.2)
+    assert b.get("slots") is None
+    assert a.incr("slots", 1, ttl=0.1) == 1
+
+
+def test_values_round_trip_without_pickle(backend_pair):
+    a, b = backend_pair
+    row = {
+        "DateTimeInitiated": datetime(2026, 3, 1, 9, 30, 15, 250000),
+        "AuthorityDate": date(2026, 2, 1),
+        "Aware": datetime(2026, 3, 1, tzinfo=timezone.utc),
+        "Price": Decimal("12.5000"),
+        "VettedQty": 40.5,
+        "Flag": True,
+        "Missing": None,
+    }
+    a.set("segment", [datetime(2026, 4, 1), [row]])
+    assert b.get("segment") == [datetime(2026, 4, 1), [row]]
+
+
+class _Exploit:
+    def __reduce__(self):
+        return (pytest.fail, ("pickle payload was executed",))
+
+
+def test_shared_backends_never_unpickle(tmp_path, resp_server):
+    path = str(tmp_path / "cache.bin")
+    shm = SharedMemoryBackend(path, slots=64, slot_size=1024)
+    payload = pickle.dumps(("k", _Exploit()))
+    key_hash = shm._hash("k")
+    index = key_hash % shm.slots
+    shm._HEADER.pack_into(shm._map, index * shm.slot_size, key_hash, 0.0, len(payload))
+    start = index * shm.slot_size + shm._HEADER.size
+    shm._map[start:start + len(payload)] = payload
+    assert shm.get("k") is None
+
+    host, port = resp_server.server_address
+    redis = RedisBackend(host, port)
+    redis.execute("SET", redis.prefix + "k", pickle.dumps(_Exploit()))
+    assert redis.get("k") is None
+
+
+def test_invalidation_is_shared_between_workers(backend_pair):
+    worker1, worker2 = (WOSCache(backend) for backend in backend_pair)
+    version = worker1.version(7)
+    assert worker2.version(7) == version
+    assert worker1.get_or_load("wosmaster", 7, version, lambda: "v1") == "v1"
+    assert worker2.get_or_load("wosmaster", 7, version, lambda: "unused") == "v1"
+
+    worker2.bump(7)
+    new_version = worker1.version(7)
+    assert new_version != version
+    assert worker1.get_or_load("wosmaster", 7, new_version, lambda: "v2") == "v2"
+
+
+def test_lost_version_counter_never_repeats():
+    backend = MemoryBackend(max_entries=64)
+    cache = WOSCache(backend)
+    first = cache.version(3)
+    cache.bump(3)
+    backend.clear()
+    assert cache.version(3) > first + 1
+
+
+def test_shm_skips_values_larger_than_a_slot(tmp_path):
+    backend = SharedMemoryBackend(str(tmp_path / "cache.bin"), slots=4, slot_size=128)
+    backend.set("big", "x" * 1000)
+    assert backend.get("big") is None
+
+
+def test_redis_backend_unavailable_degrades_to_uncached():
+    cache = WOSCache(RedisBackend("127.0.0.1", 1, timeout=0.1))
+    assert cache.version(1) is None
+    assert cache.get_or_load("wosmaster", 1, None, lambda: "live") == "live"
+    cache.bump(1)
+    with pytest.raises(CacheBackendError):
+        cache.backend.get("k")
+
+
+def test_create_backend_from_url(tmp_path):
+    assert isinstance(create_backend("memory://"), MemoryBackend)
+    assert isinstance(create_backend(f"shm://{tmp_path}/c.bin?slots=8&slot_size=256"), SharedMemoryBackend)
+    redis = create_backend("redis://cache.local:6380/2")
+    assert (redis.host, redis.port, redis.db) == ("cache.local", 6380, 2)
+    with pytest.raises(ValueError):
+        create_backend("ftp://x")
+
+
+def test_cached_async_keeps_shared_backends_off_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+
+    class RecordingBackend(SharedMemoryBackend):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value, ttl=None):
+            threads.append(threading.get_ident())
+            super().set(key, value, ttl)
+
+    monkeypatch.setattr(cache, "backend", RecordingBackend(str(tmp_path / "cache.bin"), slots=64, slot_size=1024))
+
+    async def load():
+        return ["WOSType"]
+
+    async def run():
+        loop_thread = threading.get_ident()
+        assert await cache.cached_async("codetable:WOSType", load) == ["WOSType"]
+        assert await cache.cached_async("codetable:WOSType", load) == ["WOSType"]
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 3 and loop_thread not in threads
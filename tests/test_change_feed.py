@@ -0,0 +1,130 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import local_models
+import models
+from main import app
+from database import get_db, get_local_db
+from services.change_feed_service import encode_token, decode_token, purge_change_log
+from repositories import record_line_changes
+from exceptions import BadRequestError
+
+
+def memory_sessionmaker(metadata):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    MainSession = memory_sessionmaker(models.Base.metadata)
+    LocalSession = memory_sessionmaker(database.LocalBase.metadata)
+    monkeypatch.setattr(database, "_LocalSessionLocal", LocalSession)
+
+    def override_db():
+        db = MainSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def override_local_db():
+        db = LocalSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_local_db] = override_local_db
+    yield MainSession, LocalSession
+    app.dependency_overrides.clear()
+
+
+def add_wos(db, serial, initiated, lines=2):
+    db.add(models.WOSMaster(
+        WOSSerial=serial, CustomerCode="C001", WOSType="TYP",
+        InitiatedBy="user1", DateTimeInitiated=initiated,
+    ))
+    for n in range(1, lines + 1):
+        db.add(models.WOSLine(
+            WOSSerial=serial, WOSLineSerial=n, ItemCode=f"ITEM{n}", ItemDesc="Item",
+            ItemDeno="EA", SOS="SOS", AuthorisedQty=100.0, AuthorityRef="REF",
+            AuthorityDate=initiated, Justification="J",
+        ))
+    db.commit()
+
+
+def test_token_round_trip_and_validation():
+    watermark = datetime(2026, 3, 1, 10, 30)
+    assert decode_token(encode_token(watermark, 42)) == (watermark, 42)
+    assert decode_token(None) == (None, 0)
+    with pytest.raises(BadRequestError):
+        decode_token("not-a-token")
+
+
+def test_wosmaster_feed_returns_only_changed_rows(client, sessions):
+    MainSession, _ = sessions
+    db = MainSession()
+    add_wos(db, 1, datetime(2026, 1, 1))
+    add_wos(db, 2, datetime(2026, 2, 1))
+
+    snapshot = client.get("/wosmaster/changes").json()
+    assert {m["WOSSerial"] for m in snapshot["changes"]} == {1, 2}
+
+    master = db.get(models.WOSMaster, 1)
+    master.DateTimeApproved = datetime(2026, 3, 1)
+    db.commit()
+    add_wos(db, 3, datetime(2026, 2, 15))
+
+    delta = client.get("/wosmaster/changes", params={"since": snapshot["next"]}).json()
+    # WOS 2 sits on the previous watermark and is repeated; WOS 1 was approved; WOS 3 is new.
+    assert {m["WOSSerial"] for m in delta["changes"]} == {1, 2, 3}
+
+    quiet = client.get("/wosmaster/changes", params={"since": delta["next"]}).json()
+    assert {m["WOSSerial"] for m in quiet["changes"]} == {1}
+    db.close()
+
+
+def test_wosline_feed_includes_vetting_writes(client, sessions):
+    MainSession, _ = sessions
+    db = MainSession()
+    add_wos(db, 1, datetime(2026, 1, 1))
+    add_wos(db, 2, datetime(2026, 2, 1))
+    db.close()
+
+    snapshot = client.get("/wosline/changes").json()
+    assert len(snapshot["changes"]) == 4
+
+    response = client.put("/wosline/1/2", json={"VettedQty": 30.0})
+    assert response.status_code == 200
+
+    delta = client.get("/wosline/changes", params={"since": snapshot["next"]}).json()
+    keys = {(l["WOSSerial"], l["WOSLineSerial"]) for l in delta["changes"]}
+    # WOS 2 lines repeat because WOS 2 sits on the watermark; line (1, 2) comes from the log.
+    assert keys == {(1, 2), (2, 1), (2, 2)}
+    vetted = [l for l in delta["changes"] if (l["WOSSerial"], l["WOSLineSerial"]) == (1, 2)][0]
+    assert vetted["VettedQty"] == 30.0
+
+    quiet = client.get("/wosline/changes", params={"since": delta["next"]}).json()
+    assert {(l["WOSSerial"], l["WOSLineSerial"]) for l in quiet["changes"]} == {(2, 1), (2, 2)}
+
+
+def test_expired_token_returns_gone(client, sessions):
+    _, LocalSession = sessions
+    local_db = LocalSession()
+    old = datetime.now() - timedelta(days=365)
+    for serial in range(1, 4):
+        record_line_changes(local_db, [{"WOSSerial": serial, "WOSLineSerial": 1}], old)
+    local_db.close()
+
+    assert purge_change_log() == 2
+    response = client.get("/wosline/changes", params={"since": encode_token(None, 0)})
+    assert response.status_code == 410
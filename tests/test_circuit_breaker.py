@@ -0,0 +1,123 @@
+import sqlite3
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+import circuit_breaker
+import database
+import metrics
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from exceptions import CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_after_threshold_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=10, clock=clock)
+    for _ in range(2):
+        breaker.acquire()
+        breaker.record_failure(RuntimeError("connect failed"))
+    assert breaker.state == CLOSED
+    breaker.acquire()
+    breaker.record_failure(RuntimeError("connect failed"))
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.acquire()
+    assert exc_info.value.retry_after == 10
+
+    clock.now += 10
+    assert breaker.state == HALF_OPEN
+    breaker.acquire()  # the single probe
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["consecutive_failures"] == 0
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=5, clock=clock)
+    breaker.record_failure()
+    clock.now += 5
+    breaker.acquire()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["retry_after_seconds"] == 5
+
+
+@pytest.fixture
+def guarded_engine():
+    """SQLite engine guarded by a breaker; setting `down` makes connects fail."""
+    engine = create_engine("sqlite://")
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60, clock=FakeClock())
+    circuit_breaker.attach(engine, breaker)
+    state = {"down": False}
+
+    @event.listens_for(engine, "do_connect")
+    def fail_when_down(dialect, conn_rec, cargs, cparams):
+        if state["down"]:
+            raise sqlite3.OperationalError("unable to connect")
+
+    yield engine, breaker, state
+    engine.dispose()
+
+
+def test_engine_fails_fast_once_open(guarded_engine):
+    engine, breaker, state = guarded_engine
+    state["down"] = True
+    for _ in range(2):
+        with pytest.raises(OperationalError):
+            engine.connect()
+    assert breaker.state == OPEN
+
+    before = metrics.value("db_breaker_rejected_total", breaker="test")
+    with pytest.raises(CircuitOpenError):
+        engine.connect()
+    assert metrics.value("db_breaker_rejected_total", breaker="test") == before + 1
+
+
+def test_query_errors_do_not_trip_breaker(guarded_engine):
+    engine, breaker, _ = guarded_engine
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert breaker.state == CLOSED
+
+
+def test_open_breaker_returns_503(client, monkeypatch):
+    from main import app
+    from database import get_db
+
+    breaker = CircuitBreaker("sybase", failure_threshold=1, reset_seconds=30, clock=FakeClock())
+    breaker.record_failure(RuntimeError("Login timeout expired"))
+    monkeypatch.setattr(database, "main_breaker", breaker)
+
+    class OpenSession:
+        def execute(self, *args, **kwargs):
+            breaker.acquire()
+
+        query = execute
+
+    app.dependency_overrides[get_db] = lambda: OpenSession()
+    try:
+        response = client.get("/db-check")
+        assert response.status_code == 503
+        assert response.json()["breaker"]["state"] == "open"
+        assert response.json()["breaker"]["last_error"] == "Login timeout expired"
+
+        response = client.get("/wosline/1/1")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "30"
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import deadlines
+from coalescing import SingleFlight, request_key
+from deadlines import Deadline
+from exceptions import DeadlineExceededError
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+    started = threading.Barrier(5)
+
+    def load():
+        calls.append(1)
+        release.wait(timeout=5)
+        return ["row"]
+
+    def worker():
+        started.wait(timeout=5)
+        results.append(flight.do(("wosmaster", ("customer_code", "C001")), load))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [["row"]] * 5
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_and_key_is_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: 42) == 42
+
+
+def test_request_key_ignores_unset_params_and_order():
+    a = request_key("wosmaster", customer_code="C001", from_date=None, to_date=datetime(2026, 1, 1))
+    b = request_key("wosmaster", to_date=datetime(2026, 1, 1), customer_code="C001")
+    assert a == b
+    assert request_key("wosline", wos_serial=1) != request_key("wosline", wos_serial=2)
+
+
+def _run_with_deadline(seconds, fn, out):
+    def target():
+        deadlines._current.set(Deadline(seconds))
+        try:
+            out.append(fn())
+        except Exception as e:
+            out.append(e)
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def test_follower_waits_no_longer_than_its_own_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader_out, follower_out = [], []
+
+    def slow():
+        release.wait(timeout=5)
+        return "rows"
+
+    leader = _run_with_deadline(10, lambda: flight.do("k", slow), leader_out)
+    time.sleep(0.05)
+    started = time.monotonic()
+    follower = _run_with_deadline(0.1, lambda: flight.do("k", slow), follower_out)
+    follower.join(timeout=5)
+    assert time.monotonic() - started < 2
+    assert isinstance(follower_out[0], DeadlineExceededError)
+    release.set()
+    leader.join(timeout=5)
+    assert leader_out == ["rows"]
+
+
+def test_follower_retries_when_the_leader_ran_out_of_time():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    leader_out, follower_out = [], []
+
+    def load():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(timeout=5)
+            raise DeadlineExceededError("Request exceeded its 1s deadline")
+        return "rows"
+
+    leader = _run_with_deadline(10, lambda: flight.do("k", load), leader_out)
+    time.sleep(0.05)
+    follower = _run_with_deadline(10, lambda: flight.do("k", load), follower_out)
+    time.sleep(0.05)
+    release.set()
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+    assert isinstance(leader_out[0], DeadlineExceededError)
+    assert follower_out == ["rows"]
+    assert len(calls) == 2
@@ -0,0 +1,85 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, choose_encoding
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, exclude_paths=("/login",))
+
+    @app.get("/big")
+    def big():
+        return JSONResponse([{"AuthorityRef": "REF-0001", "Justification": "x" * 50}] * 200)
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.post("/login")
+    def login():
+        return JSONResponse({"access_token": "t" * 500})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b"line %d\n" % i * 20 for i in range(50)), media_type="text/plain")
+
+    return app
+
+
+@pytest.fixture
+def raw_client():
+    with TestClient(make_app()) as c:
+        yield c
+
+
+def test_choose_encoding_respects_q_values():
+    supported = ["zstd", "br", "gzip"]
+    assert choose_encoding("gzip, br", supported) == "br"
+    assert choose_encoding("gzip;q=1, br;q=0.5", supported) == "gzip"
+    assert choose_encoding("*", supported) == "zstd"
+    assert choose_encoding("identity", supported) is None
+    assert choose_encoding("gzip;q=0", supported) is None
+    assert choose_encoding("", ["gzip"]) is None
+
+
+def test_large_response_is_gzipped(raw_client):
+    response = raw_client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()[0]["AuthorityRef"] == "REF-0001"
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_small_response_is_not_compressed(raw_client):
+    response = raw_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"ok": True}
+
+
+def test_auth_path_is_excluded(raw_client):
+    response = raw_client.post("/login", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_incrementally(raw_client):
+    with raw_client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    body = gzip.decompress(raw)
+    assert body.startswith(b"line 0\n")
+    assert body.count(b"\n") == 50 * 20
+
+
+def test_zstd_when_available(raw_client):
+    zstandard = pytest.importorskip("zstandard")
+    with raw_client.stream("GET", "/big", headers={"Accept-Encoding": "zstd"}) as response:
+        assert response.headers["content-encoding"] == "zstd"
+        raw = b"".join(response.iter_raw())
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(raw).startswith(b"[{")
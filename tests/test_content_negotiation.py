@@ -0,0 +1,87 @@
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import msgpack
+import pyarrow
+import pyarrow.ipc
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+
+import models
+from main import app
+from database import get_db
+from content_negotiation import choose_media_type, ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE
+
+
+@pytest.fixture(autouse=True)
+def mock_db_dependency():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield mock_db
+    app.dependency_overrides.clear()
+
+
+def make_line(line_serial):
+    return models.WOSLine(
+        WOSSerial=101,
+        WOSLineSerial=line_serial,
+        ItemCode=f"ITEM{line_serial:03d}",
+        ItemDesc="Test Item",
+        ItemDeno="EA",
+        SOS="SOS",
+        AuthorisedQty=100.0,
+        VettedQty=40.5,
+        AuthorityRef="REF001",
+        AuthorityDate=datetime(2023, 1, 1),
+        Justification="Justification",
+        Price=Decimal("12.5000"),
+    )
+
+
+def test_choose_media_type():
+    supported = ["application/json", MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE]
+    assert choose_media_type("", supported) == "application/json"
+    assert choose_media_type("*/*", supported) == "application/json"
+    assert choose_media_type("application/x-msgpack", supported) == MSGPACK_MEDIA_TYPE
+    assert choose_media_type(f"application/json;q=0.5, {ARROW_MEDIA_TYPE}", supported) == ARROW_MEDIA_TYPE
+    assert choose_media_type("text/csv", supported) is None
+
+
+def test_json_remains_default(client, mock_db_dependency):
+    mock_db_dependency.query.return_value.all.return_value = [make_line(1)]
+    response = client.get("/wosline")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()[0]["Price"] == 12.5
+
+
+def test_msgpack_wosline(client, mock_db_dependency):
+    mock_db_dependency.query.return_value.all.return_value = [make_line(1), make_line(2)]
+    response = client.get("/wosline", headers={"Accept": MSGPACK_MEDIA_TYPE})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    payload = msgpack.unpackb(response.content, timestamp=3)
+    row = dict(zip(payload["columns"], payload["rows"][1]))
+    assert row["WOSLineSerial"] == 2
+    assert row["VettedQty"] == 40.5
+    assert row["Price"] == 12.5
+    assert row["AuthorityDate"].replace(tzinfo=None) == datetime(2023, 1, 1)
+
+
+def test_arrow_wosline(client, mock_db_dependency):
+    mock_db_dependency.query.return_value.all.return_value = [make_line(1), make_line(2)]
+    response = client.get("/wosline", headers={"Accept": ARROW_MEDIA_TYPE})
+    assert response.status_code == 200
+    table = pyarrow.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.num_rows == 2
+    assert table.schema.field("AuthorisedQty").type == pyarrow.float64()
+    assert table.column("WOSLineSerial").to_pylist() == [1, 2]
+    assert table.column("Price").to_pylist() == [12.5, 12.5]
+
+
+def test_unacceptable_media_type(client, mock_db_dependency):
+    mock_db_dependency.query.return_value.all.return_value = []
+    response = client.get("/wosline", headers={"Accept": "text/csv"})
+    assert response.status_code == 406
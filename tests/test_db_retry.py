@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import db_retry
+import metrics
+from db_retry import is_retryable, retry_on_deadlock
+from exceptions import DatabaseError
+
+
+class FakeDriverError(Exception):
+    pass
+
+
+def sybase_error(number, sqlstate="40001"):
+    orig = FakeDriverError(
+        sqlstate,
+        f"[{sqlstate}] [SAP][ASE ODBC Driver][Adaptive Server Enterprise]Your server command "
+        f"encountered a deadlock situation. ({number}) (SQLExecDirectW)",
+    )
+    return DatabaseError("Failed to update WOS line", cause=OperationalError("UPDATE", {}, orig))
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(db_retry.time, "sleep", lambda seconds: None)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_recognises_deadlock_and_lock_timeout():
+    assert is_retryable(sybase_error(1205))
+    assert is_retryable(sybase_error(12205, sqlstate="HY000"))
+    assert not is_retryable(DatabaseError("Failed", cause=OperationalError(
+        "UPDATE", {}, FakeDriverError("23000", "[23000] Attempt to insert duplicate key (2601)")
+    )))
+    assert not is_retryable(ValueError("nothing to do with the database"))
+
+
+def test_retries_until_success_and_counts():
+    calls = []
+
+    @retry_on_deadlock("op", attempts=3)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sybase_error(1205)
+        return "done"
+
+    assert flaky() == "done"
+    assert len(calls) == 3
+    assert metrics.value("db_retries_total", operation="op") == 2
+    assert metrics.value("db_retries_exhausted_total", operation="op") == 0
+
+
+def test_gives_up_after_limit():
+    calls = []
+
+    @retry_on_deadlock("op", attempts=2)
+    def always_deadlocks():
+        calls.append(1)
+        raise sybase_error(1205)
+
+    with pytest.raises(DatabaseError):
+        always_deadlocks()
+    assert len(calls) == 2
+    assert metrics.value("db_retries_exhausted_total", operation="op") == 1
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    @retry_on_deadlock("op")
+    def broken():
+        calls.append(1)
+        raise DatabaseError("Failed to update WOS line")
+
+    with pytest.raises(DatabaseError):
+        broken()
+    assert len(calls) == 1
+
+
+def test_backoff_is_bounded(monkeypatch):
+    monkeypatch.setattr(db_retry, "DEADLOCK_RETRY_MAX_DELAY", 0.5)
+    assert all(0 <= db_retry.backoff_delay(n) <= 0.5 for n in range(1, 10))
+
+
+def test_metrics_endpoint(client):
+    metrics.inc("db_retries_total", operation="update_wos_line")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'db_retries_total{operation="update_wos_line"} 1' in response.text
+    assert "# TYPE db_retries_total counter" in response.text
@@ -0,0 +1,82 @@
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import deadlines
+import main
+from main import app
+from database import get_db
+from deadlines import Deadline, budget
+from exceptions import DeadlineExceededError
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    deadlines.attach(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_budget_from_class_and_header():
+    assert budget("reads", None) == deadlines.DEADLINES["reads"]
+    assert budget("reads", "2.5") == 2.5
+    # The header can shorten the route's budget but never extend it.
+    assert budget("heavy", "1000") == deadlines.DEADLINES["heavy"]
+    assert budget("reads", str(deadlines.DEADLINES["reads"] + 1)) == deadlines.DEADLINES["reads"]
+    assert budget("reads", "soon") == deadlines.DEADLINES["reads"]
+    assert budget("reads", "-1") == deadlines.DEADLINES["reads"]
+
+
+def test_cancel_cancels_running_cursors():
+    class FakeCursor:
+        cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    deadline = Deadline(10)
+    cursor = FakeCursor()
+    deadline.register(cursor)
+    deadline.cancel("disconnect")
+    assert cursor.cancelled
+    with pytest.raises(DeadlineExceededError, match="disconnected"):
+        deadline.check()
+
+
+def test_statements_refused_after_deadline(engine):
+    token = deadlines._current.set(Deadline(5))
+    try:
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+            deadlines.current().expires_at = time.monotonic() - 1
+            with pytest.raises(DeadlineExceededError):
+                conn.execute(text("SELECT 1"))
+    finally:
+        deadlines._current.reset(token)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_route_returns_504_when_deadline_passes(client, engine, monkeypatch):
+    Session = sessionmaker(bind=engine)
+
+    def slow_lookup(db, column_name):
+        time.sleep(0.3)
+        db.execute(text("SELECT 1"))
+        return []
+
+    monkeypatch.setattr(main, "svc_get_codetable_data", slow_lookup)
+    app.dependency_overrides[get_db] = lambda: Session()
+    try:
+        response = client.get("/codetable?column_name=X", headers={"X-Request-Timeout": "0.1"})
+        assert response.status_code == 504
+        response = client.get("/codetable?column_name=X")
+        assert response.status_code == 200
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import database
+import models
+from main import app
+from database import get_db
+from services import export_service
+from services.export_service import split_key_range
+
+
+@pytest.fixture
+def main_db(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'wos.db'}", connect_args={"check_same_thread": False}
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    for serial in range(1, 11):
+        db.add(models.WOSMaster(
+            WOSSerial=serial, CustomerCode="C001", WOSType="TYP", InitiatedBy="user1",
+            DateTimeInitiated=datetime(2025 if serial <= 3 else 2026, 1, 1),
+        ))
+        for n in (2, 1):
+            db.add(models.WOSLine(
+                WOSSerial=serial, WOSLineSerial=n, ItemCode=f"ITEM{n}", ItemDesc="Item",
+                ItemDeno="EA", SOS="SOS", AuthorisedQty=10.0, AuthorityRef="REF",
+                AuthorityDate=datetime(2026, 1, 1), Justification="J",
+            ))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(database, "_SessionLocal", Session)
+
+    def override_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    yield engine
+    app.dependency_overrides.clear()
+
+
+def keys(response):
+    return [(row["WOSSerial"], row["WOSLineSerial"]) for row in map(json.loads, response.text.splitlines())]
+
+
+def test_split_key_range():
+    assert split_key_range(1, 10, 3) == [(1, 4), (5, 7), (8, 10)]
+    assert split_key_range(5, 6, 4) == [(5, 5), (6, 6)]
+    assert split_key_range(7, 7, 1) == [(7, 7)]
+
+
+def test_ordered_export_is_in_key_order(client, main_db, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 3)
+    response = client.get("/wosline/export", params={"partitions": 4})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert keys(response) == [(s, n) for s in range(1, 11) for n in (1, 2)]
+
+
+def test_ranges_are_read_concurrently_on_separate_connections(client, main_db):
+    # Each range query waits until all three are running at once.
+    barrier = threading.Barrier(3, timeout=5)
+    connections = set()
+
+    @event.listens_for(main_db, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "ORDER BY" in statement:
+            connections.add(id(conn.connection.dbapi_connection))
+            barrier.wait()
+
+    response = client.get("/wosline/export", params={"partitions": 3})
+    assert len(keys(response)) == 20
+    assert len(connections) == 3
+
+
+def test_unordered_export_returns_every_row(client, main_db):
+    response = client.get("/wosline/export", params={"partitions": 5, "ordered": "false"})
+    assert sorted(keys(response)) == [(s, n) for s in range(1, 11) for n in (1, 2)]
+
+
+def test_export_filters_by_initiated_date(client, main_db):
+    response = client.get("/wosline/export", params={"from_date": "2026-01-01T00:00:00"})
+    assert [k[0] for k in keys(response)] == [s for s in range(4, 11) for _ in (1, 2)]
+    empty = client.get("/wosline/export", params={"to_date": "2020-01-01T00:00:00"})
+    assert empty.status_code == 200 and empty.text == ""
+
+
+def test_stopping_the_stream_releases_readers(main_db, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(export_service, "EXPORT_QUEUE_BATCHES", 1)
+    db = database.get_session_local()()
+    stream = export_service.export_wos_lines(db, partitions=4)
+    assert next(stream).startswith(b"{")
+    stream.close()
+    db.close()
+    deadline = time.monotonic() + 5
+    while main_db.pool.checkedout() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert main_db.pool.checkedout() == 0
+
+
+def test_stalled_consumer_releases_readers(main_db, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(export_service, "EXPORT_QUEUE_BATCHES", 1)
+    monkeypatch.setattr(export_service, "EXPORT_STALL_SECONDS", 0.2)
+    db = database.get_session_local()()
+    stream = export_service.export_wos_lines(db, partitions=4)
+    assert next(stream).startswith(b"{")
+    db.close()
+    # The consumer neither reads nor closes the stream.
+    deadline = time.monotonic() + 5
+    while main_db.pool.checkedout() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert main_db.pool.checkedout() == 0
+    with pytest.raises(TimeoutError):
+        for _ in stream:
+            pass
+
+
+def test_slow_but_steady_consumer_is_not_abandoned(main_db, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 1)
+    monkeypatch.setattr(export_service, "EXPORT_QUEUE_BATCHES", 1)
+    monkeypatch.setattr(export_service, "EXPORT_STALL_SECONDS", 0.3)
+    db = database.get_session_local()()
+    chunks = []
+    # Later ranges wait on full queues for longer than the stall time, while the client
+    # keeps taking batches from the first range.
+    for chunk in export_service.export_wos_lines(db, partitions=4):
+        chunks.append(chunk)
+        time.sleep(0.05)
+    db.close()
+    assert len(chunks) == 20
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+import health
+from health import HealthProbe
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=QueuePool)
+    yield engine
+    engine.dispose()
+
+
+def count_connects(engine):
+    calls = []
+    event.listen(engine, "engine_connect", lambda conn: calls.append(1))
+    return calls
+
+
+def test_readiness_reuses_fresh_probe(engine):
+    clock = FakeClock()
+    probe = HealthProbe(lambda: engine, max_age=10, clock=clock)
+    connects = count_connects(engine)
+
+    probe.refresh()
+    for _ in range(5):
+        ready, details = probe.readiness()
+    assert ready
+    assert len(connects) == 1
+    assert details["database"]["ok"] is True
+    assert details["pool"]["class"] == "QueuePool"
+    assert details["pool"]["checkedout"] == 0
+    assert details["breaker"]["state"] == "closed"
+
+    clock.now += 11
+    probe.readiness()
+    assert len(connects) == 2
+
+
+def test_failed_probe_is_reported():
+    def broken_engine():
+        raise RuntimeError("Login timeout expired")
+
+    probe = HealthProbe(broken_engine, clock=FakeClock())
+    age, result = probe.current()
+    assert result["ok"] is False
+    assert result["error"] == "Login timeout expired"
+
+
+def test_live_never_touches_database(client, monkeypatch):
+    def fail():
+        raise AssertionError("liveness must not use the database")
+
+    monkeypatch.setattr(health.probe, "engine_factory", fail)
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_ready_endpoint(client, engine, monkeypatch):
+    probe = HealthProbe(lambda: engine, clock=FakeClock())
+    monkeypatch.setattr(health, "probe", probe)
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+    probe._result = (probe._clock(), dict(probe._result[1], ok=False, error="down"))
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["database"]["error"] == "down"
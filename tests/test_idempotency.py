@@ -0,0 +1,201 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import database
+import deadlines
+import local_models
+import main
+import schemas
+from main import app
+from database import get_db, get_local_db
+from repositories import claim_idempotency_key
+from services.idempotency_service import (
+    run_idempotent, purge_idempotency_keys, request_fingerprint, scoped_key,
+)
+from deadlines import Deadline
+from exceptions import IdempotencyKeyInProgressError
+
+
+@pytest.fixture
+def local_session(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    database.LocalBase.metadata.create_all(bind=engine)
+    LocalSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(database, "_LocalSessionLocal", LocalSession)
+
+    def override_local_db():
+        db = LocalSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_local_db] = override_local_db
+    yield LocalSession
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def fake_batch(monkeypatch):
+    calls = []
+
+    def batch(db, lines):
+        calls.append(lines)
+        return {"updated": len(lines), "failed": 0, "results": [
+            {"WOSSerial": l["WOSSerial"], "WOSLineSerial": l["WOSLineSerial"], "status": "updated"}
+            for l in lines
+        ]}
+
+    monkeypatch.setattr(main, "svc_batch_update_wos_lines", batch)
+    return calls
+
+
+BODY = {"Lines": [{"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 5}]}
+
+
+def test_replay_returns_stored_response_without_rerunning(client, local_session, fake_batch):
+    headers = {"Idempotency-Key": "abc-1"}
+    first = client.put("/wosline-batch", json=BODY, headers=headers)
+    second = client.put("/wosline-batch", json=BODY, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert "idempotent-replayed" not in first.headers
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(fake_batch) == 1
+
+
+def test_requests_without_key_always_run(client, local_session, fake_batch):
+    client.put("/wosline-batch", json=BODY)
+    client.put("/wosline-batch", json=BODY)
+    assert len(fake_batch) == 2
+
+
+def test_key_reused_with_different_body_is_rejected(client, local_session, fake_batch):
+    headers = {"Idempotency-Key": "abc-2"}
+    client.put("/wosline-batch", json=BODY, headers=headers)
+    other = {"Lines": [{"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 6}]}
+    response = client.put("/wosline-batch", json=other, headers=headers)
+    assert response.status_code == 422
+    assert len(fake_batch) == 1
+
+
+def test_failed_request_releases_key(local_session):
+    db = local_session()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run_idempotent(db, "user:u1", "k", "fp", fail)
+    assert run_idempotent(db, "user:u1", "k", "fp", lambda: (200, {"ok": True})) == (200, {"ok": True}, False)
+    db.close()
+
+
+def test_duplicate_of_running_request_waits_for_its_response(local_session):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = {}
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 200, {"n": len(calls)}
+
+    def worker(name):
+        db = local_session()
+        try:
+            results[name] = run_idempotent(db, "user:u1", "dup", "fp", slow)
+        finally:
+            db.close()
+
+    original = threading.Thread(target=worker, args=("original",))
+    original.start()
+    assert started.wait(5)
+    duplicate = threading.Thread(target=worker, args=("duplicate",))
+    duplicate.start()
+    duplicate.join(0.3)
+    assert duplicate.is_alive()
+    release.set()
+    original.join(5)
+    duplicate.join(5)
+
+    assert len(calls) == 1
+    assert results == {"original": (200, {"n": 1}, False), "duplicate": (200, {"n": 1}, True)}
+
+
+def test_duplicate_gives_up_at_its_deadline(local_session):
+    db = local_session()
+    claim_idempotency_key(
+        db, scoped_key("user:u1", "slow"), "fp", datetime.now() + timedelta(minutes=5)
+    )
+    token = deadlines._current.set(Deadline(0.2))
+    try:
+        with pytest.raises(IdempotencyKeyInProgressError):
+            run_idempotent(db, "user:u1", "slow", "fp", lambda: (200, {}))
+    finally:
+        deadlines._current.reset(token)
+        db.close()
+
+
+def test_response_is_returned_when_it_cannot_be_stored(local_session, monkeypatch):
+    from exceptions import DatabaseError
+    from services import idempotency_service
+
+    def fail(*args):
+        raise DatabaseError("Failed to store idempotent response")
+
+    monkeypatch.setattr(idempotency_service, "complete_idempotency_key", fail)
+    db = local_session()
+    assert run_idempotent(db, "user:u1", "k", "fp", lambda: (200, {"ok": True})) == (200, {"ok": True}, False)
+    db.close()
+
+
+def test_in_progress_key_returns_409_with_retry_after(client, local_session, fake_batch):
+    db = local_session()
+    db.add(local_models.IdempotencyKey(
+        key=scoped_key("ip:testclient", "busy"), created_at=datetime.now(),
+        fingerprint=request_fingerprint(
+            "PUT", "/wosline-batch", schemas.WOSLinesBatchUpdate(**BODY).model_dump(mode="json")
+        ),
+        expires_at=datetime.now() + timedelta(minutes=5),
+    ))
+    db.commit()
+    db.close()
+    response = client.put(
+        "/wosline-batch", json=BODY, headers={"Idempotency-Key": "busy", "X-Request-Timeout": "0.3"}
+    )
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "1"
+    assert fake_batch == []
+
+
+def test_keys_are_scoped_to_the_caller(client, local_session, fake_batch):
+    for user in ("auditor1", "auditor2"):
+        token = auth.create_access_token(data={"sub": user})
+        response = client.put("/wosline-batch", json=BODY, headers={
+            "Idempotency-Key": "shared", "Authorization": f"Bearer {token}",
+        })
+        assert response.status_code == 200
+        assert "idempotent-replayed" not in response.headers
+    assert len(fake_batch) == 2
+
+
+def test_expired_keys_are_purged(local_session):
+    db = local_session()
+    db.add(local_models.IdempotencyKey(
+        key="old", fingerprint="fp", status_code=200, response=b"",
+        created_at=datetime.now() - timedelta(days=2), expires_at=datetime.now() - timedelta(days=1),
+    ))
+    db.commit()
+    assert purge_idempotency_keys() == 1
+    db.close()
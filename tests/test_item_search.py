@@ -0,0 +1,228 @@
+import random
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from services import item_search_service
+from services.item_search_service import ItemIndex
+
+CODES = ["BOLT10", "BOLT12", "BOLT", "NUT8", "WASHER4", "W10"]
+WORDS = ["hex", "bolt", "steel", "washer", "spring", "nut", "brass", "m10", "zinc"]
+
+
+def memory_sessionmaker(metadata):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def add_wos(db, serial, initiated, items):
+    db.add(models.WOSMaster(
+        WOSSerial=serial, CustomerCode="C001", WOSType="TYP", InitiatedBy="user1",
+        DateTimeInitiated=initiated,
+    ))
+    for n, (code, desc) in enumerate(items, start=1):
+        db.add(models.WOSLine(
+            WOSSerial=serial, WOSLineSerial=n, ItemCode=code, ItemDesc=desc, ItemDeno="EA",
+            SOS="S1", AuthorisedQty=1.0, AuthorityRef="REF", AuthorityDate=initiated,
+            Justification="J",
+        ))
+
+
+@pytest.fixture
+def session():
+    Session = memory_sessionmaker(models.Base.metadata)
+    rng = random.Random(3)
+    db = Session()
+    for serial in range(1, 61):
+        items = [
+            (rng.choice(CODES), " ".join(rng.sample(WORDS, rng.randint(1, 3))).title())
+            for _ in range(rng.randint(1, 4))
+        ]
+        add_wos(db, serial, datetime(2026, 1, 1 + serial % 28), items)
+    db.commit()
+    db.close()
+    return Session
+
+
+def refresh(index, Session, **kwargs):
+    db = Session()
+    try:
+        return index.refresh(db, **kwargs)
+    finally:
+        db.close()
+
+
+def all_lines(Session):
+    db = Session()
+    try:
+        return [(line.WOSSerial, line.WOSLineSerial, line.ItemCode, line.ItemDesc)
+                for line in db.query(models.WOSLine)]
+    finally:
+        db.close()
+
+
+def keys(result):
+    return {(hit["WOSSerial"], hit["WOSLineSerial"]) for hit in result["results"]}
+
+
+@pytest.fixture
+def enabled(monkeypatch, session):
+    index = ItemIndex()
+    refresh(index, session)
+    monkeypatch.setattr(item_search_service, "index", index)
+    monkeypatch.setattr(item_search_service, "ITEM_SEARCH_ENABLED", True)
+    return index
+
+
+def test_code_prefix_matches_brute_force_in_rank_order(session):
+    index = ItemIndex()
+    refresh(index, session)
+    expected = [(w, l) for w, l, code, _ in all_lines(session) if code.startswith("BOLT")]
+    result = index.search("bolt", field="code", limit=1000)
+    assert result["total"] == len(expected)
+    assert keys(result) == set(expected)
+    codes = [hit["ItemCode"] for hit in result["results"]]
+    assert codes[:codes.count("BOLT")] == ["BOLT"] * codes.count("BOLT")
+    assert codes == ["BOLT"] * codes.count("BOLT") + sorted(c for c in codes if c != "BOLT")
+
+    pages = [index.search("bolt", field="code", offset=offset, limit=7)["results"]
+             for offset in range(0, len(expected), 7)]
+    assert [hit for page in pages for hit in page] == result["results"]
+    assert index.search("XYZ", field="code")["total"] == 0
+
+
+def test_desc_terms_match_words_prefixes_and_substrings(session):
+    index = ItemIndex()
+    refresh(index, session)
+    lines = all_lines(session)
+
+    def words(desc):
+        return desc.lower().split()
+
+    result = index.search("hex ste", field="desc", limit=1000)
+    expected = {(w, l) for w, l, _, desc in lines
+                if "hex" in words(desc) and any(word.startswith("ste") for word in words(desc))}
+    assert keys(result) == expected and result["total"] == len(expected)
+
+    result = index.search("ash", field="desc", limit=1000)
+    assert keys(result) == {(w, l) for w, l, _, desc in lines if "washer" in words(desc)}
+    assert all(hit["score"] == 1 for hit in result["results"])
+
+    # Whole words outrank prefixes of longer words.
+    result = index.search("m10", field="desc", limit=1000)
+    assert result["results"][0]["score"] == 3
+    assert index.search("qq", field="desc")["total"] == 0
+
+
+def test_all_fields_rank_code_and_desc_matches_above_either():
+    index = ItemIndex()
+    index._apply([
+        (1, 1, "WASHER4", "Spring Washer", datetime(2026, 1, 1), None),
+        (1, 2, "WASHER4", "Flat Ring", datetime(2026, 1, 1), None),
+        (1, 3, "NUT8", "Washer Nut", datetime(2026, 1, 1), None),
+        (1, 4, "NUT8", "Hex Nut", datetime(2026, 1, 1), None),
+    ])
+    index.as_of = datetime.now()
+    result = index.search("washer")
+    assert [(hit["WOSLineSerial"], hit["score"]) for hit in result["results"]] == [
+        (1, 5 + 3), (2, 5), (3, 3),
+    ]
+    assert result["total"] == 3
+
+
+def test_all_fields_pages_match_merged_code_and_desc_results(session):
+    index = ItemIndex()
+    refresh(index, session)
+    for query in ("b", "bolt", "w", "nut8", "washer", "hex"):
+        merged = {}
+        for field in ("code", "desc"):
+            for hit in index.search(query, field=field, limit=1000)["results"]:
+                key = (hit["WOSSerial"], hit["WOSLineSerial"])
+                merged[key] = merged.get(key, 0) + hit["score"]
+        ranked = sorted(merged.items(), key=lambda item: (
+            -item[1], index._lines[item[0][0] << 32 | item[0][1]][0], item[0]))
+        for offset, limit in ((0, 5), (3, 7), (0, 1000)):
+            result = index.search(query, offset=offset, limit=limit)
+            assert result["total"] == len(merged)
+            assert [((hit["WOSSerial"], hit["WOSLineSerial"]), hit["score"])
+                    for hit in result["results"]] == ranked[offset:offset + limit]
+
+
+def test_all_fields_short_query_stops_after_the_page(monkeypatch):
+    index = ItemIndex()
+    index._apply([(n, 1, f"B{n:04d}", "Part", datetime(2026, 1, 1), None) for n in range(1, 1001)])
+    index.as_of = datetime.now()
+    visited = []
+    code_matches = index._code_matches
+
+    def counting(prefix):
+        for match in code_matches(prefix):
+            visited.append(match)
+            yield match
+
+    monkeypatch.setattr(index, "_code_matches", counting)
+    result = index.search("b", offset=10, limit=5)
+    assert result["total"] == 1000
+    assert [hit["ItemCode"] for hit in result["results"]] == [f"B{n:04d}" for n in range(11, 16)]
+    assert len(visited) == 15
+
+
+def test_refresh_indexes_new_lines_and_rebuilds(session):
+    index = ItemIndex()
+    loaded = refresh(index, session)
+    db = session()
+    add_wos(db, 100, datetime(2026, 3, 1), [("GASKET9", "Rubber Gasket")])
+    line = db.get(models.WOSLine, (1, 1))
+    line.ItemDesc = "Copper Rivet"
+    db.commit()
+    db.close()
+
+    assert refresh(index, session) < loaded
+    assert keys(index.search("gask")) == {(100, 1)}
+    assert index.search("rivet", field="desc")["total"] == 0  # older line, not re-read
+
+    refresh(index, session, rebuild_seconds=0)
+    assert keys(index.search("rivet", field="desc")) == {(1, 1)}
+    assert index.size == loaded + 1
+
+
+def test_changed_lines_are_reindexed_in_place():
+    index = ItemIndex()
+    index._apply([(1, 1, "ABC1", "Blue Widget", datetime(2026, 1, 1), None)])
+    index._apply([(1, 1, "XYZ1", "Red Widget", datetime(2026, 1, 1), None)])
+    index.as_of = datetime.now()
+    assert index.search("ABC", field="code")["total"] == 0
+    assert index.search("blue", field="desc")["total"] == 0
+    assert index.search("XY", field="code")["total"] == 1
+    assert "blue" not in index._postings and not index._root.children.get("A")
+
+
+def test_memory_is_bounded_by_max_lines(session):
+    index = ItemIndex(max_lines=10)
+    refresh(index, session)
+    assert index.size == 10
+    assert index.search("b")["truncated"] is True
+
+
+def test_search_route(client, enabled):
+    response = client.get("/wosline/search", params={"q": "bolt", "limit": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["results"]) == 5 and body["total"] > 5
+    assert set(body["results"][0]) == {"WOSSerial", "WOSLineSerial", "ItemCode", "ItemDesc", "score"}
+    assert client.get("/wosline/search", params={"q": "bolt", "field": "sku"}).status_code == 400
+    assert client.get("/wosline/search", params={"q": " "}).status_code == 400
+
+
+def test_search_route_before_load_and_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(item_search_service, "index", ItemIndex())
+    monkeypatch.setattr(item_search_service, "ITEM_SEARCH_ENABLED", True)
+    assert client.get("/wosline/search", params={"q": "bolt"}).status_code == 503
+    monkeypatch.setattr(item_search_service, "ITEM_SEARCH_ENABLED", False)
+    assert client.get("/wosline/search", params={"q": "bolt"}).status_code == 404
@@ -99,7 +99,10 @@ def test_db_check_with_valid_token(client, mock_db_dependency):
         headers={"Authorization": f"Bearer {token}"}
     )
     assert response.status_code == 200
-    assert response.json() == {"status": "ok", "result": 1}
+    body = response.json()
+    assert body["status"] == "ok"
+    assert body["result"] == 1
+    assert body["breaker"]["state"] == "closed"
 
 def test_test_endpoint_no_auth_required(client, mock_db_dependency):
     """
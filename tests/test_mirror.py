@@ -0,0 +1,195 @@
+import time
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+import health
+import models
+import read_routing
+import vetting_events
+from main import app
+from database import get_db
+from repositories import get_mirror_state
+from services.mirror_service import MirrorSync, init_mirror, sync_mirror
+
+
+@pytest.fixture
+def main_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wos.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    db.add(models.CodeTable(ColumnName="WOSType", CodeValue="TYP", Description="Type"))
+    for serial in (1, 2):
+        db.add(models.WOSMaster(
+            WOSSerial=serial, CustomerCode="C001", WOSType="TYP", InitiatedBy="user1",
+            DateTimeInitiated=datetime(2026, 1, serial),
+        ))
+        db.add(models.WOSLine(
+            WOSSerial=serial, WOSLineSerial=1, ItemCode="ITEM1", ItemDesc="Item",
+            ItemDeno="EA", SOS="SOS", AuthorisedQty=10.0, AuthorityRef="REF",
+            AuthorityDate=datetime(2026, 1, 1), Justification="J",
+        ))
+    db.add(models.Correspondence(
+        LineNo=1, TableName="WOSMaster", PrimaryKeyValue="1", RoleName="LOGO",
+        CorrespondenceBy="u1", CorrespondenceToRole="NLAO",
+        DateTimeCorrespondence=datetime(2026, 1, 1), CorrespondenceType="Fwded", StationCode="K",
+        Document=b"pdf",
+    ))
+    db.commit()
+    db.close()
+
+    def override_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_db
+    yield Session
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'mirror.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setattr(database, "_mirror_engine", engine)
+    monkeypatch.setattr(database, "_MirrorSessionLocal", sessionmaker(
+        autocommit=False, autoflush=False, bind=engine, info={"source": "mirror"}
+    ))
+    init_mirror()
+    return database.get_mirror_session_local()
+
+
+def sync(main_session, mirror):
+    db, local_db, mirror_db = main_session(), database.get_local_session_local()(), mirror()
+    try:
+        return sync_mirror(db, local_db, mirror_db)
+    finally:
+        db.close()
+        local_db.close()
+        mirror_db.close()
+
+
+@pytest.fixture
+def degraded(monkeypatch):
+    monkeypatch.setattr(read_routing, "primary_degraded", lambda: True)
+
+
+def test_sync_copies_tables_then_resumes(main_session, mirror):
+    counts = sync(main_session, mirror)
+    assert counts == {"WOSMaster": 2, "WOSLine": 2, "Correspondence": 1, "CodeTable": 1}
+    mirror_db = mirror()
+    assert mirror_db.get(models.WOSMaster, 2).CustomerCode == "C001"
+    assert mirror_db.query(models.Correspondence).one().Document is None
+    mirror_db.close()
+
+    db = main_session()
+    db.get(models.WOSMaster, 1).DateTimeApproved = datetime(2026, 2, 1)
+    db.get(models.WOSMaster, 1).ApprovedBy = "boss"
+    db.commit()
+    db.close()
+
+    sync(main_session, mirror)
+    mirror_db = mirror()
+    assert mirror_db.get(models.WOSMaster, 1).ApprovedBy == "boss"
+    assert get_mirror_state(mirror_db).synced_at is not None
+    mirror_db.close()
+
+
+def test_vetting_writes_are_written_through(main_session, mirror):
+    sync(main_session, mirror)
+    vetting_events.publish(1, [{
+        "WOSSerial": 1, "WOSLineSerial": 1, "AuthorisedQty": 10.0,
+        "PreviousVettedQty": None, "VettedQty": 4.0,
+    }])
+    mirror_db = mirror()
+    assert mirror_db.get(models.WOSLine, (1, 1)).VettedQty == 4.0
+    mirror_db.close()
+
+
+def test_degraded_reads_are_served_from_the_mirror(client, main_session, mirror, degraded):
+    sync(main_session, mirror)
+    db = main_session()
+    db.get(models.WOSMaster, 1).Remarks = "not yet mirrored"
+    db.commit()
+    db.close()
+
+    response = client.get("/wosmaster/1")
+    assert response.status_code == 200
+    assert response.json()["Remarks"] is None
+    assert response.headers["X-Data-Source"] == "mirror"
+    assert int(response.headers["X-Data-Staleness"]) >= 0
+    assert "ETag" not in response.headers
+
+    lines = client.get("/wosline", params={"wos_serial": 1})
+    assert [line["WOSLineSerial"] for line in lines.json()] == [1]
+    assert lines.headers["X-Data-Source"] == "mirror"
+    assert client.get("/codetable", params={"column_name": "WOSType"}).json()[0]["Description"] == "Type"
+    assert client.get("/correspondence/1").json()[0]["LineNo"] == 1
+
+
+def test_correspondence_is_synced_from_every_station_partition(
+    client, main_session, mirror, degraded, tmp_path, monkeypatch
+):
+    north_engine = create_engine(f"sqlite:///{tmp_path / 'north.db'}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=north_engine, tables=[models.Correspondence.__table__])
+    North = sessionmaker(autocommit=False, autoflush=False, bind=north_engine)
+    db = North()
+    db.add(models.Correspondence(
+        LineNo=2, TableName="WOSMaster", PrimaryKeyValue="1", RoleName="LOGO",
+        CorrespondenceBy="u2", CorrespondenceToRole="NLAO",
+        DateTimeCorrespondence=datetime(2026, 1, 2), CorrespondenceType="Fwded", StationCode="K",
+    ))
+    db.commit()
+    db.close()
+    north = ("sybase-north", "5000", "auditdb")
+    monkeypatch.setattr(database, "_station_shards", {"K": north})
+    monkeypatch.setattr(database, "_StationSessionLocals", {north: North})
+
+    # Station K lives on the north server; the main server's K row is stale and not copied.
+    assert sync(main_session, mirror)["Correspondence"] == 1
+    assert [c["LineNo"] for c in client.get("/correspondence/1").json()] == [2]
+
+
+def test_only_one_worker_syncs_a_mirror_file(mirror):
+    first, second = MirrorSync(), MirrorSync()
+    try:
+        assert first.owns_mirror()
+        assert second.owns_mirror() is False
+        first.stop()
+        assert second.owns_mirror()
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_primary_is_used_until_the_mirror_has_synced(client, main_session, mirror, degraded):
+    response = client.get("/wosmaster/1")
+    assert response.status_code == 200
+    assert "X-Data-Source" not in response.headers
+
+
+def test_healthy_primary_is_not_bypassed(client, main_session, mirror):
+    sync(main_session, mirror)
+    response = client.get("/wosmaster/1")
+    assert "X-Data-Source" not in response.headers
+    assert "ETag" in response.headers
+
+
+def test_slow_or_failed_probe_marks_primary_degraded(monkeypatch):
+    def probed(ok, latency_ms):
+        result = {"ok": ok, "checked_at": datetime.now(), "latency_ms": latency_ms, "error": None}
+        return (time.monotonic(), result)
+
+    monkeypatch.setattr(health.probe, "_result", None)
+    assert not read_routing.primary_degraded()
+    monkeypatch.setattr(health.probe, "_result", probed(True, 5.0))
+    assert not read_routing.primary_degraded()
+    monkeypatch.setattr(health.probe, "_result", probed(True, read_routing.MIRROR_SLOW_MS + 1))
+    assert read_routing.primary_degraded()
+    monkeypatch.setattr(health.probe, "_result", probed(False, 1.0))
+    assert read_routing.primary_degraded()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+
+import notifications
+import vetting_events
+from notifications import Broker, RedisFanOut
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def parse_sse(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_broker_delivers_events_from_worker_threads():
+    broker = Broker()
+
+    async def scenario():
+        subscription = broker.subscribe(7)
+        other = broker.subscribe(8)
+        threading.Thread(target=broker.deliver, args=(7, {"n": 1})).start()
+        event = await asyncio.wait_for(subscription.queue.get(), timeout=2)
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(other)
+        return event, other.queue.empty()
+
+    event, other_empty = asyncio.run(scenario())
+    assert event == {"n": 1}
+    assert other_empty
+    assert broker.subscriber_count(7) == 0
+
+
+def test_event_stream_pushes_committed_vetting_changes():
+    request = FakeRequest()
+
+    async def scenario():
+        stream = notifications.event_stream(request, 101, keepalive=5)
+        ready = await stream.__anext__()
+        vetting_events.publish(101, [{
+            "WOSSerial": 101, "WOSLineSerial": 3, "AuthorisedQty": 10.0,
+            "PreviousVettedQty": None, "VettedQty": 4.0,
+        }])
+        pushed = await asyncio.wait_for(stream.__anext__(), timeout=2)
+        request.disconnected = True
+        await stream.aclose()
+        return ready, pushed
+
+    ready, pushed = asyncio.run(scenario())
+    assert parse_sse(ready) == ("ready", {"WOSSerial": 101})
+    event, data = parse_sse(pushed)
+    assert event == "vetting"
+    assert data["lines"] == [{"WOSLineSerial": 3, "VettedQty": 4.0, "PreviousVettedQty": None}]
+    assert notifications.broker.subscriber_count(101) == 0
+
+
+def test_redis_fanout_reaches_other_workers(resp_server):
+    host, port = resp_server.server_address
+    url = f"redis://{host}:{port}/0"
+    worker1, worker2 = Broker(), Broker()
+    fanout1 = RedisFanOut(worker1, url)
+    RedisFanOut(worker2, url)
+
+    async def scenario():
+        subscription = worker2.subscribe(5)
+        # Wait until both listener threads have subscribed.
+        while len(resp_server.channels.get(b"wos_audit:vetting", ())) < 2:
+            await asyncio.sleep(0.01)
+        fanout1.publish(5, {"WOSSerial": 5, "lines": []})
+        return await asyncio.wait_for(subscription.queue.get(), timeout=2)
+
+    assert asyncio.run(scenario()) == {"WOSSerial": 5, "lines": []}
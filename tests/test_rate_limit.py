@@ -0,0 +1,99 @@
+import ipaddress
+
+import pytest
+from unittest.mock import MagicMock
+
+import auth
+import rate_limit
+from cache import MemoryBackend
+from main import app
+from database import get_db
+from rate_limit import LocalLimiter, Policy, SharedLimiter
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+POLICY = Policy("test", capacity=3, per_minute=60)
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = LocalLimiter(clock=clock)
+    decisions = [limiter.hit("user:a", POLICY) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[2].remaining == 0
+    assert decisions[3].retry_after == pytest.approx(1.0)
+    assert limiter.hit("user:b", POLICY).allowed
+
+    clock.now += 1
+    assert limiter.hit("user:a", POLICY).allowed
+    assert not limiter.hit("user:a", POLICY).allowed
+
+
+def test_shared_limiter_counts_across_instances():
+    backend = MemoryBackend(max_entries=64)
+    clock = FakeClock(now=3000.0)
+    workers = [SharedLimiter(backend, clock=clock), SharedLimiter(backend, clock=clock)]
+    allowed = [workers[n % 2].hit("user:a", POLICY).allowed for n in range(4)]
+    assert allowed == [True, True, True, False]
+
+    clock.now += POLICY.refill_seconds * 2
+    assert workers[0].hit("user:a", POLICY).allowed
+
+
+def test_heavy_endpoint_returns_429_with_headers(client, monkeypatch):
+    monkeypatch.setitem(rate_limit.POLICIES, "heavy", Policy("heavy", capacity=2, per_minute=2))
+    monkeypatch.setattr(rate_limit, "limiter", LocalLimiter())
+    mock_db = MagicMock()
+    mock_db.query.return_value.join.return_value.all.return_value = []
+    mock_db.query.return_value.outerjoin.return_value.all.return_value = []
+    app.dependency_overrides[get_db] = lambda: mock_db
+    try:
+        token = auth.create_access_token(data={"sub": "auditor1"})
+        headers = {"Authorization": f"Bearer {token}"}
+        first = client.get("/wosline", headers=headers)
+        assert first.headers["ratelimit-limit"] == "2"
+        assert first.headers["ratelimit-remaining"] == "1"
+        assert first.headers["ratelimit-policy"] == "2;w=60"
+        client.get("/wosline", headers=headers)
+        limited = client.get("/wosline", headers=headers)
+        assert limited.status_code == 429
+        assert int(limited.headers["retry-after"]) >= 1
+        assert limited.headers["ratelimit-remaining"] == "0"
+
+        # Another user, and a cheap lookup budget, are unaffected.
+        other = auth.create_access_token(data={"sub": "auditor2"})
+        assert client.get("/wosline", headers={"Authorization": f"Bearer {other}"}).status_code != 429
+        assert client.get("/codetable?column_name=X", headers=headers).status_code != 429
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_client_key_falls_back_to_ip():
+    request = MagicMock()
+    request.headers = {"authorization": "Bearer not-a-jwt"}
+    request.client.host = "10.0.0.5"
+    assert rate_limit.client_key(request) == "ip:10.0.0.5"
+    request.headers = {"authorization": f"Bearer {auth.create_access_token(data={'sub': 'u1'})}"}
+    assert rate_limit.client_key(request) == "user:u1"
+
+
+def test_client_ip_uses_forwarded_for_only_from_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+    request = MagicMock()
+    request.client.host = "10.0.0.5"
+    request.headers = {"x-forwarded-for": "1.2.3.4, 203.0.113.7, 10.0.0.9"}
+    # The left-most hop is client-supplied; the first untrusted hop from the right is the caller.
+    assert rate_limit.client_key(request) == "ip:203.0.113.7"
+    request.headers = {}
+    assert rate_limit.client_key(request) == "ip:10.0.0.5"
+
+    request.client.host = "198.51.100.2"
+    request.headers = {"x-forwarded-for": "203.0.113.7"}
+    assert rate_limit.client_key(request) == "ip:198.51.100.2"
@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import auth
+import cache
+import database
+import metrics
+import models
+import read_routing
+from circuit_breaker import CircuitBreaker, OPEN
+from main import app
+from services import wos_service
+from database import get_db
+
+
+def seeded_sessionmaker(customer_code):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    db.add(models.WOSMaster(
+        WOSSerial=1, CustomerCode=customer_code, WOSType="TYP",
+        InitiatedBy="user1", DateTimeInitiated=datetime(2026, 1, 1),
+    ))
+    db.add(models.WOSLine(
+        WOSSerial=1, WOSLineSerial=1, ItemCode=customer_code, ItemDesc="Item",
+        ItemDeno="EA", SOS="SOS", AuthorisedQty=10.0, AuthorityRef="REF",
+        AuthorityDate=datetime(2026, 1, 1), Justification="J",
+    ))
+    db.commit()
+    db.close()
+    return Session
+
+
+@pytest.fixture
+def primary():
+    Primary = seeded_sessionmaker("PRIMARY")
+
+    def override_db():
+        db = Primary()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    yield Primary
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def replica(primary, monkeypatch):
+    Replica = seeded_sessionmaker("REPLICA")
+    Replica.configure(info={"source": "replica"})
+    monkeypatch.setattr(database, "_ReplicaSessionLocal", Replica)
+    monkeypatch.setattr(database, "replica_breaker", CircuitBreaker("sybase-replica"))
+    metrics.reset()
+    yield Replica
+    cache.backend.clear()
+
+
+def served_by(client, headers=None):
+    return client.get("/wosmaster", headers=headers).json()[0]["CustomerCode"]
+
+
+def test_reads_use_primary_without_replica(client, primary):
+    assert not database.replica_configured()
+    assert served_by(client) == "PRIMARY"
+
+
+def test_read_routes_use_replica(client, replica):
+    assert served_by(client) == "REPLICA"
+    assert client.get("/wosline").json()[0]["ItemCode"] == "REPLICA"
+    assert metrics.value("db_reads_total", target="replica", reason="replica") == 2
+
+
+def test_versioned_reads_stay_on_primary(client, replica):
+    response = client.get("/wosline", params={"wos_serial": 1})
+    assert response.json()[0]["ItemCode"] == "PRIMARY"
+    # The replica session is only opened by the branch that reads from it.
+    assert metrics.value("db_reads_total", target="replica", reason="replica") == 0
+    assert client.get("/wosmaster/1").json()["CustomerCode"] == "PRIMARY"
+
+
+def test_reads_after_a_write_go_to_primary_for_that_caller(client, replica):
+    alice = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'alice'})}"}
+    bob = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'bob'})}"}
+    response = client.put("/wosline/1/1", json={"VettedQty": 4}, headers=alice)
+    assert response.status_code == 200
+
+    assert served_by(client, alice) == "PRIMARY"
+    assert served_by(client, bob) == "REPLICA"
+    assert metrics.value("db_reads_total", target="primary", reason="read_your_writes") == 1
+
+    cache.backend.delete("recent-write:user:alice")
+    assert served_by(client, alice) == "REPLICA"
+
+
+def test_open_replica_breaker_falls_back_to_primary(client, replica):
+    for _ in range(database.replica_breaker.failure_threshold):
+        database.replica_breaker.record_failure()
+    assert database.replica_breaker.state == OPEN
+    assert served_by(client) == "PRIMARY"
+    assert metrics.value("db_reads_total", target="primary", reason="replica_unavailable") == 1
+
+
+def test_unreachable_replica_falls_back_to_primary(client, replica, monkeypatch):
+    def refuse():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    engine = create_engine("sqlite://", creator=refuse)
+    monkeypatch.setattr(database, "_ReplicaSessionLocal", sessionmaker(bind=engine))
+    assert served_by(client) == "PRIMARY"
+
+
+def test_write_marker_outlives_the_write_budget(monkeypatch, replica):
+    monkeypatch.setattr(read_routing, "REPLICA_READ_YOUR_WRITES_SECONDS", 5)
+    stored = {}
+    monkeypatch.setattr(cache.backend, "set", lambda key, value, ttl=None: stored.update({key: ttl}))
+
+    class FakeRequest:
+        headers = {}
+        client = type("Client", (), {"host": "10.0.0.1"})
+
+    read_routing.record_write(FakeRequest())
+    assert stored == {"recent-write:ip:10.0.0.1": 5 + read_routing.deadlines.DEADLINES["writes"]}
+
+
+def test_primary_read_does_not_join_an_in_flight_replica_read(replica, primary, monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    load = wos_service.repo_get_wos_lines
+
+    def slow_replica(db, wos_serial=None):
+        if database.session_source(db) == "replica":
+            entered.set()
+            release.wait(5)
+        return load(db, wos_serial=wos_serial)
+
+    monkeypatch.setattr(wos_service, "repo_get_wos_lines", slow_replica)
+    results = {}
+
+    def read(name, Session):
+        db = Session()
+        try:
+            results[name] = [line["ItemCode"] for line in wos_service.get_wos_lines(db, wos_serial=1)]
+        finally:
+            db.close()
+
+    replica_read = threading.Thread(target=read, args=("replica", replica))
+    replica_read.start()
+    assert entered.wait(5)
+    primary_read = threading.Thread(target=read, args=("primary", primary))
+    primary_read.start()
+    primary_read.join(2)
+    release.set()
+    replica_read.join(5)
+    primary_read.join(5)
+    assert results == {"primary": ["PRIMARY"], "replica": ["REPLICA"]}
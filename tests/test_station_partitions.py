@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import models
+from exceptions import BadRequestError, DatabaseError
+from main import app
+from database import get_db
+from partitions import scatter_gather
+from services import user_service
+
+NORTH = ("sybase-north", "5000", "auditdb")
+SOUTH = ("sybase-south", "5000", "auditdb")
+
+
+def correspondence_sessionmaker(rows):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(
+        bind=engine, tables=[models.CodeTable.__table__, models.Correspondence.__table__]
+    )
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    for line_no, station in rows:
+        db.add(models.Correspondence(
+            LineNo=line_no, TableName="WOSMaster", PrimaryKeyValue="24", RoleName="LOGO",
+            CorrespondenceBy="u1", CorrespondenceToRole="NLAO",
+            DateTimeCorrespondence=datetime(2026, 1, line_no), CorrespondenceType="Fwded",
+            StationCode=station,
+        ))
+    db.commit()
+    db.close()
+    return Session
+
+
+@pytest.fixture
+def partitions(monkeypatch):
+    """Main server keeps every station but K, U (north) and B (south)."""
+    Main = correspondence_sessionmaker([(2, "V"), (5, "D"), (6, "K")])  # K row is stale on main
+    North = correspondence_sessionmaker([(1, "K"), (4, "U")])
+    South = correspondence_sessionmaker([(3, "B")])
+    monkeypatch.setattr(database, "_station_shards", {"K": NORTH, "U": NORTH, "B": SOUTH})
+    monkeypatch.setattr(database, "_StationSessionLocals", {NORTH: North, SOUTH: South})
+
+    def override_db():
+        db = Main()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    yield Main, North, South
+    app.dependency_overrides.clear()
+
+
+def test_parse_station_shards():
+    shards = database.parse_station_shards("K,u=north:5001/db1; B=south")
+    assert shards == {
+        "K": ("north", "5001", "db1"),
+        "U": ("north", "5001", "db1"),
+        "B": ("south", database.SYBASE_PORT, database.SYBASE_DB),
+    }
+    assert database.parse_station_shards("") == {}
+    with pytest.raises(ValueError):
+        database.parse_station_shards("X=north")
+    with pytest.raises(ValueError):
+        database.parse_station_shards("K=")
+
+
+def test_partitions_group_stations_by_server(partitions):
+    groups = dict(database.station_partitions())
+    assert set(groups) == {("K", "U"), ("B",), ("V", "D", "P", "A", "G")}
+    assert groups[("V", "D", "P", "A", "G")] is None
+
+
+def test_correspondence_is_gathered_from_every_partition_in_order(client, partitions):
+    response = client.get("/correspondence/24")
+    assert response.status_code == 200
+    rows = response.json()
+    assert [(r["LineNo"], r["StationCode"]) for r in rows] == [
+        (1, "K"), (2, "V"), (3, "B"), (4, "U"), (5, "D"),
+    ]
+
+
+def test_station_filter_queries_only_its_partition():
+    calls = []
+
+    def query(db, stations):
+        calls.append((db, stations))
+        return []
+
+    main_db = object()
+    scatter_gather(main_db, query, key=lambda r: r, stations=["V"])
+    assert calls == [(main_db, ["V"])]
+
+
+def test_users_stay_on_the_main_server(partitions, monkeypatch):
+    Main, North, South = partitions
+    calls = []
+
+    def fake_repo(db, stations):
+        calls.append((db.bind, stations))
+        return []
+
+    monkeypatch.setattr(user_service, "repo_get_all_users", fake_repo)
+    user_service.get_all_users(Main())
+    user_service.get_all_users(Main(), "K")
+    assert calls == [(Main.kw["bind"], None), (Main.kw["bind"], ["K"])]
+
+
+def test_unknown_station_code_is_rejected(partitions):
+    with pytest.raises(BadRequestError):
+        user_service.get_all_users(MagicMock(), "X")
+
+
+def test_partition_failure_fails_the_query(partitions):
+    Main, North, _ = partitions
+
+    def query(db, stations):
+        if db.bind is North.kw["bind"]:
+            raise DatabaseError("north is down")
+        return []
+
+    with pytest.raises(DatabaseError):
+        scatter_gather(Main(), query, key=lambda r: r)
@@ -0,0 +1,164 @@
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import models
+from main import app
+from services import summary_service
+from database import get_db, get_local_db
+import local_models
+from repositories import add_wos_vetting_delta, get_summary_rollup, save_wos_summaries
+from services.summary_service import sync_summaries
+
+
+def memory_sessionmaker(metadata):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def add_wos(db, serial, customer, wos_type, lines=(), closed=None, initiated=None):
+    db.add(models.WOSMaster(
+        WOSSerial=serial, CustomerCode=customer, WOSType=wos_type, InitiatedBy="user1",
+        DateTimeInitiated=initiated or datetime(2026, 1, serial), DateTimeClosed=closed,
+    ))
+    for n, (authorised, vetted, cost) in enumerate(lines, start=1):
+        db.add(models.WOSLine(
+            WOSSerial=serial, WOSLineSerial=n, ItemCode=f"ITEM{n}", ItemDesc="Item",
+            ItemDeno="EA", SOS="SOS", AuthorisedQty=authorised, VettedQty=vetted, TotalCost=cost,
+            AuthorityRef="REF", AuthorityDate=datetime(2026, 1, 1), Justification="J",
+        ))
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    MainSession = memory_sessionmaker(models.Base.metadata)
+    LocalSession = memory_sessionmaker(database.LocalBase.metadata)
+    monkeypatch.setattr(database, "_LocalSessionLocal", LocalSession)
+    monkeypatch.setattr(summary_service, "SUMMARY_ENABLED", True)
+    db = MainSession()
+    add_wos(db, 1, "C001", "TYP", lines=[(10.0, 4.0, 5.0), (10.0, None, 5.0)])
+    add_wos(db, 2, "C002", "TYP", lines=[(3.0, None, 1.5)])
+    add_wos(db, 3, "C001", "ABC", closed=datetime(2026, 1, 20))
+    db.commit()
+    db.close()
+
+    def override_db():
+        db = MainSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def override_local_db():
+        db = LocalSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_local_db] = override_local_db
+    yield MainSession, LocalSession
+    app.dependency_overrides.clear()
+
+
+def sync(sessions):
+    MainSession, LocalSession = sessions
+    db, local_db = MainSession(), LocalSession()
+    try:
+        return sync_summaries(db, local_db)
+    finally:
+        db.close()
+        local_db.close()
+
+
+def test_first_sync_builds_every_rollup(client, sessions):
+    assert sync(sessions) == 3
+    customers = {row["key"]: row for row in client.get("/summary/customers").json()}
+    assert customers["C001"] == {
+        "key": "C001", "wos_count": 2, "open_wos_count": 1, "closed_wos_count": 1,
+        "line_count": 2, "vetted_line_count": 1,
+        "authorised_qty": 20.0, "vetted_qty": 4.0, "total_cost": 10.0,
+    }
+    assert customers["C002"]["line_count"] == 1
+    types = {row["key"]: row["wos_count"] for row in client.get("/summary/wostypes").json()}
+    assert types == {"ABC": 1, "TYP": 2}
+    wos = client.get("/summary/wos", params={"customer_code": "C001"}).json()
+    assert [row["WOSSerial"] for row in wos] == [1, 3]
+    assert client.get("/summary/wos/3").json()["closed"] is True
+
+
+def test_vetting_writes_update_rollups_without_a_sync(client, sessions):
+    sync(sessions)
+    assert client.put("/wosline/1/2", json={"VettedQty": 6.0}).status_code == 200
+    assert client.put("/wosline/1/1", json={"VettedQty": 5.0}).status_code == 200
+    customer = client.get("/summary/customers/C001").json()
+    assert customer["vetted_line_count"] == 2
+    assert customer["vetted_qty"] == 11.0
+    assert client.get("/summary/wos/1").json()["vetted_qty"] == 11.0
+    assert {row["key"]: row["vetted_qty"] for row in client.get("/summary/wostypes").json()}["TYP"] == 11.0
+
+
+def test_new_wos_are_added_by_the_next_sync(client, sessions):
+    sync(sessions)
+    MainSession, _ = sessions
+    db = MainSession()
+    add_wos(db, 9, "C002", "TYP", lines=[(1.0, 1.0, 2.0)], initiated=datetime(2026, 2, 1))
+    db.commit()
+    db.close()
+    assert sync(sessions) < 4  # only changed WOS are recomputed
+    customer = client.get("/summary/customers/C002").json()
+    assert (customer["wos_count"], customer["line_count"], customer["total_cost"]) == (2, 2, 3.5)
+
+
+def test_logged_vetting_is_replayed_to_correct_drift(client, sessions):
+    sync(sessions)
+    client.put("/wosline/2/1", json={"VettedQty": 2.0})
+    _, LocalSession = sessions
+    local_db = LocalSession()
+    # A delta applied twice, as when it lands while a sync recomputes the same WOS.
+    add_wos_vetting_delta(local_db, 2, 1, 2.0)
+    local_db.close()
+    assert client.get("/summary/customers/C002").json()["vetted_qty"] == 4.0
+
+    sync(sessions)
+    customer = client.get("/summary/customers/C002").json()
+    assert (customer["vetted_line_count"], customer["vetted_qty"]) == (1, 2.0)
+
+
+def test_unknown_summaries_are_404(client, sessions):
+    sync(sessions)
+    assert client.get("/summary/customers/NONE").status_code == 404
+    assert client.get("/summary/wos/99").status_code == 404
+
+
+def test_concurrent_saves_do_not_double_count_rollups(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'local.db'}")
+    database.LocalBase.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    values = {"WOSSerial": 1, "CustomerCode": "C001", "WOSType": "TYP", "closed": False,
+              "line_count": 1, "vetted_line_count": 0, "authorised_qty": 1.0,
+              "vetted_qty": 0.0, "total_cost": 2.0, "updated_at": datetime(2026, 1, 1)}
+    state = {"master_token": None, "line_seq": 0, "next_line_seq": 0, "synced_at": datetime(2026, 1, 1)}
+    first, second = Session(), Session()
+    try:
+        save_wos_summaries(first, [values], state)
+        # The second session read the summary before the first one changed it again.
+        stale = second.get(local_models.WOSSummary, 1)
+        assert stale.line_count == 1
+        changed = {**values, "line_count": 3, "total_cost": 6.0}
+        save_wos_summaries(first, [changed], state)
+        save_wos_summaries(second, [changed], state)
+        rollup = get_summary_rollup(first, "customer", "C001")
+        first.refresh(rollup)
+        assert (rollup.wos_count, rollup.line_count, rollup.total_cost) == (1, 3, 6.0)
+    finally:
+        first.close()
+        second.close()
+        engine.dispose()
@@ -0,0 +1,221 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import database
+import local_models
+import models
+from main import app
+from database import get_db, get_local_db
+from services import job_service, wos_service
+
+
+def memory_sessionmaker(metadata):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    MainSession = memory_sessionmaker(models.Base.metadata)
+    LocalSession = memory_sessionmaker(database.LocalBase.metadata)
+    monkeypatch.setattr(database, "_SessionLocal", MainSession)
+    monkeypatch.setattr(database, "_LocalSessionLocal", LocalSession)
+
+    def override_local_db():
+        db = LocalSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def override_db():
+        db = MainSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[get_local_db] = override_local_db
+    db = MainSession()
+    for serial in (1, 2):
+        db.add(models.WOSMaster(
+            WOSSerial=serial, CustomerCode="C001", WOSType="TYP",
+            InitiatedBy="user1", DateTimeInitiated=datetime(2026, 1, 1),
+        ))
+        for n in (1, 2, 3):
+            db.add(models.WOSLine(
+                WOSSerial=serial, WOSLineSerial=n, ItemCode=f"ITEM{n}", ItemDesc="Item",
+                ItemDeno="EA", SOS="SOS", AuthorisedQty=10.0, AuthorityRef="REF",
+                AuthorityDate=datetime(2026, 1, 1), Justification="J",
+            ))
+    db.commit()
+    db.close()
+    yield MainSession, LocalSession
+    app.dependency_overrides.clear()
+
+
+def vetted(MainSession):
+    db = MainSession()
+    try:
+        return {(l.WOSSerial, l.WOSLineSerial): l.VettedQty for l in db.query(models.WOSLine)}
+    finally:
+        db.close()
+
+
+def test_job_is_queued_then_processed_in_chunks(client, sessions, monkeypatch):
+    MainSession, _ = sessions
+    monkeypatch.setattr(job_service, "JOB_CHUNK_SIZE", 2)
+    lines = [
+        {"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 5},
+        {"WOSSerial": 2, "WOSLineSerial": 3, "VettedQty": 7},
+        {"WOSSerial": 1, "WOSLineSerial": 9, "VettedQty": 1},
+        {"WOSSerial": 2, "WOSLineSerial": 1, "VettedQty": 50},
+        {"WOSSerial": 1, "WOSLineSerial": 2, "VettedQty": 10},
+    ]
+    response = client.post("/jobs/vetting", json={"Lines": lines})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["total_lines"] == 5 and job["processed_lines"] == 0
+
+    assert job_service.process_next_job() is True
+    assert job_service.process_next_job() is False
+
+    job = client.get(f"/jobs/{job['id']}").json()
+    assert job["status"] == "completed"
+    assert job["processed_lines"] == 5
+    assert job["failed_lines"] == 2
+    assert [(e["WOSSerial"], e["WOSLineSerial"], e["status"]) for e in job["errors"]] == [
+        (1, 9, "not_found"),
+        (2, 1, "invalid"),
+    ]
+    quantities = vetted(MainSession)
+    assert quantities[(1, 1)] == 5
+    assert quantities[(2, 3)] == 7
+    assert quantities[(1, 2)] == 10
+    assert quantities[(2, 1)] is None
+
+
+def test_chunk_database_error_is_reported_per_line(client, sessions, monkeypatch):
+    from exceptions import DatabaseError
+
+    def failing_update(db, assignments):
+        raise DatabaseError("Failed to update WOS lines")
+
+    monkeypatch.setattr(wos_service, "set_wos_lines_vetted_qty", failing_update)
+    job = client.post("/jobs/vetting", json={"Lines": [
+        {"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 5},
+    ]}).json()
+    job_service.process_next_job()
+
+    job = client.get(f"/jobs/{job['id']}").json()
+    assert job["status"] == "completed"
+    assert job["failed_lines"] == 1
+    assert job["errors"][0]["status"] == "failed"
+    assert job["errors"][0]["detail"] == "Failed to update WOS lines"
+
+
+def test_batch_update_spans_wos_in_key_order(client, sessions, monkeypatch):
+    MainSession, _ = sessions
+    monkeypatch.setattr(wos_service, "VETTING_BATCH_CHUNK_SIZE", 2)
+    response = client.put("/wosline-batch", json={"Lines": [
+        {"WOSSerial": 2, "WOSLineSerial": 2, "VettedQty": 4},
+        {"WOSSerial": 1, "WOSLineSerial": 3, "VettedQty": 11},
+        {"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 3},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 2 and body["failed"] == 1
+    assert body["results"] == [
+        {"WOSSerial": 1, "WOSLineSerial": 1, "status": "updated"},
+        {"WOSSerial": 1, "WOSLineSerial": 3, "status": "invalid",
+         "detail": "VettedQty (11.0) cannot be greater than AuthorisedQty (10.0)"},
+        {"WOSSerial": 2, "WOSLineSerial": 2, "status": "updated"},
+    ]
+    quantities = vetted(MainSession)
+    assert quantities[(1, 1)] == 3 and quantities[(2, 2)] == 4 and quantities[(1, 3)] is None
+
+
+def test_unknown_job_returns_404(client, sessions):
+    assert client.get("/jobs/does-not-exist").status_code == 404
+
+
+def test_bulk_update_touches_lines_in_key_order(client, sessions):
+    from sqlalchemy import event
+
+    MainSession, _ = sessions
+    engine = MainSession.kw["bind"]
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "WOSLine" in statement:
+            statements.append(parameters)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = client.put("/wosline-bulk", json={"WOSSerial": 1, "Lines": [
+            {"WOSLineSerial": 3, "VettedQty": 1},
+            {"WOSLineSerial": 1, "VettedQty": 2},
+        ]})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert response.status_code == 200
+    assert [line["WOSLineSerial"] for line in response.json()] == [3, 1]
+    line_serials = [p[1] for p in statements if len(p) >= 2 and p[0] == 1]
+    assert line_serials[-2:] == [1, 3]
+
+
+def set_job(LocalSession, job_id, **values):
+    db = LocalSession()
+    try:
+        db.query(local_models.VettingJob).filter_by(id=job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_running_job_is_taken_over_only_after_its_lease_expires(client, sessions, monkeypatch):
+    MainSession, LocalSession = sessions
+    job = client.post("/jobs/vetting", json={"Lines": [
+        {"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 5},
+    ]}).json()
+    # Another worker holds a live lease: restarting this one must not run the job again.
+    set_job(LocalSession, job["id"], status="running", lease_owner="other:1", heartbeat_at=datetime.now())
+    assert job_service.process_next_job() is False
+    assert vetted(MainSession)[(1, 1)] is None
+
+    set_job(LocalSession, job["id"], heartbeat_at=datetime.now() - timedelta(
+        seconds=job_service.JOB_LEASE_SECONDS + 1
+    ))
+    assert job_service.process_next_job() is True
+    assert client.get(f"/jobs/{job['id']}").json()["status"] == "completed"
+    assert vetted(MainSession)[(1, 1)] == 5
+
+
+def test_worker_stops_when_its_lease_is_taken_over(client, sessions, monkeypatch):
+    MainSession, LocalSession = sessions
+    monkeypatch.setattr(job_service, "JOB_CHUNK_SIZE", 1)
+    job = client.post("/jobs/vetting", json={"Lines": [
+        {"WOSSerial": 1, "WOSLineSerial": 1, "VettedQty": 5},
+        {"WOSSerial": 1, "WOSLineSerial": 2, "VettedQty": 6},
+    ]}).json()
+    apply = job_service.apply_keyed_vetted_qty
+
+    def apply_then_lose_lease(db, items):
+        set_job(LocalSession, job["id"], lease_owner="other:1")
+        return apply(db, items)
+
+    monkeypatch.setattr(job_service, "apply_keyed_vetted_qty", apply_then_lose_lease)
+    assert job_service.process_next_job() is True
+
+    status = client.get(f"/jobs/{job['id']}").json()
+    assert status["status"] == "running" and status["processed_lines"] == 1
+    quantities = vetted(MainSession)
+    assert quantities[(1, 1)] == 5 and quantities[(1, 2)] is None
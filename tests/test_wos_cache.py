@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from main import app
+from database import get_db
+from cache import WOSCache, MemoryBackend, etag_matches
+import models
+
+
+@pytest.fixture(autouse=True)
+def mock_db_dependency():
+    mock_db = MagicMock()
+    app.dependency_overrides[get_db] = lambda: mock_db
+    yield mock_db
+    app.dependency_overrides.clear()
+
+
+def make_master():
+    return models.WOSMaster(
+        WOSSerial=1,
+        CustomerCode="C001",
+        WOSType="TYP",
+        InitiatedBy="user1",
+        DateTimeInitiated=datetime(2026, 1, 31, 12, 0, 0),
+    )
+
+
+def make_line():
+    return models.WOSLine(
+        WOSSerial=1,
+        WOSLineSerial=1,
+        ItemCode="ITEM001",
+        ItemDesc="Test Item",
+        ItemDeno="EA",
+        SOS="SOS",
+        AuthorisedQty=100.0,
+        VettedQty=10.0,
+        AuthorityRef="REF001",
+        AuthorityDate=datetime(2023, 1, 1),
+        Justification="Justification",
+    )
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a", "b"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches("*", '"a"', exists=False)
+    assert etag_matches('"b", "a"', '"a"', exists=False)
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_version_bump_discards_cached_entry():
+    cache = WOSCache(MemoryBackend(max_entries=8))
+    loads = []
+    version = cache.version(5)
+    assert cache.get_or_load("wosmaster", 5, version, lambda: loads.append(1) or "v0") == "v0"
+    assert cache.get_or_load("wosmaster", 5, version, lambda: loads.append(1) or "v0") == "v0"
+    assert len(loads) == 1
+    old_etag = cache.etag("wosmaster", 5, version)
+    cache.bump(5)
+    version = cache.version(5)
+    assert cache.etag("wosmaster", 5, version) != old_etag
+    assert cache.get_or_load("wosmaster", 5, version, lambda: "v1") == "v1"
+
+
+def test_wosmaster_not_modified_skips_database(client, mock_db_dependency):
+    query = mock_db_dependency.query.return_value.outerjoin.return_value.filter.return_value
+    query.first.return_value = (make_master(), "Type Description")
+
+    first = client.get("/wosmaster/1")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/wosmaster/1", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+    third = client.get("/wosmaster/1")
+    assert third.status_code == 200
+    assert third.json()["WOSTypeDescription"] == "Type Description"
+    assert query.first.call_count == 1
+
+
+def test_wildcard_if_none_match_requires_an_existing_resource(client, mock_db_dependency):
+    query = mock_db_dependency.query.return_value.outerjoin.return_value.filter.return_value
+    query.first.return_value = None
+    assert client.get("/wosmaster/999", headers={"If-None-Match": "*"}).status_code == 404
+
+    query.first.return_value = (make_master(), "Type Description")
+    response = client.get("/wosmaster/1", headers={"If-None-Match": "*"})
+    assert response.status_code == 304
+    assert response.headers["etag"]
+
+
+def test_vetting_write_changes_etag(client, mock_db_dependency):
+    line = make_line()
+    mock_db_dependency.query.return_value.filter.return_value.first.return_value = line
+
+    etag = client.get("/wosline/1/1").headers["etag"]
+    assert client.get("/wosline/1/1", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.put("/wosline/1/1", json={"VettedQty": 50.0}).status_code == 200
+
+    response = client.get("/wosline/1/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["VettedQty"] == 50.0
@@ -0,0 +1,158 @@
+import time
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import cache
+import models
+from main import app
+from database import get_db
+from services import wos_segment_cache
+from services.wos_segment_cache import get_wos_masters_by_segments, month_start, next_month
+
+NOW = datetime(2026, 4, 15, 12, 0)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    serial = 0
+    for month in (1, 2, 3, 4):
+        for day, customer in ((5, "C001"), (20, "C002")):
+            serial += 1
+            session.add(models.WOSMaster(
+                WOSSerial=serial, CustomerCode=customer, WOSType="TYP", InitiatedBy="user1",
+                DateTimeInitiated=datetime(2026, month, day),
+            ))
+    session.commit()
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    session.statements = statements
+    yield session
+    session.close()
+
+
+def serials(rows):
+    return [row["WOSSerial"] for row in rows]
+
+
+def test_month_helpers():
+    assert month_start(datetime(2026, 3, 31, 23, 59)) == datetime(2026, 3, 1)
+    assert next_month(datetime(2026, 12, 1)) == datetime(2027, 1, 1)
+
+
+def test_closed_months_are_loaded_once(db):
+    first = get_wos_masters_by_segments(db, None, datetime(2026, 1, 1), now=NOW)
+    assert serials(first) == [1, 2, 3, 4, 5, 6, 7, 8]
+    # The first WOS date (then cached), one query for Jan-Mar, one live query for April.
+    assert len(db.statements) == 3
+
+    db.statements.clear()
+    second = get_wos_masters_by_segments(db, None, datetime(2026, 2, 10), now=NOW)
+    assert serials(second) == [4, 5, 6, 7, 8]
+    # No scan of closed months: only the change patch and the live month.
+    assert len(db.statements) == 2
+    assert '"DateTimeApproved" >=' in db.statements[0]
+
+
+def test_only_missing_months_are_queried(db):
+    get_wos_masters_by_segments(db, None, datetime(2026, 2, 1), datetime(2026, 2, 28), now=NOW)
+    db.statements.clear()
+    rows = get_wos_masters_by_segments(db, None, datetime(2026, 1, 1), datetime(2026, 3, 31), now=NOW)
+    assert serials(rows) == [1, 2, 3, 4, 5, 6]
+    # January and March load separately around cached February, then the change patch.
+    assert len(db.statements) == 3
+
+
+def test_changes_to_cached_months_are_patched_in(db):
+    get_wos_masters_by_segments(db, "C001", datetime(2026, 1, 1), now=NOW)
+    master = db.get(models.WOSMaster, 3)
+    master.ApprovedBy = "boss"
+    master.DateTimeApproved = NOW
+    db.commit()
+
+    db.statements.clear()
+    rows = get_wos_masters_by_segments(db, "C001", datetime(2026, 1, 1), now=NOW)
+    assert serials(rows) == [1, 3, 5, 7]
+    assert {row["WOSSerial"]: row["ApprovedBy"] for row in rows}[3] == "boss"
+    # The patch query is narrowed to the customer and the cached months in SQL.
+    assert '"CustomerCode" =' in db.statements[0]
+    assert '"DateTimeInitiated" <' in db.statements[0]
+
+
+def test_segments_are_per_customer(db):
+    assert serials(get_wos_masters_by_segments(db, "C001", datetime(2026, 1, 1), now=NOW)) == [1, 3, 5, 7]
+    assert serials(get_wos_masters_by_segments(db, "C002", datetime(2026, 1, 1), now=NOW)) == [2, 4, 6, 8]
+
+
+def test_wosmaster_route_uses_segments(client, db):
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.get("/wosmaster", params={"from_date": "2026-03-01T00:00:00", "customer_code": "C002"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert serials(response.json()) == [6, 8]
+
+
+@pytest.fixture
+def server_time_zone(monkeypatch):
+    monkeypatch.setenv("TZ", "UTC-2")  # POSIX sign: two hours ahead of UTC
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_aware_dates_are_converted_to_server_local_time(db, server_time_zone):
+    eastern = timezone(timedelta(hours=-5))
+    rows = get_wos_masters_by_segments(
+        db, None, datetime(2026, 2, 19, 17, 0, tzinfo=eastern), datetime(2026, 3, 4, 22, tzinfo=timezone.utc),
+        now=NOW,
+    )
+    assert serials(rows) == [4, 5]
+
+
+def test_aware_dates_mean_the_same_with_and_without_segments(client, db, server_time_zone, monkeypatch):
+    app.dependency_overrides[get_db] = lambda: db
+    params = {"from_date": "2026-02-19T22:00:00Z", "to_date": "2026-03-04T22:00:00Z"}
+    try:
+        with_segments = client.get("/wosmaster", params=params).json()
+        monkeypatch.setattr(wos_segment_cache, "WOS_SEGMENT_CACHE_ENABLED", False)
+        without_segments = client.get("/wosmaster", params=params).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert serials(with_segments) == serials(without_segments) == [4, 5]
+
+
+def test_month_walk_starts_at_the_first_wos(db):
+    db.statements.clear()
+    rows = get_wos_masters_by_segments(db, None, datetime(1, 1, 1), now=NOW)
+    assert serials(rows) == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert cache.backend.get("wosmaster-segment:*:1999-12") is None
+    assert cache.backend.get("wosmaster-segment:*:2026-01") is not None
+    assert len(db.statements) == 3
+
+
+def test_wosmaster_route_accepts_utc_offsets(client, db):
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        naive = client.get("/wosmaster", params={"from_date": "2026-03-01T00:00:00"})
+        aware = client.get("/wosmaster", params={"from_date": "2026-03-01T00:00:00Z"})
+    finally:
+        app.dependency_overrides.clear()
+    assert naive.status_code == aware.status_code == 200
+    assert serials(aware.json()) == serials(naive.json()) == [5, 6, 7, 8]
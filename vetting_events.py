@@ -0,0 +1,42 @@
+"""
+In-process notifications for committed vetting writes.
+
+Repositories call publish() after a VettedQty change commits. Caches, the change log and
+other consumers subscribe() at import time. A failing subscriber is logged and does not
+affect the write, which has already committed, or the other subscribers.
+
+Each change is a dict with WOSSerial, WOSLineSerial, AuthorisedQty, PreviousVettedQty
+and VettedQty.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+_subscribers = []
+
+
+def subscribe(callback):
+    """Register callback(wos_serial: int, changes: list[dict]). Usable as a decorator."""
+    _subscribers.append(callback)
+    return callback
+
+
+def publish(wos_serial: int, changes: list[dict]) -> None:
+    """Notify subscribers that vetting changes to a WOS have committed."""
+    for callback in list(_subscribers):
+        try:
+            callback(wos_serial, changes)
+        except Exception:
+            logger.exception("Vetting event subscriber %r failed for WOS %s", callback, wos_serial)
+
+
+def line_change(line, previous_vetted_qty) -> dict:
+    """Build the change dict for a WOSLine whose VettedQty was just written."""
+    return {
+        "WOSSerial": line.WOSSerial,
+        "WOSLineSerial": line.WOSLineSerial,
+        "AuthorisedQty": line.AuthorisedQty,
+        "PreviousVettedQty": previous_vetted_qty,
+        "VettedQty": line.VettedQty,
+    }